@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks
+~~~~~~~~~~
+
+Performance benchmarks for the PDFGeneratorAPI wrapper. They run against a local stand-in
+server (see `benchmarks.server`), no credentials or network access needed.
+"""
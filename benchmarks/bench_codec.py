@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.bench_codec
+~~~~~~~~~~~~~~~~~~~~~~
+
+Encode/decode time of every installed JSON codec on an invoice-sized `create_document`
+payload and on a base64 document response.
+
+Usage::
+
+  $ python -m benchmarks.bench_codec --line-items 5000
+"""
+
+import argparse
+import base64
+import timeit
+
+from pdfgeneratorapi.serialization import AVAILABLE_CODECS, get_codec
+
+
+def invoice(line_items):
+    return {
+        "number": "INV-2019-000123",
+        "date": "2019-12-04",
+        "customer": {
+            "name": "Sameer Kumar",
+            "email": "sam@sameerkumar.website",
+            "address": {
+                "street": "1 Main Street",
+                "city": "Bengaluru",
+                "zip": "560001",
+            },
+        },
+        "line_items": [
+            {
+                "sku": "SKU-{0:06d}".format(i),
+                "description": "Line item number {0} with a reasonably long description".format(
+                    i
+                ),
+                "quantity": i % 7 + 1,
+                "unit_price": 19.99 + i % 13,
+                "tax_rate": 0.18,
+                "tags": ["invoice", "monthly"],
+            }
+            for i in range(line_items)
+        ],
+        "total": 123456.78,
+    }
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=3)) / number
+    print("{0:>32}: {1:10.1f} us".format(label, seconds * 1e6))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--line-items", type=int, default=5000)
+    parser.add_argument("--document-kb", type=int, default=1024)
+    args = parser.parse_args(argv)
+
+    payload = invoice(args.line_items)
+    document = get_codec("json").dumps(
+        {
+            "response": base64.b64encode(
+                b"%PDF-1.7\n" * (args.document_kb * 114)
+            ).decode(),
+            "meta": {"name": "invoice.pdf", "encoding": "base64"},
+        }
+    )
+    for name in AVAILABLE_CODECS:
+        codec = get_codec(name)
+        body = codec.dumps(payload)
+        bench("{0} encode invoice".format(name), lambda: codec.dumps(payload), 20)
+        bench("{0} decode invoice".format(name), lambda: codec.loads(body), 20)
+        bench("{0} decode document".format(name), lambda: codec.loads(document), 20)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.bench_hedging
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+`create_document` latency percentiles with and without hedging, against a stand-in
+server where a share of the answers comes from a slow node.
+
+Usage::
+
+  $ python -m benchmarks.bench_hedging --calls 1000 --threads 16 --slow-rate 0.03
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pdfgeneratorapi import PDFGenerator
+from pdfgeneratorapi.hedging import HedgePolicy
+
+from .server import StubServer
+
+
+def percentile(latencies, quantile):
+    return latencies[min(len(latencies) - 1, int(quantile * len(latencies)))]
+
+
+def run(client, calls, threads):
+    def timed(i):
+        start = time.perf_counter()
+        client.create_document(template_id=i, data={"name": "Sameer"})
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return sorted(executor.map(timed, range(calls)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--slow-latency", type=float, default=1.0)
+    parser.add_argument("--budget", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    with StubServer(
+        latency=args.latency,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency,
+        seed=1,
+    ) as server:
+        for label, hedge in (
+            ("no hedging", None),
+            ("hedged", HedgePolicy(budget=args.budget, initial_delay=args.latency * 2)),
+        ):
+            before = server.request_count
+            with PDFGenerator(
+                api_key="key",
+                api_secret="secret",
+                workspace="bench@example.com",
+                api_url=server.api_url,
+                pool_maxsize=2 * args.threads,
+                hedge=hedge,
+            ) as client:
+                latencies = run(client, args.calls, args.threads)
+            print(
+                "{0:>10}: p50 {1:6.0f} ms  p95 {2:6.0f} ms  p99 {3:6.0f} ms  "
+                "{4} requests".format(
+                    label,
+                    percentile(latencies, 0.5) * 1e3,
+                    percentile(latencies, 0.95) * 1e3,
+                    percentile(latencies, 0.99) * 1e3,
+                    server.request_count - before,
+                )
+            )
+            if hedge is not None:
+                print("{0:>10}  {1}".format("", hedge.stats()))
+                hedge.close()
+
+
+if __name__ == "__main__":
+    main()
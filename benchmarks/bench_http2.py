@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.bench_http2
+~~~~~~~~~~~~~~~~~~~~~~
+
+Connections opened, latency and requests/sec of concurrent `create_document` calls over
+HTTP/1.1 (one connection per request in flight) versus HTTP/2 (streams multiplexed over
+a few connections), for the threaded and the asyncio client.
+
+Usage::
+
+  $ python -m benchmarks.bench_http2 --concurrency 300 --calls 3000 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pdfgeneratorapi import AsyncPDFGenerator, PDFGenerator
+
+from .h2server import H2StubServer
+from .server import StubServer
+from .suite import percentile
+
+
+def timed(func):
+    def call(i):
+        start = time.perf_counter()
+        func(i)
+        return time.perf_counter() - start
+
+    return call
+
+
+def run_threads(client, calls, concurrency):
+    call = timed(lambda i: client.create_document(template_id=i, data={"i": i}))
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(call, range(calls)))
+
+
+def run_async(client_options, calls, concurrency):
+    async def run():
+        async with AsyncPDFGenerator(
+            max_concurrency=concurrency, **client_options
+        ) as client:
+
+            async def call(i):
+                start = time.perf_counter()
+                await client.create_document(template_id=i, data={"i": i})
+                return time.perf_counter() - start
+
+            return await asyncio.gather(*[call(i) for i in range(calls)])
+
+    return asyncio.run(run())
+
+
+def report(label, server, before, latencies, elapsed):
+    latencies = sorted(latencies)
+    print(
+        "{0:>14}: {1:5d} connections  p50 {2:7.1f} ms  p99 {3:7.1f} ms  "
+        "{4:8.1f} req/s".format(
+            label,
+            server.connection_count - before,
+            percentile(latencies, 0.50) * 1e3,
+            percentile(latencies, 0.99) * 1e3,
+            len(latencies) / elapsed,
+        )
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--streams", type=int, default=100)
+    parser.add_argument("--connections", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    http1_server = StubServer(latency=args.latency).start()
+    http2_server = H2StubServer(latency=args.latency).start()
+    try:
+        for label, server, http2 in (
+            ("HTTP/1.1", http1_server, False),
+            ("HTTP/2", http2_server, True),
+        ):
+            options = dict(
+                api_key="key",
+                api_secret="secret",
+                workspace="bench@example.com",
+                api_url=server.api_url,
+                pool_maxsize=args.concurrency,
+                http2=http2,
+                http2_connections=args.connections,
+                max_streams_per_connection=args.streams,
+            )
+            before = server.connection_count
+            start = time.perf_counter()
+            with PDFGenerator(**options) as client:
+                latencies = run_threads(client, args.calls, args.concurrency)
+            report(
+                label + " sync", server, before, latencies, time.perf_counter() - start
+            )
+
+            before = server.connection_count
+            start = time.perf_counter()
+            latencies = run_async(options, args.calls, args.concurrency)
+            report(
+                label + " async", server, before, latencies, time.perf_counter() - start
+            )
+    finally:
+        http1_server.stop()
+        http2_server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.bench_listing
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+Memory and filter time of a large `all_templates` listing held as a list of
+<PDFGeneratorResponse> (`dict_to_object`) versus a columnar <TemplateListing>.
+
+Usage::
+
+  $ python -m benchmarks.bench_listing --templates 50000
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from pdfgeneratorapi.listing import TemplateListing
+from pdfgeneratorapi.serialization import DEFAULT_CODEC
+from pdfgeneratorapi.utils import dict_to_object
+
+TAGS = ["invoice", "order", "label", "receipt", "statement", "contract", "report"]
+
+
+def listing_payload(count, seed=1):
+    """ Returns the encoded `all_templates` answer with `count` templates. """
+    rng = random.Random(seed)
+    start = datetime.datetime(2015, 1, 1)
+    templates = [
+        {
+            "id": 10000 + i,
+            "name": "Template {0}".format(i),
+            "modified": (
+                start + datetime.timedelta(seconds=rng.randrange(10 ** 8))
+            ).strftime("%Y-%m-%d %H:%M:%S"),
+            "owner": rng.random() < 0.5,
+            "tags": rng.sample(TAGS, rng.randrange(3)),
+        }
+        for i in range(count)
+    ]
+    return json.dumps({"response": templates}).encode()
+
+
+def build_objects(raw):
+    return dict_to_object(DEFAULT_CODEC.loads(raw), DEFAULT_CODEC)
+
+
+def build_columns(raw):
+    return TemplateListing.from_items(DEFAULT_CODEC.loads(raw)["response"])
+
+
+def retained(build, raw):
+    """ Returns (result, bytes still allocated once built, seconds to build). The build
+    is timed on its own, tracing allocations slows it down.
+    """
+    _, elapsed = timed(lambda: build(raw), repeat=1)
+    gc.collect()
+    tracemalloc.start()
+    result = build(raw)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def timed(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--templates", type=int, default=50000)
+    args = parser.parse_args(argv)
+
+    raw = listing_payload(args.templates)
+    objects, objects_size, objects_build = retained(build_objects, raw)
+    columns, columns_size, columns_build = retained(build_columns, raw)
+    print(
+        "{0:>28}: {1:8.1f} MiB  built in {2:7.1f} ms".format(
+            "list of responses", objects_size / 1048576.0, objects_build * 1e3
+        )
+    )
+    print(
+        "{0:>28}: {1:8.1f} MiB  built in {2:7.1f} ms".format(
+            "TemplateListing", columns_size / 1048576.0, columns_build * 1e3
+        )
+    )
+
+    after = datetime.datetime(2017, 1, 1)
+    before = datetime.datetime(2017, 7, 1)
+    filters = (
+        (
+            "tag invoice",
+            lambda: [t.id for t in objects if "invoice" in t.tags],
+            lambda: columns.filter(tags=["invoice"]).ids,
+        ),
+        (
+            "owned",
+            lambda: [t.id for t in objects if t.owner],
+            lambda: columns.filter(owner=True).ids,
+        ),
+        (
+            "modified in 2017 H1",
+            lambda: [t.id for t in objects if after <= t.modified < before],
+            lambda: columns.filter(modified_after=after, modified_before=before).ids,
+        ),
+        (
+            "sorted by modified",
+            lambda: [t.id for t in sorted(objects, key=lambda t: t.modified)],
+            lambda: columns.sort_by("modified").ids,
+        ),
+    )
+    # Responses convert fields on first access: the first run of a filter reading a
+    # field is slower than the next ones.
+    for label, on_objects, on_columns in filters:
+        _, objects_first = timed(on_objects, repeat=1)
+        expected, objects_time = timed(on_objects)
+        result, columns_time = timed(on_columns)
+        assert sorted(result) == sorted(expected), label
+        print(
+            "{0:>28}: list {1:8.2f} ms (first {2:8.2f} ms)  columns {3:8.2f} ms  "
+            "({4} templates)".format(
+                label,
+                objects_time * 1e3,
+                objects_first * 1e3,
+                columns_time * 1e3,
+                len(result),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
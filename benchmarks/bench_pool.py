@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.bench_pool
+~~~~~~~~~~~~~~~~~~~~~
+
+Requests/sec of `PDFGenerator.get_template` with the pooled session versus a fresh
+connection per call (the behaviour of module-level `requests.get`).
+
+Usage::
+
+  $ python -m benchmarks.bench_pool --calls 2000 --threads 8
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pdfgeneratorapi import PDFGenerator
+
+from .server import StubServer
+
+
+def run(client, calls, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda i: client.get_template(template_id=i), range(calls)))
+    return calls / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    with StubServer() as server:
+        for label, keep_alive in (("unpooled", False), ("pooled", True)):
+            before = server.connection_count
+            with PDFGenerator(
+                api_key="key",
+                api_secret="secret",
+                workspace="bench@example.com",
+                api_url=server.api_url,
+                pool_maxsize=args.threads,
+                keep_alive=keep_alive,
+            ) as client:
+                rate = run(client, args.calls, args.threads)
+            print(
+                "{label:>9}: {rate:8.1f} req/s  {connections} connections".format(
+                    label=label,
+                    rate=rate,
+                    connections=server.connection_count - before,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.bench_response
+~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Microbenchmarks of the response layer on realistic `all_templates` and `create_document`
+payloads. `eager` is the former conversion (dateutil on every value, uncached key
+conversion, everything converted up front), kept here as the reference point.
+
+Usage::
+
+  $ python -m benchmarks.bench_response --templates 5000
+"""
+
+import argparse
+import base64
+import json
+import os
+import re
+import timeit
+
+from dateutil.parser import parse
+
+from pdfgeneratorapi.response import convert_snake_case, parse_date
+from pdfgeneratorapi.utils import dict_to_object
+
+FIXTURES = os.path.join(os.path.dirname(__file__), os.pardir, "tests", "fixtures")
+
+
+def eager_convert_snake_case(name):
+    s1 = re.sub("(.)([A-Z][a-z]+)", r"\1_\2", name)
+    return re.sub("([a-z0-9])([A-Z])", r"\1_\2", s1).lower()
+
+
+class EagerResponse(object):
+    def __init__(self, data):
+        for name, value in data.items():
+            try:
+                value = parse(value)
+            except (ValueError, TypeError, OverflowError):
+                pass
+            setattr(self, eager_convert_snake_case(name), self._wrap(value))
+
+    def _wrap(self, value):
+        if isinstance(value, (tuple, list, set, frozenset)):
+            return type(value)([self._wrap(v) for v in value])
+        return EagerResponse(value) if isinstance(value, dict) else value
+
+
+def eager(payload):
+    response = payload["response"]
+    if isinstance(response, list):
+        return [EagerResponse(item) for item in response]
+    return EagerResponse(response if isinstance(response, dict) else payload)
+
+
+def touch(value):
+    """ Reads every attribute, recursively, to force full materialisation. """
+    if isinstance(value, list):
+        for item in value:
+            touch(item)
+    elif hasattr(value, "_keys"):
+        for name in value._keys():
+            touch(getattr(value, name))
+
+
+def all_templates_payload(count):
+    with open(os.path.join(FIXTURES, "all_templates.json")) as f:
+        template = json.load(f)["response"][0]
+    return {"response": [dict(template, id=i) for i in range(count)]}
+
+
+def single_template_payload():
+    with open(os.path.join(FIXTURES, "single_template.json")) as f:
+        return json.load(f)
+
+
+def create_document_payload(size):
+    with open(os.path.join(FIXTURES, "create_document.json")) as f:
+        payload = json.load(f)
+    payload["response"] = base64.b64encode(b"%PDF-1.7\n" * (size // 9)).decode()
+    return payload
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=3)) / number
+    print("{0:>44}: {1:10.1f} us".format(label, seconds * 1e6))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--templates", type=int, default=5000)
+    parser.add_argument("--document-kb", type=int, default=512)
+    args = parser.parse_args(argv)
+
+    keys = ["emptyLabels", "repeatLayout", "phpClassName", "borderStatus", "dataIndex"]
+    bench(
+        "key conversion, regex",
+        lambda: list(map(eager_convert_snake_case, keys)),
+        20000,
+    )
+    bench(
+        "key conversion, memoised", lambda: list(map(convert_snake_case, keys)), 20000
+    )
+    bench("date, dateutil", lambda: parse("2017-10-30 16:49:28"), 5000)
+    bench("date, strict", lambda: parse_date("2017-10-30 16:49:28"), 5000)
+
+    listing = all_templates_payload(args.templates)
+    template = single_template_payload()
+    document = create_document_payload(args.document_kb * 1024)
+    for name, payload, number in (
+        ("all_templates x{0}".format(args.templates), listing, 3),
+        ("get_template", template, 200),
+        ("create_document {0} KB".format(args.document_kb), document, 3),
+    ):
+        bench(name + ", eager", lambda: eager(payload), number)
+        bench(
+            name + ", lazy, all fields", lambda: touch(dict_to_object(payload)), number
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.bench_signing
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+Signatures/sec, `prepare_headers` calls/sec and editor URLs/sec. `rebuilt` is the former
+signing (a fresh HMAC and header dict per call), kept here as the reference point.
+
+Usage::
+
+  $ python -m benchmarks.bench_signing --urls 20000
+"""
+
+import argparse
+import hashlib
+import hmac
+import time
+
+from pdfgeneratorapi import PDFGenerator
+
+
+def rebuilt_signature(api_key, api_secret, workspace, resource):
+    message = "{api_key}{resource}{workspace}".format(
+        api_key=api_key, resource=resource, workspace=workspace
+    )
+    return hmac.new(
+        bytes(api_secret, "UTF-8"), bytes(message, "UTF-8"), hashlib.sha256
+    ).hexdigest()
+
+
+def rate(label, func, number):
+    start = time.perf_counter()
+    for i in range(number):
+        func(i)
+    per_second = number / (time.perf_counter() - start)
+    print("{0:>36}: {1:12.0f} /s".format(label, per_second))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--urls", type=int, default=20000)
+    parser.add_argument("--templates", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    client = PDFGenerator(
+        api_key="61e5f04ca1794253ed17e6bb986c1702",
+        api_secret="68db1902ad1bb26d34b3f597488b9b28",
+        workspace="demo.example@actualreports.com",
+    )
+    resources = [
+        "templates/{0}/output".format(i % args.templates) for i in range(args.urls)
+    ]
+    data_list = [{"name": "Customer {0}".format(i)} for i in range(args.urls)]
+    template_ids = [i % args.templates for i in range(args.urls)]
+
+    rate(
+        "signature, rebuilt",
+        lambda i: rebuilt_signature(
+            "61e5f04ca1794253ed17e6bb986c1702",
+            "68db1902ad1bb26d34b3f597488b9b28",
+            "demo.example@actualreports.com",
+            resources[i],
+        ),
+        args.urls,
+    )
+    rate(
+        "signature, precomputed", lambda i: client.signer._sign(resources[i]), args.urls
+    )
+    rate(
+        "signature, memoised", lambda i: client._get_signature(resources[i]), args.urls
+    )
+    rate("prepare_headers", lambda i: client.prepare_headers(resources[i]), args.urls)
+    rate(
+        "get_editor_url",
+        lambda i: client.get_editor_url(template_ids[i], data_list[i]),
+        args.urls,
+    )
+    start = time.perf_counter()
+    client.get_editor_urls(template_ids, data_list)
+    print(
+        "{0:>36}: {1:12.0f} /s".format(
+            "get_editor_urls", args.urls / (time.perf_counter() - start)
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.bench_stream
+~~~~~~~~~~~~~~~~~~~~~~~
+
+Peak RSS of fetching a large base64 document with `create_document` versus streaming it
+to disk with `create_document_to`. Each mode runs in its own process so the peaks do not
+mix, the stand-in server runs in this one.
+
+Usage::
+
+  $ python -m benchmarks.bench_stream --size-mb 50
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from pdfgeneratorapi import PDFGenerator
+
+from .server import StubServer
+
+MODES = ("create_document", "create_document_to")
+
+
+def peak_rss_mb():
+    """ Peak RSS of this process. VmHWM is preferred on Linux, as `ru_maxrss` survives
+    exec() and would include the parent (which holds the server payloads) at fork time.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except IOError:
+        pass
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS.
+    scale = 1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def worker(mode, api_url):
+    client = PDFGenerator(
+        api_key="key",
+        api_secret="secret",
+        workspace="bench@example.com",
+        api_url=api_url,
+    )
+    start = time.perf_counter()
+    if mode == "create_document":
+        client.create_document(template_id=1, data={})
+    else:
+        with tempfile.TemporaryFile() as sink:
+            client.create_document_to(sink, template_id=1, data={})
+    elapsed = time.perf_counter() - start
+    print(
+        "{0:>18}: {1:8.1f} MB peak RSS  {2:6.2f} s".format(mode, peak_rss_mb(), elapsed)
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--api-url", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        return worker(args.worker, args.api_url)
+
+    with StubServer(document_size=args.size_mb * 1024 * 1024) as server:
+        for mode in MODES:
+            subprocess.check_call(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.bench_stream",
+                    "--worker",
+                    mode,
+                    "--api-url",
+                    server.api_url,
+                ],
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.bench_transport
+~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Calls/sec of the client itself (signing, encoding, error mapping, response building) with
+the in-memory `FakeTransport`, i.e. the ceiling of a load test without any server.
+
+Usage::
+
+  $ python -m benchmarks.bench_transport --calls 100000 --threads 4
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pdfgeneratorapi import PDFGenerator
+from pdfgeneratorapi.transport import FakeTransport
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0)
+    args = parser.parse_args(argv)
+
+    transport = FakeTransport(latency=args.latency, history=0)
+    transport.add(
+        "POST",
+        r"templates/\d+/output$",
+        json={"response": "JVBERi0xLjcK", "meta": {"name": "document.pdf"}},
+    )
+    transport.add("GET", r"templates/\d+$", json={"response": {"id": 1}})
+    client = PDFGenerator(
+        api_key="key",
+        api_secret="secret",
+        workspace="bench@example.com",
+        transport=transport,
+    )
+    for label, call in (
+        ("get_template", lambda i: client.get_template(template_id=i % 100)),
+        (
+            "create_document",
+            lambda i: client.create_document(template_id=i % 100, data={"i": i}),
+        ),
+    ):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            for _ in executor.map(call, range(args.calls), chunksize=256):
+                pass
+        elapsed = time.perf_counter() - start
+        print(
+            "{0:>16}: {1:10.1f} calls/s  {2} calls".format(
+                label, args.calls / elapsed, args.calls
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
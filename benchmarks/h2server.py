@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.h2server
+~~~~~~~~~~~~~~~~~~~
+
+The `benchmarks.server` stand-in over cleartext HTTP/2 (prior knowledge, no TLS), built on
+`h2` and asyncio so that delayed answers on one connection do not block each other.
+
+Usage::
+
+  >>> with H2StubServer(latency=0.05, max_concurrent_streams=100) as server:
+  ...     client = PDFGenerator(api_key="key", api_secret="secret", api_url=server.api_url, http2=True)
+  ...     client.all_templates()
+"""
+
+import asyncio
+import base64
+import json
+import threading
+from urllib.parse import parse_qs
+
+import h2.config
+import h2.connection
+import h2.events
+import h2.exceptions
+import h2.settings
+
+from .server import StubHandler, make_archive
+
+
+class H2Exchange(StubHandler):
+    """ Answers one request with the `StubHandler` routes, without its HTTP/1.1 I/O. """
+
+    def __init__(self, server, method, path, body):
+        self.server = server
+        self.command = method
+        self.body = body
+        path, _, query = path.partition("?")
+        self.query = {key: values[0] for key, values in parse_qs(query).items()}
+        self.resource = path[len(server.base_path) :]
+
+    def answer(self):
+        """ Returns (status, content type, body). """
+        for route_method, pattern, name in self.routes:
+            match = pattern.match(self.resource)
+            if route_method == self.command and match:
+                status, payload = getattr(self, name)(*match.groups())
+                if isinstance(payload, bytes):
+                    return status, "application/pdf", payload
+                return status, "application/json", self.encode(payload)
+        return 404, "application/json", self.encode({"error": "Entity not found"})
+
+    @staticmethod
+    def encode(payload):
+        return json.dumps(payload).replace("/", "\\/").encode("utf-8")
+
+
+class H2Protocol(asyncio.Protocol):
+    def __init__(self, server):
+        self.server = server
+        self.connection = h2.connection.H2Connection(
+            config=h2.config.H2Configuration(client_side=False, header_encoding="utf-8")
+        )
+        self.streams = {}
+        self.window_updated = asyncio.Event()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server.connection_count += 1
+        self.connection.initiate_connection()
+        self.connection.update_settings(
+            {
+                h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS: (
+                    self.server.max_concurrent_streams
+                )
+            }
+        )
+        self.transport.write(self.connection.data_to_send())
+
+    def data_received(self, data):
+        try:
+            events = self.connection.receive_data(data)
+        except h2.exceptions.ProtocolError:
+            self.transport.write(self.connection.data_to_send())
+            self.transport.close()
+            return
+        for event in events:
+            if isinstance(event, h2.events.RequestReceived):
+                self.streams[event.stream_id] = (dict(event.headers), bytearray())
+            elif isinstance(event, h2.events.DataReceived):
+                self.streams[event.stream_id][1].extend(event.data)
+                self.connection.acknowledge_received_data(
+                    event.flow_controlled_length, event.stream_id
+                )
+            elif isinstance(event, h2.events.StreamEnded):
+                asyncio.ensure_future(self.respond(event.stream_id))
+            elif isinstance(event, h2.events.WindowUpdated):
+                self.window_updated.set()
+            elif isinstance(event, h2.events.ConnectionTerminated):
+                self.transport.close()
+        self.transport.write(self.connection.data_to_send())
+
+    def connection_lost(self, exc):
+        self.window_updated.set()
+
+    async def respond(self, stream_id):
+        headers, body = self.streams.pop(stream_id)
+        self.server.request_count += 1
+        if self.server.latency:
+            await asyncio.sleep(self.server.latency)
+        status, content_type, payload = H2Exchange(
+            self.server, headers[":method"], headers[":path"], bytes(body)
+        ).answer()
+        self.connection.send_headers(
+            stream_id,
+            [
+                (":status", str(status)),
+                ("content-type", content_type),
+                ("content-length", str(len(payload))),
+            ],
+            end_stream=not payload,
+        )
+        self.transport.write(self.connection.data_to_send())
+        while payload:
+            window = min(
+                self.connection.local_flow_control_window(stream_id),
+                self.connection.max_outbound_frame_size,
+            )
+            if window <= 0:
+                if self.transport.is_closing():
+                    return
+                self.window_updated.clear()
+                await self.window_updated.wait()
+                continue
+            chunk, payload = payload[:window], payload[window:]
+            self.connection.send_data(stream_id, chunk, end_stream=not payload)
+            self.transport.write(self.connection.data_to_send())
+
+
+class H2StubServer(object):
+    """ Runs the HTTP/2 stand-in on a background event loop. Takes the options of
+    `benchmarks.server.StubServer` (except error injection) and:
+
+    :param max_concurrent_streams: Streams a client may open per connection. Default: 1000.
+    """
+
+    base_path = "/api/v3/"
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        template_count=2,
+        document_size=32,
+        archive_members=3,
+        latency=0,
+        max_concurrent_streams=1000,
+    ):
+        self.host = host
+        self.port = port
+        self.template_count = template_count
+        self.latency = latency
+        self.max_concurrent_streams = max_concurrent_streams
+        self.document = (b"%PDF-1.7\n" * (document_size // 9 + 1))[:document_size]
+        self.document_base64 = base64.b64encode(self.document).decode()
+        self.archive = make_archive(self.document, archive_members)
+        self.archive_base64 = base64.b64encode(self.archive).decode()
+        self.request_count = 0
+        self.connection_count = 0
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._server = None
+
+    @property
+    def api_url(self):
+        return "http://{host}:{port}{path}".format(
+            host=self.host, port=self.port, path=self.base_path
+        )
+
+    def start(self):
+        self.thread.start()
+        self._server = asyncio.run_coroutine_threadsafe(
+            self.loop.create_server(
+                lambda: H2Protocol(self), self.host, self.port, backlog=1024
+            ),
+            self.loop,
+        ).result()
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    def stop(self):
+        async def close():
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(close(), self.loop).result(timeout=5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
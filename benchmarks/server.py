@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.server
+~~~~~~~~~~~~~~~~~
+
+A local stand-in for the PDFGeneratorAPI.com v3 endpoints used by the wrapper.
+
+Usage::
+
+  >>> with StubServer() as server:
+  ...     client = PDFGenerator(api_key="key", api_secret="secret", api_url=server.api_url)
+  ...     client.all_templates()
+
+  $ python -m benchmarks.server --port 8000 --latency 0.05 --error-rate 0.01
+  $ python -m benchmarks.server --latency 0.05 --slow-rate 0.05 --slow-latency 1
+"""
+
+import argparse
+import base64
+import gzip
+import hashlib
+import io
+import json
+import random
+import re
+import threading
+import time
+import zipfile
+import zlib
+from collections import deque
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TEMPLATE = {
+    "id": 24382,
+    "name": "Invoice template",
+    "modified": "2017-10-30 16:49:28",
+    "owner": True,
+    "tags": ["order", "invoice"],
+}
+
+DECOMPRESSORS = {"gzip": gzip.decompress, "deflate": zlib.decompress}
+
+
+def make_archive(document, members):
+    """ Returns a zip of `members` copies of `document`, the answer to format=zip. """
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as f:
+        for i in range(members):
+            f.writestr("documents/{0}.pdf".format(i), document)
+    return archive.getvalue()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    routes = [
+        ("GET", re.compile(r"^templates$"), "all_templates"),
+        ("POST", re.compile(r"^templates$"), "create_template"),
+        ("GET", re.compile(r"^templates/(\d+)$"), "get_template"),
+        ("DELETE", re.compile(r"^templates/(\d+)$"), "delete_template"),
+        ("POST", re.compile(r"^templates/(\d+)/copy$"), "copy_template"),
+        ("POST", re.compile(r"^templates/(\d+)/output$"), "create_document"),
+        ("GET", re.compile(r"^share/(\d+)$"), "share_document"),
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method):
+        with self.server.stats_lock:
+            self.server.request_count += 1
+            self.server.connections.add(self.client_address)
+
+        length = int(self.headers.get("Content-Length") or 0)
+        self.body = self.rfile.read(length) if length else b""
+        content_encoding = self.headers.get("Content-Encoding")
+        if content_encoding:
+            with self.server.stats_lock:
+                self.server.compressed_request_count += 1
+            if (
+                content_encoding not in DECOMPRESSORS
+                or not self.server.accept_compressed
+            ):
+                return self.send_json(415, {"error": "Unsupported Media Type"})
+            self.body = DECOMPRESSORS[content_encoding](self.body)
+        latency = self.server.latency
+        try:
+            latency += self.server.scripted_delays.popleft()
+        except IndexError:
+            if (
+                self.server.slow_rate
+                and self.server.random.random() < self.server.slow_rate
+            ):
+                latency += self.server.slow_latency
+        if latency:
+            time.sleep(latency)
+        try:
+            status, headers = self.server.scripted_errors.popleft()
+        except IndexError:
+            pass
+        else:
+            return self.send_json(status, {"error": "Scripted error"}, headers)
+        if (
+            self.server.error_rate
+            and self.server.random.random() < self.server.error_rate
+        ):
+            return self.send_json(
+                self.server.error_status,
+                {"error": "Random error"},
+                {"Retry-After": "0"},
+            )
+        path, _, query = self.path.partition("?")
+        self.query = {key: values[0] for key, values in parse_qs(query).items()}
+        resource = path[len(self.server.base_path) :]
+        for route_method, pattern, name in self.routes:
+            match = pattern.match(resource)
+            if route_method == method and match:
+                status, payload = getattr(self, name)(*match.groups())
+                if isinstance(payload, bytes):
+                    return self.send_body(status, payload, "application/pdf")
+                return self.send_json(status, payload)
+        self.send_json(404, {"error": "Entity not found", "status": 404})
+
+    def send_json(self, status, payload, headers=None):
+        # Like the real API, forward slashes are escaped.
+        body = json.dumps(payload).replace("/", "\\/").encode("utf-8")
+        self.send_body(status, body, "application/json", headers)
+
+    def send_body(self, status, body, content_type, headers=None):
+        etag = None
+        if self.command == "GET" and status == 200:
+            etag = '"{0}"'.format(hashlib.md5(body).hexdigest())
+            if self.headers.get("If-None-Match") == etag:
+                status, body = 304, b""
+        if (
+            self.server.compress_responses
+            and body
+            and "gzip" in self.headers.get("Accept-Encoding", "")
+        ):
+            body = gzip.compress(body)
+            headers = dict(headers or {}, **{"Content-Encoding": "gzip"})
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def all_templates(self):
+        ids = range(self.server.template_count)
+        if "per_page" in self.query:
+            per_page = int(self.query["per_page"])
+            start = (int(self.query.get("page", 1)) - 1) * per_page
+            ids = ids[start : start + per_page]
+        return 200, {"response": [dict(TEMPLATE, id=TEMPLATE["id"] + i) for i in ids]}
+
+    def get_template(self, template_id):
+        return 200, {"response": dict(TEMPLATE, id=int(template_id))}
+
+    def create_template(self):
+        name = json.loads(self.body.decode("utf-8")).get("name")
+        return 200, {"response": dict(TEMPLATE, name=name)}
+
+    def copy_template(self, template_id):
+        return 200, {"response": dict(TEMPLATE, id=int(template_id) + 1)}
+
+    def delete_template(self, template_id):
+        return 200, {"response": {"success": True}}
+
+    def create_document(self, template_id):
+        output = self.query.get("output", "base64")
+        archive = self.query.get("format") == "zip"
+        if output == "I":
+            return 200, self.server.archive if archive else self.server.document
+        if output == "url":
+            document = "{0}share/{1}".format(self.server.api_url, template_id)
+        elif archive:
+            document = self.server.archive_base64
+        else:
+            document = self.server.document_base64
+        return (
+            200,
+            {
+                "response": document,
+                "meta": {
+                    "name": "{0}.pdf".format(template_id),
+                    "display_name": str(template_id),
+                    "encoding": "base64",
+                    "content-type": "application/pdf",
+                },
+            },
+        )
+
+    def share_document(self, template_id):
+        return 200, self.server.document
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class StubServer(object):
+    """ Runs a `StubHandler` server on a background thread.
+
+    :param host: Interface to bind. Default: 127.0.0.1.
+    :param port: Port to bind. Default: 0 (any free port).
+    :param template_count: Number of templates returned by the `templates` listing. Default: 2.
+    :param document_size: Size in bytes of the generated documents. Default: 32.
+    :param archive_members: Number of documents in zip (format=zip) documents. Default: 3.
+    :param latency: Seconds every answer is delayed by. Default: 0.
+    :param slow_rate: Share of requests, between 0 and 1, delayed by `slow_latency` more,
+                      like the answers of a slow backend node. Default: 0.
+    :param slow_latency: Extra seconds of the slow answers. Default: 1.
+    :param error_rate: Share of requests, between 0 and 1, answered with `error_status`.
+                       Default: 0.
+    :param error_status: Status of the random errors. Default: 500.
+    :param seed: Seed of the random errors. Default: None.
+    :param accept_compressed: Decode gzip/deflate request bodies, 415 otherwise. Default: True.
+    :param compress_responses: gzip answers to clients accepting it. Default: False.
+    """
+
+    base_path = "/api/v3/"
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        template_count=2,
+        document_size=32,
+        archive_members=3,
+        latency=0,
+        slow_rate=0.0,
+        slow_latency=1.0,
+        error_rate=0.0,
+        error_status=500,
+        seed=None,
+        accept_compressed=True,
+        compress_responses=False,
+        handler=StubHandler,
+    ):
+        self.httpd = StubHTTPServer((host, port), handler)
+        self.httpd.base_path = self.base_path
+        self.httpd.api_url = self.api_url
+        self.httpd.template_count = template_count
+        self.httpd.latency = latency
+        self.httpd.slow_rate = slow_rate
+        self.httpd.slow_latency = slow_latency
+        self.httpd.error_rate = error_rate
+        self.httpd.error_status = error_status
+        self.httpd.random = random.Random(seed)
+        self.httpd.accept_compressed = accept_compressed
+        self.httpd.compress_responses = compress_responses
+        self.httpd.compressed_request_count = 0
+        self.httpd.document = (b"%PDF-1.7\n" * (document_size // 9 + 1))[:document_size]
+        self.httpd.document_base64 = base64.b64encode(self.httpd.document).decode()
+        self.httpd.archive = make_archive(self.httpd.document, archive_members)
+        self.httpd.archive_base64 = base64.b64encode(self.httpd.archive).decode()
+        self.httpd.stats_lock = threading.Lock()
+        self.httpd.request_count = 0
+        self.httpd.connections = set()
+        self.httpd.scripted_errors = deque()
+        self.httpd.scripted_delays = deque()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def api_url(self):
+        host, port = self.httpd.server_address[:2]
+        return "http://{host}:{port}{path}".format(
+            host=host, port=port, path=self.base_path
+        )
+
+    @property
+    def request_count(self):
+        return self.httpd.request_count
+
+    @property
+    def compressed_request_count(self):
+        """ Number of requests received with a compressed body. """
+        return self.httpd.compressed_request_count
+
+    @property
+    def connection_count(self):
+        """ Number of distinct client connections seen so far. """
+        return len(self.httpd.connections)
+
+    def queue_errors(self, status, count=1, headers=None):
+        """ Answers the next `count` requests, whatever they are, with `status`. """
+        for _ in range(count):
+            self.httpd.scripted_errors.append((status, headers or {}))
+
+    def queue_delays(self, seconds, count=1):
+        """ Delays the answers to the next `count` requests by `seconds` more. """
+        for _ in range(count):
+            self.httpd.scripted_delays.append(seconds)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--template-count", type=int, default=2)
+    parser.add_argument("--document-size", type=int, default=32)
+    parser.add_argument("--archive-members", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    server = StubServer(
+        host=args.host,
+        port=args.port,
+        template_count=args.template_count,
+        document_size=args.document_size,
+        archive_members=args.archive_members,
+        latency=args.latency,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    # The first line of output is the API URL, `benchmarks.suite` reads it.
+    print(server.api_url, flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.suite
+~~~~~~~~~~~~~~~~
+
+Requests/sec, p50/p99 latency, CPU time per call and peak traced memory of every
+`PDFGenerator` method and of the response parsing path, written as JSON so releases can
+be compared. The stand-in server runs in a subprocess, CPU and memory are the client's.
+
+Usage::
+
+  $ python -m benchmarks.suite --calls 500 --output results.json
+  $ python -m benchmarks.suite --latency 0.02 --error-rate 0.05 --baseline results.json
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from requests.exceptions import RequestException
+
+from pdfgeneratorapi import PDFGenerator, __version__
+from pdfgeneratorapi.exceptions import PDFGeneratorAPIException
+from pdfgeneratorapi.response import PDFGeneratorResponse
+from pdfgeneratorapi.utils import dict_to_object
+
+from .bench_response import all_templates_payload, touch
+
+# Lower is better for every metric except requests/sec.
+REGRESSION_METRICS = ("rps", "p50_ms", "p99_ms", "cpu_us_per_call", "peak_memory_kb")
+
+
+def client_calls(client):
+    """ Returns {name: callable(i)} for every method, each performing one call. """
+    data = {"name": "Sameer Kumar", "items": [{"id": i} for i in range(20)]}
+    return {
+        "all_templates": lambda i: client.all_templates(),
+        "get_template": lambda i: client.get_template(template_id=i),
+        "create_template": lambda i: client.create_template(name="bench"),
+        "create_template_copy": lambda i: client.create_template_copy(template_id=i),
+        "delete_template": lambda i: client.delete_template(template_id=i),
+        "create_document": lambda i: client.create_document(template_id=1, data=data),
+        "get_editor_url": lambda i: client.get_editor_url(template_id=i, data=data),
+    }
+
+
+def parse_calls(template_count):
+    listing = all_templates_payload(template_count)
+    template = {"response": listing["response"][0]}
+    return {
+        "parse.dict_to_object": lambda i: dict_to_object(listing),
+        "parse.all_fields": lambda i: touch(dict_to_object(listing)),
+        "parse.PDFGeneratorResponse": lambda i: touch(
+            PDFGeneratorResponse(template["response"])
+        ),
+    }
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[
+        min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    ]
+
+
+def measure(func, calls):
+    """ Runs `func` `calls` times in this thread, then once more under tracemalloc. """
+    latencies = []
+    errors = 0
+    cpu_start = time.thread_time()
+    start = time.perf_counter()
+    for i in range(calls):
+        call_start = time.perf_counter()
+        try:
+            func(i)
+        except (PDFGeneratorAPIException, RequestException):
+            errors += 1
+        latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+    cpu = time.thread_time() - cpu_start
+
+    # Traced separately, tracemalloc slows allocations down.
+    tracemalloc.start()
+    try:
+        func(calls)
+    except (PDFGeneratorAPIException, RequestException):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "calls": calls,
+        "errors": errors,
+        "error_rate": errors / float(calls),
+        "rps": calls / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1e3,
+        "p99_ms": percentile(latencies, 0.99) * 1e3,
+        "cpu_us_per_call": cpu / calls * 1e6,
+        "peak_memory_kb": peak / 1024.0,
+    }
+
+
+def run_suite(api_url, calls=200, parse_calls_count=20, template_count=100, only=None):
+    """ Returns {name: metrics} for the client methods against `api_url` and the parse path. """
+    results = {}
+    with PDFGenerator(
+        api_key="key",
+        api_secret="secret",
+        workspace="bench@example.com",
+        api_url=api_url,
+    ) as client:
+        benchmarks = [
+            (name, func, calls) for name, func in client_calls(client).items()
+        ]
+        benchmarks += [
+            (name, func, parse_calls_count)
+            for name, func in parse_calls(template_count).items()
+        ]
+        for name, func, count in benchmarks:
+            if only and name not in only:
+                continue
+            # Warms up the connection pool and caches.
+            try:
+                func(0)
+            except (PDFGeneratorAPIException, RequestException):
+                pass
+            results[name] = measure(func, count)
+    return results
+
+
+def regressions(results, baseline, tolerance):
+    """ Yields (name, metric, baseline value, value) worse than `baseline` by more than
+    `tolerance` (a fraction).
+    """
+    for name, metrics in sorted(results.items()):
+        reference = baseline.get("results", {}).get(name)
+        if not reference:
+            continue
+        for metric in REGRESSION_METRICS:
+            old, new = reference.get(metric), metrics[metric]
+            if not old:
+                continue
+            if metric == "rps":
+                worse = new < old * (1 - tolerance)
+            else:
+                worse = new > old * (1 + tolerance)
+            if worse:
+                yield name, metric, old, new
+
+
+def start_server(args):
+    """ Starts `benchmarks.server` in a subprocess. Returns (process, api_url). """
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.server",
+        "--template-count",
+        str(args.template_count),
+        "--document-size",
+        str(args.document_size),
+        "--latency",
+        str(args.latency),
+        "--error-rate",
+        str(args.error_rate),
+        "--seed",
+        "0",
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, universal_newlines=True)
+    return process, process.stdout.readline().strip()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--parse-calls", type=int, default=20)
+    parser.add_argument("--template-count", type=int, default=100)
+    parser.add_argument("--document-size", type=int, default=64 * 1024)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--only", nargs="*", help="Benchmark names to run")
+    parser.add_argument("--output", help="Path of the JSON results. Default: stdout")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    process, api_url = start_server(args)
+    try:
+        results = run_suite(
+            api_url,
+            calls=args.calls,
+            parse_calls_count=args.parse_calls,
+            template_count=args.template_count,
+            only=args.only,
+        )
+    finally:
+        process.terminate()
+        process.wait()
+
+    report = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "options": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "baseline")
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+    for name, metrics in sorted(results.items()):
+        print(
+            "{0:>28}: {rps:9.1f} req/s  p50 {p50_ms:7.2f} ms  p99 {p99_ms:7.2f} ms  "
+            "{cpu_us_per_call:8.1f} us CPU  {peak_memory_kb:8.1f} KB  "
+            "{errors} errors".format(name, **metrics),
+            file=sys.stderr,
+        )
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        found = list(regressions(results, baseline, args.tolerance))
+        for name, metric, old, new in found:
+            print(
+                "REGRESSION {0} {1}: {2:.2f} -> {3:.2f}".format(name, metric, old, new),
+                file=sys.stderr,
+            )
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -22,3 +22,5 @@ This API supports the JSON media type, and uses UTF-8 character encoding.
  """
 __version__ = "0.2"
 from .wrapper import PDFGenerator
+from .async_wrapper import AsyncPDFGenerator
+from .routing import ClientPool
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.__main__
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+Runs the command line interface: python -m pdfgeneratorapi batch jobs.jsonl
+"""
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
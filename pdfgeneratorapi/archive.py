@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.archive
+~~~~~~~~~~~~~~~~~~~~~~~
+
+This module contains the zip document reader returned by `PDFGenerator.create_document_archive`.
+"""
+
+import os
+import shutil
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from .constants import STREAM_CHUNK_SIZE
+from .exceptions import InvalidFormat
+
+
+def member_path(directory, name):
+    """ Returns the path `name` is extracted to under `directory`. Like `ZipFile.extract`,
+    absolute paths, drive letters and .. components are dropped, so that no member lands
+    outside `directory`.
+    """
+    name = name.replace("\\", "/")
+    parts = [
+        part
+        for part in os.path.splitdrive(name)[1].split("/")
+        if part not in ("", ".", "..")
+    ]
+    if not parts:
+        raise InvalidFormat("{0!r} is not a valid member name.".format(name))
+    return os.path.join(directory, *parts)
+
+
+class DocumentArchive(object):
+    """ A zip document read lazily from a seekable file: only its central directory is
+    loaded up front, members are decompressed while they are read. The file is closed
+    with the archive.
+
+    :param fileobj: Binary file object holding the zip, e.g. a spooled temporary file.
+
+    Usage::
+
+      >>> with pdfg_client.create_document_archive(template_id=123, data=statements) as archive:
+      ...     for info, stream in archive:
+      ...         upload(info.filename, stream)
+      >>> with pdfg_client.create_document_archive(template_id=123, data=statements) as archive:
+      ...     archive.extract_all('statements/', max_workers=8)
+       ['statements/documents/0.pdf', ...]
+    """
+
+    def __init__(self, fileobj):
+        self.file = fileobj
+        try:
+            self.zipfile = zipfile.ZipFile(fileobj)
+        except zipfile.BadZipFile as exc:
+            raise InvalidFormat("The document is not a zip archive: {0}".format(exc))
+
+    def members(self):
+        """ Returns the <zipfile.ZipInfo> of every file in the archive. """
+        return [info for info in self.zipfile.infolist() if not info.is_dir()]
+
+    def names(self):
+        return [info.filename for info in self.members()]
+
+    def __len__(self):
+        return len(self.members())
+
+    def __iter__(self):
+        """ Yields (<zipfile.ZipInfo>, binary stream) pairs. A stream is closed when the
+        next pair is yielded.
+        """
+        for info in self.members():
+            with self.zipfile.open(info) as stream:
+                yield info, stream
+
+    def open(self, member):
+        """ Returns a binary stream of `member`, a name or a <zipfile.ZipInfo>. """
+        return self.zipfile.open(member)
+
+    def extract(self, member, directory, chunk_size=STREAM_CHUNK_SIZE):
+        """ Writes `member` under `directory`, chunk by chunk. Returns its path. """
+        if not isinstance(member, zipfile.ZipInfo):
+            member = self.zipfile.getinfo(member)
+        path = member_path(directory, member.filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.zipfile.open(member) as stream, open(path, "wb") as target:
+            shutil.copyfileobj(stream, target, chunk_size)
+        return path
+
+    def extract_all(self, directory, max_workers=4, chunk_size=STREAM_CHUNK_SIZE):
+        """ Extracts every member under `directory` on `max_workers` threads. Reads of the
+        archive file are serialised, decompression and writes run in parallel.
+        Returns the paths written, in archive order.
+        """
+        members = self.members()
+        if max_workers <= 1 or len(members) <= 1:
+            return [self.extract(info, directory, chunk_size) for info in members]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(
+                executor.map(
+                    lambda info: self.extract(info, directory, chunk_size), members
+                )
+            )
+
+    def close(self):
+        self.zipfile.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
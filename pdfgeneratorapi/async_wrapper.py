@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.async_wrapper
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+This module contains the asyncio resource wrapper for PDFGeneratorAPI.com.
+It requires `httpx` (pip install pdfgeneratorapi[async]).
+"""
+
+import asyncio
+
+import requests
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+from .compression import COMPRESSION_REFUSED_STATUS_CODES
+from .deadline import Deadline, run_with_deadline, timeout_error
+from .decorators import make_async_response
+from .exceptions import IncorrectParameterError, InternalServerError
+from .hedging import HedgePolicy
+from .instrumentation import RequestInfo, Timings
+from .transport import AsyncHTTP2Transport, Transport, httpx_timeout
+from .wrapper import APIBase
+
+
+class AsyncPDFGenerator(APIBase):
+    """ The asyncio counterpart of `PDFGenerator`. Takes the same parameters as `APIBase` and:
+
+    :param max_concurrency: Maximum number of requests in flight at once. Calls above the
+                            limit wait for a free slot. Default: 100.
+    :param hedge: Hedge `create_document` calls, see `PDFGenerator`. The request which
+                  loses is cancelled at once. Default: None (no hedging).
+
+    Requests are sent with httpx, `transport` is not accepted. Close the client with
+    `async with` or `await aclose()`, `close()` and `with` raise <TypeError>.
+
+    With `http2=True`, requests are multiplexed over `http2_connections` HTTP/2 connections
+    per region with at most `max_streams_per_connection` streams each, see
+    <transport.AsyncHTTP2Transport>.
+
+    Every call takes `timeout` and `deadline` like the `PDFGenerator` ones. A deadline
+    expiring, or cancelled from any thread or task, interrupts the call at once.
+
+    Functions under this class (all coroutines):
+        all_templates()
+        get_template()
+        create_template()
+        create_template_copy()
+        delete_template()
+        create_document()
+
+    Usage::
+
+      >>> from pdfgeneratorapi import AsyncPDFGenerator
+      >>> async with AsyncPDFGenerator(max_concurrency=50) as pdfg_client:
+      ...     documents = await asyncio.gather(
+      ...         *[pdfg_client.create_document(template_id=123, data=row) for row in rows]
+      ...     )
+    """
+
+    def __init__(self, **kwargs):
+        if httpx is None:
+            raise ImportError(
+                "AsyncPDFGenerator requires httpx: pip install pdfgeneratorapi[async]"
+            )
+        if kwargs.get("transport") is not None:
+            raise IncorrectParameterError(
+                "AsyncPDFGenerator sends its requests with httpx and takes no transport."
+            )
+        super(AsyncPDFGenerator, self).__init__(**kwargs)
+        self.max_concurrency = kwargs.get("max_concurrency", 100)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        hedge = kwargs.get("hedge")
+        if hedge is True:
+            hedge = HedgePolicy()
+        self.hedge = hedge or None
+        if self.http2:
+            self._client = AsyncHTTP2Transport(
+                max_connections=self.http2_connections,
+                max_streams=self.max_streams_per_connection,
+                pool_maxsize=self.pool_maxsize,
+                keep_alive=self.keep_alive,
+            )
+        else:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.pool_maxsize,
+                    max_keepalive_connections=(
+                        self.pool_maxsize if self.keep_alive else 0
+                    ),
+                ),
+            )
+
+    def _default_transport(self, pool_block):
+        # Requests are sent with the httpx client above.
+        return Transport()
+
+    def __enter__(self):
+        raise TypeError("Use AsyncPDFGenerator with `async with`.")
+
+    def close(self):
+        raise TypeError("Close AsyncPDFGenerator with `await pdfg_client.aclose()`.")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    async def aclose(self):
+        """ Closes all pooled connections. """
+        await self._client.aclose()
+
+    async def _request(
+        self, method, resource, params=None, json=None, timeout=None, deadline=None
+    ):
+        """ Sends a signed request for `resource` once a concurrency slot is free.
+        :param method: HTTP method.
+        :param resource: Resource endpoint that needs to be hit. ..API_URL../<RESOURCE>
+        :param timeout: Seconds, or (connect, read) seconds, overriding the client's.
+        :param deadline: <deadline.Deadline>, or seconds, of the call, the wait for a
+                         concurrency slot included.
+        Returns a <httpx.Response>.
+        """
+        deadline = Deadline.coerce(deadline)
+        if deadline is None:
+            return await self._send_request(method, resource, params, json, timeout)
+        deadline.check()
+        return await run_with_deadline(
+            self._send_request(method, resource, params, json, timeout, deadline),
+            deadline,
+        )
+
+    async def _send_request(
+        self, method, resource, params, json, timeout=None, deadline=None
+    ):
+        """ `_request` without the deadline enforcement. """
+        hooks = self.hooks
+        if hooks["pre_request"] or hooks["post_request"]:
+            return await self._instrumented_request(
+                method, resource, params, json, timeout, deadline
+            )
+        async with self._semaphore:
+            return await self._send(
+                method,
+                "{api_url}{resource}".format(api_url=self.API_URL, resource=resource),
+                self.prepare_headers(resource),
+                params,
+                None if json is None else self.codec.dumps(json),
+                timeout=timeout,
+                deadline=deadline,
+            )
+
+    async def _send(
+        self,
+        method,
+        url,
+        headers,
+        params,
+        data,
+        info=None,
+        timeout=None,
+        deadline=None,
+    ):
+        """ Sends a request, compressing its body like `PDFGenerator` does. """
+        request_timeout = self.request_timeout(timeout, deadline)
+        body, encoding = self._compress_body(data)
+        if info is not None:
+            info.bytes_sent = 0 if body is None else len(body)
+        if encoding is None:
+            return await self._client_request(
+                method, url, headers, params, data, request_timeout
+            )
+
+        response = await self._client_request(
+            method,
+            url,
+            dict(headers, **{"Content-Encoding": encoding}),
+            params,
+            body,
+            request_timeout,
+        )
+        if response.status_code not in COMPRESSION_REFUSED_STATUS_CODES:
+            return response
+        response = await self._client_request(
+            method, url, headers, params, data, request_timeout
+        )
+        if response.status_code not in COMPRESSION_REFUSED_STATUS_CODES:
+            self.request_encoding = None
+        if info is not None:
+            info.bytes_sent += len(data)
+        return response
+
+    async def _client_request(self, method, url, headers, params, content, timeout):
+        """ Sends a request with the httpx client within the (connect, read) `timeout`.
+        Timeouts raise <RequestTimeout>, other transport errors <requests.ConnectionError>
+        like `PDFGenerator`.
+        """
+        try:
+            return await self._client.request(
+                method,
+                url=url,
+                headers=headers,
+                params=params,
+                content=content,
+                timeout=httpx_timeout(timeout),
+            )
+        except httpx.TimeoutException as exc:
+            raise timeout_error(exc, timeout)
+        except httpx.TransportError as exc:
+            raise requests.exceptions.ConnectionError(exc)
+
+    async def _instrumented_request(
+        self, method, resource, params, json, timeout=None, deadline=None
+    ):
+        """ `_request` timing every phase and running the hooks. See `APIBase._request`. """
+        info = RequestInfo(method, resource, params)
+        self._dispatch_hooks("pre_request", info)
+        info.timings = timings = Timings()
+        async with self._semaphore:
+            timings.mark("queue")
+            headers = self.prepare_headers(resource)
+            timings.mark("sign")
+            content = None if json is None else self.codec.dumps(json)
+            timings.mark("encode")
+            try:
+                response = await self._send(
+                    method,
+                    "{api_url}{resource}".format(
+                        api_url=self.API_URL, resource=resource
+                    ),
+                    headers,
+                    params,
+                    content,
+                    info,
+                    timeout,
+                    deadline,
+                )
+            except Exception as exc:
+                timings.mark("wait")
+                info.exception = exc
+                self._dispatch_hooks("post_request", info)
+                raise
+            # httpx reads the body within the request, it is part of `wait`.
+            timings.mark("wait")
+        info.status_code = response.status_code
+        info.response = response
+        info.bytes_received = response.num_bytes_downloaded
+        response.timings = timings
+        self._dispatch_hooks("post_request", info)
+        return response
+
+    @make_async_response
+    async def all_templates(
+        self, access: list = None, tags: list = None, timeout=None, deadline=None
+    ):
+        """ Returns list of templates in the workspace. See `PDFGenerator.all_templates`. """
+        resource = "templates"
+        request_params = self._templates_params(access, tags)
+        return await self._request(
+            "GET", resource, request_params, timeout=timeout, deadline=deadline
+        )
+
+    @make_async_response
+    async def get_template(self, template_id: int, timeout=None, deadline=None):
+        """ Returns template configuration. See `PDFGenerator.get_template`. """
+        resource = "templates/{template_id}".format(template_id=str(template_id))
+        return await self._request("GET", resource, timeout=timeout, deadline=deadline)
+
+    @make_async_response
+    async def create_template(self, name, timeout=None, deadline=None):
+        """ Creates a blank template with given name. See `PDFGenerator.create_template`. """
+        resource = "templates"
+        return await self._request(
+            "POST", resource, json={"name": name}, timeout=timeout, deadline=deadline
+        )
+
+    @make_async_response
+    async def create_template_copy(
+        self, template_id: int, name: str = "", timeout=None, deadline=None
+    ):
+        """ Creates a copy of a template to the workspace. See `PDFGenerator.create_template_copy`. """
+        resource = "templates/{template_id}/copy".format(template_id=str(template_id))
+        request_params = {"name": name}
+        return await self._request(
+            "POST", resource, request_params, timeout=timeout, deadline=deadline
+        )
+
+    @make_async_response
+    async def delete_template(self, template_id: int, timeout=None, deadline=None):
+        """ Deletes a Template. See `PDFGenerator.delete_template`. """
+        resource = "templates/{template_id}".format(template_id=str(template_id))
+        return await self._request(
+            "DELETE", resource, timeout=timeout, deadline=deadline
+        )
+
+    @make_async_response
+    async def create_document(
+        self,
+        template_id: int,
+        data: dict,
+        document_format: str = None,
+        response_format: str = None,
+        timeout=None,
+        deadline=None,
+    ):
+        """ Merges template with data. See `PDFGenerator.create_document`. """
+        resource = "templates/{template_id}/output".format(template_id=str(template_id))
+        request_params = self._document_params(document_format, response_format)
+        if self.hedge is None:
+            return await self._request(
+                "POST", resource, request_params, data, timeout, deadline
+            )
+        return await self.hedge.arun(
+            lambda attempt: self._hedged_attempt(
+                resource, request_params, data, timeout, attempt
+            ),
+            Deadline.coerce(deadline),
+        )
+
+    async def _hedged_attempt(self, resource, params, data, timeout, deadline):
+        """ Sends one request of a hedged call. See `PDFGenerator._hedged_attempt`. """
+        response = await self._request(
+            "POST", resource, params, data, timeout, deadline
+        )
+        if response.status_code >= 500:
+            raise InternalServerError(
+                "{0} answer to a hedged request.".format(response.status_code), response
+            )
+        return response
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.batch
+~~~~~~~~~~~~~~~~~~~~~
+
+This module contains the bulk document generation used by `PDFGenerator.create_documents`
+and the `pdfgeneratorapi batch` command.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .exceptions import IncorrectParameterError, PDFGeneratorAPIException
+
+JOB_FIELDS = ("template_id", "data", "document_format", "response_format")
+
+
+def normalize_job(job):
+    """ Turns a job into `create_document` keyword arguments.
+    A job is either a dict of `create_document` arguments or a
+    (template_id, data[, document_format[, response_format]]) tuple.
+    """
+    if isinstance(job, dict):
+        return job
+    if isinstance(job, (tuple, list)) and 2 <= len(job) <= len(JOB_FIELDS):
+        return dict(zip(JOB_FIELDS, job))
+    raise IncorrectParameterError("{0!r} is not a valid document job.".format(job))
+
+
+class DocumentResult(object):
+    """ The outcome of one job of a batch.
+
+    :param index: Position of the job in the input.
+    :param job: The job as passed in.
+    :param response: <PDFGeneratorResponse> of the generated document, None on failure.
+    :param exception: <PDFGeneratorAPIException> raised by the job, None on success.
+    :param elapsed: Seconds the job took.
+    """
+
+    __slots__ = ("index", "job", "response", "exception", "elapsed")
+
+    def __init__(self, index, job, response=None, exception=None, elapsed=0.0):
+        self.index = index
+        self.job = job
+        self.response = response
+        self.exception = exception
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.exception is None
+
+    def __repr__(self):
+        return "<DocumentResult index={0} ok={1}>".format(self.index, self.ok)
+
+
+class DocumentBatch(object):
+    """ Runs `create_document` for many jobs on a thread pool while it is iterated.
+    At most `2 * max_workers` jobs are pending at a time, so `jobs` can be a lazy iterable.
+
+    :param client: The <PDFGenerator> used for every job.
+    :param jobs: Iterable of jobs, see `normalize_job`.
+    :param max_workers: Number of worker threads.
+    :param ordered: Yield results in input order (True) or as they complete (False).
+    :param progress: Optional callable, called as `progress(result, batch)` after every job.
+    :param timeout: Seconds, or (connect, read) seconds, of the requests of every job.
+    :param deadline: <deadline.Deadline> of the whole batch. Once it expires or is
+                     cancelled no further job starts and the jobs in flight fail.
+
+    Usage::
+
+      >>> batch = pdfg_client.create_documents(jobs, max_workers=16)
+      >>> for result in batch:
+      ...     if not result.ok:
+      ...         log.error(result.exception)
+      >>> batch.throughput
+       412.3
+    """
+
+    def __init__(
+        self,
+        client,
+        jobs,
+        max_workers,
+        ordered=True,
+        progress=None,
+        timeout=None,
+        deadline=None,
+    ):
+        self.client = client
+        self.jobs = jobs
+        self.max_workers = max_workers
+        self.ordered = ordered
+        self.progress = progress
+        self.timeout = timeout
+        self.deadline = deadline
+        self.total = len(jobs) if hasattr(jobs, "__len__") else None
+        self.completed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self):
+        """ Seconds since the batch started, or its total duration once finished. """
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def throughput(self):
+        """ Completed documents per second. """
+        elapsed = self.elapsed
+        return self.completed / elapsed if elapsed else 0.0
+
+    def _run_job(self, index, job):
+        start = time.perf_counter()
+        try:
+            kwargs = {"timeout": self.timeout, "deadline": self.deadline}
+            kwargs.update(normalize_job(job))
+            response = self.client.create_document(**kwargs)
+        except PDFGeneratorAPIException as exc:
+            result = DocumentResult(index, job, exception=exc)
+        except Exception as exc:
+            # Transport errors and unreadable answers (an HTML 502 from a proxy) fail
+            # their job only.
+            result = DocumentResult(index, job, exception=PDFGeneratorAPIException(exc))
+        else:
+            result = DocumentResult(index, job, response=response)
+        result.elapsed = time.perf_counter() - start
+        with self._lock:
+            self.completed += 1
+            if result.ok:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+        if self.progress is not None:
+            self.progress(result, self)
+        return result
+
+    def __iter__(self):
+        self.started_at = time.perf_counter()
+        window = 2 * self.max_workers
+        jobs = enumerate(self.jobs)
+        pending = deque()
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for index, job in jobs:
+                    if self.deadline is not None and self.deadline.done:
+                        break
+                    pending.append(executor.submit(self._run_job, index, job))
+                    if len(pending) < window:
+                        continue
+                    for result in self._drain(pending, window - 1):
+                        yield result
+                for result in self._drain(pending, 0):
+                    yield result
+        finally:
+            self.finished_at = time.perf_counter()
+
+    def _drain(self, pending, keep):
+        """ Yields finished results until at most `keep` futures are pending. """
+        while len(pending) > keep:
+            if self.ordered:
+                yield pending.popleft().result()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    yield future.result()
+
+    def run(self):
+        """ Runs the whole batch and returns the list of <DocumentResult>. """
+        return list(self)
+
+
+class Checkpoint(object):
+    """ Append-only record of the finished jobs of a batch, one JSON line per job, so that
+    an interrupted run resumes where it stopped. Lines are flushed as they are written
+    and a line torn by a crash is ignored when the file is loaded again.
+
+    :param path: File path of the checkpoint, created when missing.
+
+    Usage::
+
+      >>> with Checkpoint('jobs.checkpoint') as checkpoint:
+      ...     if 12 not in checkpoint:
+      ...         checkpoint.record(12, ok=True, bytes=10240)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        torn = False
+        if os.path.exists(path):
+            torn = self._load()
+        self._file = open(path, "a", encoding="utf-8")
+        if torn:
+            self._file.write("\n")
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """ Reads the succeeded jobs. Returns True when the last line is incomplete. """
+        line = "\n"
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("ok"):
+                    self.done.add(entry["job"])
+        return not line.endswith("\n")
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def __len__(self):
+        return len(self.done)
+
+    def record(self, key, ok, **fields):
+        """ Records the outcome of job `key`. Failed jobs are run again on resume. """
+        line = json.dumps(dict(fields, job=key, ok=ok), sort_keys=True) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if ok:
+                self.done.add(key)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.cache
+~~~~~~~~~~~~~~~~~~~~~
+
+This module contains the cache for template reads (`get_template`, `all_templates`).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheEntry(object):
+    __slots__ = ("response", "expires_at", "etag", "last_modified")
+
+    def __init__(self, response, expires_at):
+        self.response = response
+        self.expires_at = expires_at
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+
+    @property
+    def fresh(self):
+        return time.monotonic() < self.expires_at
+
+    def conditional_headers(self):
+        """ Headers revalidating this entry, empty when the server sent no validators. """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class TemplateCache(object):
+    """ A thread-safe LRU cache of template read responses with a time-to-live.
+    Expired entries are kept (within `maxsize`) and revalidated with ETag/If-Modified-Since
+    when the server sent validators, a 304 answer refreshes them without a new body.
+
+    :param ttl: Seconds an entry is served without asking the server. Default: 300.
+    :param maxsize: Maximum number of entries, least recently used are evicted. Default: 256.
+
+    Usage::
+
+      >>> pdfg_client = PDFGenerator(template_cache=TemplateCache(ttl=3600, maxsize=1000))
+      >>> pdfg_client.template_cache.stats()
+       {'hits': 0, 'misses': 0, 'revalidations': 0, 'evictions': 0, 'size': 0}
+    """
+
+    def __init__(self, ttl: float = 300, maxsize: int = 256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """ Returns the <CacheEntry> for `key`, fresh or not, or None. Counts hits/misses. """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if entry.fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def set(self, key, response):
+        with self._lock:
+            self._insert(key, CacheEntry(response, time.monotonic() + self.ttl))
+
+    def revalidated(self, key, entry):
+        """ Marks `entry`, the stale entry of `key` sent for revalidation, fresh again after
+        a 304 answer. It is stored again when it was invalidated or evicted meanwhile.
+        Returns the entry.
+        """
+        with self._lock:
+            entry.expires_at = time.monotonic() + self.ttl
+            self._insert(key, entry)
+            self.revalidations += 1
+            return entry
+
+    def _insert(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, *resources):
+        """ Drops the entries of the given resources, or every entry when none is given. """
+        with self._lock:
+            if not resources:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[1] in resources]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+            }
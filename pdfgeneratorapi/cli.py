@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.cli
+~~~~~~~~~~~~~~~~~~~
+
+The `pdfgeneratorapi` command line interface.
+
+`pdfgeneratorapi batch` renders the documents described by a JSONL file, one job per line::
+
+  {"template_id": 123, "data": {"name": "Sameer"}, "format": "pdf", "output": "sameer.pdf"}
+
+`format` (document format) and `output` (file path, relative to --output-dir) are
+optional; documents without `output` are written to <job key>.<format>. A job key is the
+job `id` when it has one, its line number otherwise. Give every job an `id` if the file
+may be edited between a run and its resumption.
+
+Finished jobs are recorded in a checkpoint file (<jobs>.checkpoint by default). Running
+the same command again skips the jobs which succeeded and retries the failed ones.
+
+Exit codes: 0 when every job succeeded, 1 when some failed, 2 on usage errors, 3 when
+every job failed, 130 when interrupted.
+
+Usage::
+
+  $ pdfgeneratorapi batch jobs.jsonl --workers 32 --output-dir documents/
+  $ python -m pdfgeneratorapi batch jobs.jsonl --executor process --workers 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import (
+    ALL_COMPLETED,
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from functools import partial
+
+from . import __version__
+from .batch import Checkpoint
+from .constants import (
+    ALL_DOCUMENT_FORMATS,
+    ALL_RESPONSE_FORMATS,
+    CONNECT_TIMEOUT,
+    READ_TIMEOUT,
+    STREAM_CHUNK_SIZE,
+)
+from .exceptions import IncorrectParameterError, PDFGeneratorAPIException
+from .wrapper import PDFGenerator
+
+EXIT_OK = 0
+EXIT_PARTIAL_FAILURE = 1
+EXIT_USAGE = 2
+EXIT_FAILURE = 3
+EXIT_INTERRUPTED = 130
+
+# Distinct error messages kept for the summary, further ones are counted as "other".
+MAX_ERROR_MESSAGES = 100
+
+# The client of a worker process, see `init_worker`.
+worker_client = None
+
+
+def read_jobs(path, checkpoint=None):
+    """ Yields the (key, job) pairs of a JSONL job file, skipping blank lines and the jobs
+    `checkpoint` holds as done. A line which is not valid JSON yields its exception as job.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError as exc:
+                job = IncorrectParameterError(
+                    "Line {0} is not valid JSON: {1}".format(line_number, exc)
+                )
+            key = line_number
+            if isinstance(job, dict) and job.get("id") is not None:
+                key = job["id"]
+            if checkpoint is not None and key in checkpoint:
+                continue
+            yield key, job
+
+
+def render_job(client, key, job, output_dir, chunk_size):
+    """ Streams the document of one job to disk, through a temporary file renamed once
+    complete. Returns a (key, bytes written, error message or None) tuple.
+    """
+    path = None
+    try:
+        if isinstance(job, Exception):
+            raise job
+        if not isinstance(job, dict) or "template_id" not in job:
+            raise IncorrectParameterError("A job needs a template_id.")
+        document_format = job.get("format") or job.get("document_format")
+        path = job.get("output") or "{0}.{1}".format(
+            key, document_format or client.document_format
+        )
+        path = os.path.join(output_dir, path)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        bytes_written = client.create_document_to(
+            path + ".part",
+            template_id=job["template_id"],
+            data=job.get("data", {}),
+            document_format=document_format,
+            response_format=job.get("response_format"),
+            chunk_size=chunk_size,
+        )
+        os.replace(path + ".part", path)
+    except Exception as exc:
+        if path is not None and os.path.exists(path + ".part"):
+            os.remove(path + ".part")
+        return key, 0, "{0}: {1}".format(type(exc).__name__, exc)
+    return key, bytes_written, None
+
+
+def init_worker(client_options):
+    global worker_client
+    worker_client = PDFGenerator(**client_options)
+
+
+def render_in_worker(key, job, output_dir, chunk_size):
+    return render_job(worker_client, key, job, output_dir, chunk_size)
+
+
+class BatchRun(object):
+    """ Runs the jobs of a file on an executor, `window` jobs pending at most, recording
+    them in a checkpoint. Keeps the counters of the summary.
+
+    :param render: Callable, called as `render(key, job)` on the executor.
+    :param checkpoint: <batch.Checkpoint> the finished jobs are recorded in.
+    :param skipped: Number of jobs already done according to the checkpoint.
+    :param progress_interval: Seconds between progress lines on `stream`, 0 for none.
+    :param stream: Text stream of the progress lines and summary. Default: stderr.
+    """
+
+    def __init__(
+        self, render, checkpoint, skipped=0, progress_interval=10, stream=None
+    ):
+        self.render = render
+        self.checkpoint = checkpoint
+        self.skipped = skipped
+        self.progress_interval = progress_interval
+        self.stream = stream or sys.stderr
+        self.succeeded = 0
+        self.failed = 0
+        self.bytes_written = 0
+        self.errors = Counter()
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        self.interrupted = False
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def throughput(self):
+        """ Documents rendered per second. """
+        elapsed = self.elapsed
+        return self.succeeded / elapsed if elapsed else 0.0
+
+    def run(self, executor, jobs, window):
+        next_report = time.perf_counter() + self.progress_interval
+        pending = set()
+        try:
+            for key, job in jobs:
+                pending.add(executor.submit(self.render, key, job))
+                if len(pending) >= window:
+                    pending = self._collect(pending, FIRST_COMPLETED)
+                if self.progress_interval and time.perf_counter() >= next_report:
+                    self.report_progress()
+                    next_report = time.perf_counter() + self.progress_interval
+            self._collect(pending, ALL_COMPLETED)
+        except KeyboardInterrupt:
+            self.interrupted = True
+            for future in pending:
+                future.cancel()
+        finally:
+            self.finished_at = time.perf_counter()
+
+    def _collect(self, pending, return_when):
+        """ Waits for `pending` jobs and records the finished ones. Returns the others. """
+        done, pending = wait(pending, return_when=return_when)
+        for future in done:
+            self.record(*future.result())
+        return pending
+
+    def record(self, key, bytes_written, error):
+        if error is None:
+            self.succeeded += 1
+            self.bytes_written += bytes_written
+            self.checkpoint.record(key, ok=True, bytes=bytes_written)
+            return
+        self.failed += 1
+        self.checkpoint.record(key, ok=False, error=error)
+        if error in self.errors or len(self.errors) < MAX_ERROR_MESSAGES:
+            self.errors[error] += 1
+        else:
+            self.errors["other errors"] += 1
+
+    def report_progress(self):
+        print(
+            "{0} rendered, {1} failed, {2:.1f} documents/s".format(
+                self.succeeded, self.failed, self.throughput
+            ),
+            file=self.stream,
+        )
+
+    def report(self):
+        elapsed = self.elapsed
+        print(
+            "{0} rendered, {1} failed, {2} skipped (already done) in {3:.1f} s: "
+            "{4:.1f} documents/s, {5:.2f} MiB/s".format(
+                self.succeeded,
+                self.failed,
+                self.skipped,
+                elapsed,
+                self.throughput,
+                self.bytes_written / 1048576.0 / elapsed if elapsed else 0.0,
+            ),
+            file=self.stream,
+        )
+        if self.errors:
+            print("errors:", file=self.stream)
+            for error, count in self.errors.most_common(10):
+                print("  {0:8d}  {1}".format(count, error), file=self.stream)
+            if len(self.errors) > 10:
+                print(
+                    "  {0:8d}  in {1} more distinct errors".format(
+                        sum(count for _, count in self.errors.most_common()[10:]),
+                        len(self.errors) - 10,
+                    ),
+                    file=self.stream,
+                )
+        if self.interrupted:
+            print(
+                "interrupted, run again to resume from {0}".format(
+                    self.checkpoint.path
+                ),
+                file=self.stream,
+            )
+
+    @property
+    def exit_code(self):
+        if self.interrupted:
+            return EXIT_INTERRUPTED
+        if not self.failed:
+            return EXIT_OK
+        if not self.succeeded:
+            return EXIT_FAILURE
+        return EXIT_PARTIAL_FAILURE
+
+
+def batch(args, parser):
+    if not os.path.isfile(args.jobs):
+        parser.error("{0} is not a file".format(args.jobs))
+    client_options = {
+        name: getattr(args, name)
+        for name in ("api_key", "api_secret", "workspace", "region", "api_url")
+        if getattr(args, name) is not None
+    }
+    client_options.update(
+        document_format=args.format,
+        response_format=args.response_format,
+        http2=args.http2,
+        prune_payloads=args.prune,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+    )
+    try:
+        if args.executor == "thread":
+            client = PDFGenerator(pool_maxsize=args.workers, **client_options)
+            render = partial(render_job, client)
+            executor = ThreadPoolExecutor(max_workers=args.workers)
+        else:
+            # Fails early on missing credentials rather than in every worker.
+            PDFGenerator(**client_options).close()
+            client = None
+            render = render_in_worker
+            executor = ProcessPoolExecutor(
+                max_workers=args.workers,
+                initializer=init_worker,
+                initargs=(client_options,),
+            )
+    except PDFGeneratorAPIException as exc:
+        parser.error(str(exc))
+
+    with Checkpoint(args.checkpoint or args.jobs + ".checkpoint") as checkpoint:
+        run = BatchRun(
+            partial(render, output_dir=args.output_dir, chunk_size=args.chunk_size),
+            checkpoint,
+            skipped=len(checkpoint),
+            progress_interval=0 if args.quiet else args.progress_interval,
+        )
+        try:
+            with executor:
+                run.run(executor, read_jobs(args.jobs, checkpoint), 2 * args.workers)
+        finally:
+            if client is not None:
+                client.close()
+    run.report()
+    return run.exit_code
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="pdfgeneratorapi", description="PDFGeneratorAPI.com command line client."
+    )
+    parser.add_argument(
+        "--version", action="version", version="%(prog)s " + __version__
+    )
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    batch_parser = commands.add_parser(
+        "batch",
+        help="Render the documents of a JSONL job file.",
+        description="Render the documents of a JSONL job file, one "
+        '{"template_id", "data", "format", "output"} object per line. '
+        "Resumes from its checkpoint when run again.",
+    )
+    batch_parser.add_argument("jobs", help="JSONL job file.")
+    batch_parser.add_argument(
+        "-o", "--output-dir", default=".", help="Directory of relative output paths."
+    )
+    batch_parser.add_argument(
+        "-w", "--workers", type=int, default=16, help="Parallel jobs. Default: 16."
+    )
+    batch_parser.add_argument(
+        "--executor",
+        choices=("thread", "process"),
+        default="thread",
+        help="Run jobs on threads sharing one connection pool, or on processes each "
+        "with its own client. Default: thread.",
+    )
+    batch_parser.add_argument(
+        "--checkpoint", help="Checkpoint file. Default: <jobs>.checkpoint."
+    )
+    batch_parser.add_argument(
+        "--format",
+        choices=ALL_DOCUMENT_FORMATS,
+        default="pdf",
+        help="Document format of jobs without one. Default: pdf.",
+    )
+    batch_parser.add_argument(
+        "--response-format",
+        choices=ALL_RESPONSE_FORMATS,
+        default="base64",
+        help="How documents are fetched. Default: base64.",
+    )
+    batch_parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=STREAM_CHUNK_SIZE,
+        help="Bytes read per chunk while streaming documents to disk.",
+    )
+    batch_parser.add_argument(
+        "--progress-interval",
+        type=float,
+        default=10,
+        help="Seconds between progress lines, 0 for none. Default: 10.",
+    )
+    batch_parser.add_argument(
+        "-q", "--quiet", action="store_true", help="No progress lines."
+    )
+    batch_parser.add_argument(
+        "--api-key", help="Default: $PDF_GENERATOR_KEY.",
+    )
+    batch_parser.add_argument(
+        "--api-secret", help="Default: $PDF_GENERATOR_SECRET.",
+    )
+    batch_parser.add_argument(
+        "--workspace", help="Default: $PDF_GENERATOR_WORKSPACE.",
+    )
+    batch_parser.add_argument("--region", help="Default: us1.")
+    batch_parser.add_argument("--api-url", help="Base url of the API.")
+    batch_parser.add_argument(
+        "--http2", action="store_true", help="Multiplex requests over HTTP/2."
+    )
+    batch_parser.add_argument(
+        "--connect-timeout",
+        type=float,
+        default=CONNECT_TIMEOUT,
+        help="Seconds to open a connection. Default: {0}.".format(CONNECT_TIMEOUT),
+    )
+    batch_parser.add_argument(
+        "--read-timeout",
+        type=float,
+        default=READ_TIMEOUT,
+        help="Seconds to wait for each read of an answer. Default: {0}.".format(
+            READ_TIMEOUT
+        ),
+    )
+    batch_parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="Send only the data fields each template references.",
+    )
+    batch_parser.set_defaults(handler=batch)
+    return parser
+
+
+def main(argv=None):
+    """ Runs the command line interface. Returns the exit code. """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    return args.handler(args, parser)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.coalesce
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+This module contains the in-flight request coalescing (singleflight).
+"""
+
+import threading
+
+from .utils import canonical_hash
+
+
+def request_key(workspace, method, resource, params=None, data=None):
+    """ Returns the canonical key of a request: identical requests get identical keys. """
+    return (
+        workspace,
+        method,
+        resource,
+        tuple(sorted((params or {}).items())),
+        None if data is None else canonical_hash(data),
+    )
+
+
+class Call(object):
+    __slots__ = ("condition", "done", "result", "exception")
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.done = False
+        self.result = None
+        self.exception = None
+
+    def finish(self):
+        with self.condition:
+            self.done = True
+            self.condition.notify_all()
+
+    def wake(self):
+        with self.condition:
+            self.condition.notify_all()
+
+    def wait(self, deadline=None):
+        """ Waits until the call is done, or raises once `deadline` expires or is
+        cancelled.
+        """
+        if deadline is not None:
+            deadline.add_callback(self.wake)
+        try:
+            with self.condition:
+                while not self.done:
+                    if deadline is not None:
+                        deadline.check()
+                    self.condition.wait(
+                        None if deadline is None else deadline.remaining()
+                    )
+        finally:
+            if deadline is not None:
+                deadline.remove_callback(self.wake)
+
+
+class SingleFlight(object):
+    """ Runs one call per key at a time: concurrent calls with the key of a call in flight
+    wait for it and share its result, or its exception.
+
+    Usage::
+
+      >>> pdfg_client = PDFGenerator(coalesce=True)
+      >>> pdfg_client.coalescer.stats()
+       {'calls': 0, 'coalesced': 0, 'in_flight': 0}
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, deadline=None):
+        """ Returns `func()`, or the result of the in-flight call with the same `key`,
+        waited for until `deadline` (a <deadline.Deadline>) at most.
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.wait(deadline)
+            if call.exception is not None:
+                raise call.exception
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as exc:
+            call.exception = exc
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.finish()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._in_flight),
+            }
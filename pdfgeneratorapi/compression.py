@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.compression
+~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+This module contains the request body encodings. gzip and deflate are always available,
+brotli (br) and zstd when the `brotli` and `zstandard` packages are installed.
+"""
+
+import gzip
+import zlib
+
+from .exceptions import IncorrectParameterError
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# Statuses a server answers a compressed body it does not accept with.
+COMPRESSION_REFUSED_STATUS_CODES = frozenset([400, 415])
+
+COMPRESSORS = {
+    "gzip": lambda data, level: gzip.compress(data, level, mtime=0),
+    "deflate": lambda data, level: zlib.compress(data, level),
+}
+if brotli is not None:
+    COMPRESSORS["br"] = lambda data, level: brotli.compress(data, quality=level)
+if zstandard is not None:
+    COMPRESSORS["zstd"] = lambda data, level: zstandard.ZstdCompressor(level).compress(
+        data
+    )
+
+# Most preferred first. requests (urllib3) and httpx decode br and zstd responses when
+# the same packages are installed.
+ACCEPT_ENCODING = ", ".join(
+    encoding
+    for encoding in ("zstd", "br", "gzip", "deflate")
+    if encoding in COMPRESSORS
+)
+
+
+def get_encoding(encoding):
+    """ Returns a validated request body encoding name, None to disable compression.
+    :param encoding: gzip, deflate, br, zstd, True for gzip, or None/False.
+    """
+    if not encoding:
+        return None
+    if encoding is True:
+        return "gzip"
+    if encoding not in COMPRESSORS:
+        raise IncorrectParameterError(
+            "{0} is not an available encoding. Available: {1}".format(
+                encoding, ", ".join(sorted(COMPRESSORS))
+            )
+        )
+    return encoding
+
+
+def compress(data, encoding, level=6):
+    """ Returns `data` (bytes) encoded with `encoding`. """
+    return COMPRESSORS[encoding](data, level)
@@ -10,3 +10,18 @@ This module contains constants used in the wrapper.
 ALL_DOCUMENT_FORMATS = ["pdf", "html", "zip"]
 ALL_RESPONSE_FORMATS = ["base64", "url", "I"]
 ALL_ACCESS_TYPES = ["organization", "private"]
+
+# Response fields (snake_case) which always hold a date.
+DATE_FIELDS = frozenset(
+    ["modified", "created", "updated", "created_at", "updated_at", "deleted_at"]
+)
+
+# Bytes read per chunk when streaming a document into a file.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Bytes of a zip document kept in memory before it is spooled to a temporary file.
+ARCHIVE_SPOOL_SIZE = 8 * 1024 * 1024
+
+# Seconds to open a connection, and to wait for each read from it, unless set otherwise.
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 120
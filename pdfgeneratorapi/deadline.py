@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.deadline
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+This module contains the deadlines and cancellation of calls, and the mapping of
+transport timeouts to <RequestTimeout>.
+"""
+
+import asyncio
+import threading
+import time
+
+from requests.exceptions import RequestException, Timeout
+
+from .exceptions import RequestCancelled, RequestTimeout
+
+# Timeout exceptions of requests, urllib3 and httpx, by class name, and the phase of the
+# request which expired.
+TIMEOUT_PHASES = {
+    "ConnectTimeout": "connect",
+    "ConnectTimeoutError": "connect",
+    "ReadTimeout": "read",
+    "ReadTimeoutError": "read",
+    "WriteTimeout": "write",
+    "PoolTimeout": "pool",
+}
+
+
+def timeout_phase(exc):
+    """ Returns the phase of the request which timed out, None when `exc` is not a timeout.
+    requests wraps the timeouts of urllib3 and httpx, and raises the read timeouts of a
+    body as a <requests.ConnectionError>, so the wrapped exception is looked at too.
+    """
+    for error in (exc, exc.args[0] if exc.args else None):
+        phase = TIMEOUT_PHASES.get(type(error).__name__)
+        if phase is not None:
+            return phase
+    if isinstance(exc, Timeout):
+        return "read"
+    return None
+
+
+def timeout_error(exc, timeout=None, deadline=None):
+    """ Returns the <RequestTimeout> of a transport exception, None when it is not a
+    timeout. A timeout cut short by `deadline` is reported as the deadline's.
+    """
+    phase = timeout_phase(exc)
+    if phase is None:
+        return None
+    if deadline is not None and deadline.expired:
+        return deadline.timeout_error()
+    if isinstance(timeout, tuple):
+        timeout = timeout[0] if phase in ("connect", "pool") else timeout[1]
+    return RequestTimeout(
+        "The request timed out ({0}): {1}".format(phase, exc), phase, timeout
+    )
+
+
+class Deadline(object):
+    """ A time budget for a call, covering its retries, or for many calls such as a whole
+    batch, which can also be cancelled from any thread or task. Every request checks it
+    before it is sent and caps its connect and read timeouts to the time left.
+
+    Synchronous calls notice a cancellation before each request, retry and streamed
+    chunk. A request waiting for its answer is aborted at once when its transport can do
+    it (`RequestsTransport`, `FakeTransport`), when its read timeout expires otherwise.
+    Asynchronous calls are interrupted at once.
+
+    :param timeout: Seconds from now until the deadline. Default: None, no time limit,
+                    the deadline is only cancelled.
+
+    Usage::
+
+      >>> deadline = Deadline(30)
+      >>> threading.Timer(5, deadline.cancel).start()
+      >>> batch = pdfg_client.create_documents(jobs, deadline=deadline)
+      >>> pdfg_client.create_document(template_id=123, data={}, deadline=2.5)
+    """
+
+    def __init__(self, timeout: float = None):
+        self.timeout = timeout
+        self.expires_at = None if timeout is None else time.monotonic() + timeout
+        self.reason = None
+        self._cancelled = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def coerce(cls, deadline):
+        """ Returns `deadline` as a <Deadline>: seconds start a new one, None stays None. """
+        if deadline is None or isinstance(deadline, Deadline):
+            return deadline
+        return cls(deadline)
+
+    def child(self):
+        """ Returns a deadline expiring with this one and cancelled with it, which can
+        also be cancelled on its own. Remove `child.cancel` from the callbacks of this
+        deadline once the child is not used anymore.
+        """
+        child = Deadline()
+        child.timeout = self.timeout
+        child.expires_at = self.expires_at
+        self.add_callback(child.cancel)
+        return child
+
+    def remaining(self):
+        """ Returns the seconds left, None without a time limit. """
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def done(self):
+        """ Tells whether the deadline expired or was cancelled. """
+        return self.cancelled or self.expired
+
+    def cancel(self, reason: str = None):
+        """ Cancels every call running with this deadline, and the ones started after. """
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self.reason = reason
+            self._cancelled.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def add_callback(self, callback):
+        """ Calls `callback()` on cancellation, at once when already cancelled. """
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self._lock:
+            try:
+                self._callbacks.remove(callback)
+            except ValueError:
+                pass
+
+    def wait(self, seconds: float = None):
+        """ Sleeps up to `seconds`, not past the deadline. Returns True if cancelled. """
+        return self._cancelled.wait(self.cap(seconds))
+
+    def cap(self, seconds):
+        """ Returns `seconds` (None for no limit) capped to the time left. """
+        remaining = self.remaining()
+        if remaining is None:
+            return seconds
+        if seconds is None:
+            return remaining
+        return min(seconds, remaining)
+
+    def check(self, phase: str = "deadline"):
+        """ Raises <RequestCancelled> once cancelled, <RequestTimeout> once expired. """
+        if self._cancelled.is_set():
+            raise RequestCancelled(
+                "The call was cancelled{0}".format(
+                    ": {0}".format(self.reason) if self.reason else "."
+                )
+            )
+        if self.expired:
+            raise self.timeout_error(phase)
+
+    def timeout_error(self, phase="deadline"):
+        return RequestTimeout(
+            "The deadline of {0} seconds expired.".format(self.timeout),
+            phase,
+            self.timeout,
+        )
+
+    def __repr__(self):
+        return "<Deadline remaining={0} cancelled={1}>".format(
+            self.remaining(), self.cancelled
+        )
+
+
+def iter_content(response, chunk_size, timeout=None, deadline=None):
+    """ Yields the body of a streamed <requests.Response> chunk by chunk, checking
+    `deadline` between chunks. Read timeouts raise <RequestTimeout>.
+    """
+    try:
+        for chunk in response.iter_content(chunk_size):
+            if deadline is not None:
+                deadline.check()
+            yield chunk
+    except RequestException as exc:
+        error = timeout_error(exc, timeout, deadline)
+        if error is None:
+            raise
+        raise error
+
+
+async def run_with_deadline(awaitable, deadline):
+    """ Awaits `awaitable`, cancelling it when `deadline` expires (<RequestTimeout>) or is
+    cancelled (<RequestCancelled>), from any thread. Check the deadline before creating
+    `awaitable`, an expired deadline here cancels it at once.
+    """
+    loop = asyncio.get_event_loop()
+    task = asyncio.ensure_future(awaitable)
+
+    def cancel():
+        loop.call_soon_threadsafe(task.cancel)
+
+    deadline.add_callback(cancel)
+    try:
+        done, _ = await asyncio.wait((task,), timeout=deadline.remaining())
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        deadline.remove_callback(cancel)
+    if not done:
+        task.cancel()
+        await asyncio.wait((task,))
+        raise deadline.timeout_error()
+    if task.cancelled():
+        deadline.check()
+    return task.result()
@@ -8,6 +8,7 @@ This module contains decorator used in the wrapper.
 """
 
 from requests.exceptions import RequestException, HTTPError
+from .instrumentation import attach_timings
 from .utils import dict_to_object
 from .exceptions import (
     ResourceEntityNotFound,
@@ -16,30 +17,81 @@ from .exceptions import (
     IncorrectParameterError,
     InternalServerError,
     AccessNotGrantedError,
+    TooManyRequests,
 )
 
 
+STATUS_CODE_EXCEPTIONS = {
+    401: AccessNotGrantedError,
+    403: AuthenticationParameterError,
+    404: ResourceEntityNotFound,
+    422: AuthenticationParameterError,
+    429: TooManyRequests,
+    500: InternalServerError,
+}
+
+
+def raise_for_status_code(response, error):
+    """ Raises the exception mapped to the status code of an error `response`,
+    <PDFGeneratorAPIException> for the unmapped ones (e.g. a 502 from a proxy).
+    """
+    exception_class = STATUS_CODE_EXCEPTIONS.get(
+        response.status_code, PDFGeneratorAPIException
+    )
+    raise exception_class(error, response)
+
+
+def check_response(response):
+    """ Raises the exception mapped to an error <requests.Response>. """
+    try:
+        response.raise_for_status()
+    except HTTPError as http_err:
+        raise_for_status_code(http_err.response, http_err)
+    except RequestException as req_err:
+        raise PDFGeneratorAPIException(req_err, response)
+
+
+def decode_response(client, response):
+    """ Returns the <PDFGeneratorResponse> of a successful response. When the request was
+    timed, the decoding is too and the call's <Timings> are attached to the result.
+    """
+    timings = getattr(response, "timings", None)
+    if timings is None:
+        response_dict = client.codec.loads(response.content)
+        return dict_to_object(response_dict, client.codec)
+
+    # Cached and coalesced responses are decoded once per call.
+    timings = timings.copy()
+    response_dict = client.codec.loads(response.content)
+    timings.mark("decode")
+    result = dict_to_object(response_dict, client.codec)
+    timings.mark("build")
+    return attach_timings(result, timings)
+
+
 def make_response(func):
-    def to_object(*args, **kwargs):
-        response = func(*args, **kwargs)
-        try:
-            response.raise_for_status()
-        except HTTPError as http_err:
-            status_code = http_err.response.status_code
-            if status_code == 401:
-                raise AccessNotGrantedError(http_err, response)
-            if status_code == 403:
-                raise AuthenticationParameterError(http_err, response)
-            if status_code == 404:
-                raise ResourceEntityNotFound(http_err, response)
-            if status_code == 422:
-                raise AuthenticationParameterError(http_err, response)
-            if status_code == 500:
-                raise InternalServerError(http_err, response)
-        except RequestException as req_err:
-            raise PDFGeneratorAPIException(req_err, response)
-
-        response_dict = response.json()
-        return dict_to_object(response_dict)
+    def to_object(self, *args, **kwargs):
+        response = func(self, *args, **kwargs)
+        check_response(response)
+        return decode_response(self, response)
+
+    return to_object
+
+
+def make_async_response(func):
+    """ `make_response` for coroutines returning a <httpx.Response>. """
+
+    async def to_object(self, *args, **kwargs):
+        response = await func(self, *args, **kwargs)
+        if response.is_error:
+            raise_for_status_code(
+                response,
+                "{status_code} {reason} for url: {url}".format(
+                    status_code=response.status_code,
+                    reason=response.reason_phrase,
+                    url=response.url,
+                ),
+            )
+        return decode_response(self, response)
 
     return to_object
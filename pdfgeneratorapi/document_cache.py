@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.document_cache
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+This module contains the persistent, content-addressed cache of generated documents.
+"""
+
+import contextlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+from .utils import canonical_hash
+
+META_SUFFIX = ".json"
+
+
+class CachedDocument(object):
+    """ A cache hit. `data` is a read-only memory map of the document bytes, close it (or use
+    the object as a context manager) when done.
+    """
+
+    def __init__(self, path, meta):
+        self.meta = meta
+        with open(path, "rb") as f:
+            self.size = os.fstat(f.fileno()).st_size
+            # Empty files cannot be mapped.
+            self.data = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+            )
+
+    def __len__(self):
+        return self.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+class PendingDocument(object):
+    """ A document being written into the cache. It becomes visible, atomically, on
+    `commit()` and is dropped on `discard()`.
+    """
+
+    def __init__(self, cache, template_id, key):
+        self.cache = cache
+        self.template_id = template_id
+        self.key = key
+        self.size = 0
+        self.file = tempfile.NamedTemporaryFile(dir=cache.tmp_directory, delete=False)
+
+    def write(self, chunk):
+        self.file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self, meta=None):
+        self.file.close()
+        path = self.cache.path(self.template_id, self.key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=self.cache.tmp_directory, delete=False
+        ) as meta_file:
+            json.dump(meta or {}, meta_file)
+        # The metadata goes first: a document file is only visible once complete.
+        os.replace(meta_file.name, path + META_SUFFIX)
+        os.replace(self.file.name, path)
+        self.cache._added(self.size)
+
+    def discard(self):
+        self.file.close()
+        with contextlib.suppress(OSError):
+            os.unlink(self.file.name)
+
+
+class DocumentCache(object):
+    """ Stores generated documents (decoded bytes) on local disk, keyed on template, template
+    version, canonical data hash and formats. Writes are atomic renames, the least recently
+    used documents are evicted above `max_bytes` and hits are served from memory maps.
+    Several processes may share one directory.
+
+    :param directory: Directory of the cache, created if missing.
+    :param max_bytes: Size budget of the stored documents. Default: 1 GiB.
+
+    Usage::
+
+      >>> pdfg_client = PDFGenerator(document_cache=DocumentCache('/var/cache/pdfs', max_bytes=10 * 2 ** 30))
+      >>> pdfg_client.document_cache.invalidate(template_id=123)
+    """
+
+    def __init__(self, directory, max_bytes: int = 2 ** 30):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.tmp_directory = os.path.join(self.directory, ".tmp")
+        os.makedirs(self.tmp_directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._approximate_bytes = sum(size for _, size, _ in self._entries())
+
+    @staticmethod
+    def key(template_id, template_version, data, document_format, response_format):
+        return canonical_hash(
+            [
+                str(template_id),
+                str(template_version),
+                canonical_hash(data),
+                document_format,
+                response_format,
+            ]
+        )
+
+    def path(self, template_id, key):
+        return os.path.join(self.directory, quote(str(template_id), safe=""), key)
+
+    def get(self, template_id, key):
+        """ Returns a <CachedDocument> or None. """
+        path = self.path(template_id, key)
+        try:
+            with open(path + META_SUFFIX) as meta_file:
+                meta = json.load(meta_file)
+            document = CachedDocument(path, meta)
+            # Refreshes the LRU position.
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return document
+
+    def put(self, template_id, key):
+        """ Returns a <PendingDocument> to write a document into. """
+        return PendingDocument(self, template_id, key)
+
+    def invalidate(self, template_id=None):
+        """ Drops the documents of `template_id`, or every document when None. """
+        with self._interprocess_lock():
+            if template_id is None:
+                for entry in os.scandir(self.directory):
+                    if entry.is_dir() and entry.path != self.tmp_directory:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                shutil.rmtree(
+                    os.path.join(self.directory, quote(str(template_id), safe="")),
+                    ignore_errors=True,
+                )
+            self._approximate_bytes = sum(size for _, size, _ in self._entries())
+
+    def _added(self, size):
+        with self._lock:
+            self._approximate_bytes += size
+            over_budget = self._approximate_bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def evict(self):
+        """ Deletes the least recently used documents until the cache fits `max_bytes`. """
+        with self._interprocess_lock():
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                for name in (path, path + META_SUFFIX):
+                    with contextlib.suppress(OSError):
+                        os.unlink(name)
+                total -= size
+                self.evictions += 1
+            self._approximate_bytes = total
+
+    def _entries(self):
+        """ Yields (mtime, size, path) of every stored document. Documents removed meanwhile
+        by another process are skipped.
+        """
+        for template_dir in os.scandir(self.directory):
+            if not template_dir.is_dir() or template_dir.path == self.tmp_directory:
+                continue
+            try:
+                entries = list(os.scandir(template_dir.path))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name.endswith(META_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                yield stat.st_mtime, stat.st_size, entry.path
+
+    @contextlib.contextmanager
+    def _interprocess_lock(self):
+        with open(os.path.join(self.directory, ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "bytes": self._approximate_bytes,
+            }
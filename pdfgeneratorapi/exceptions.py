@@ -22,6 +22,7 @@ Code            Description
 404	            Entity not found
 404	            Resource not found
 422	            Incorrect parameter value
+429	            Too many requests
 500	            Internal error
 
 """
@@ -30,10 +31,13 @@ Code            Description
 class PDFGeneratorAPIException(Exception):
     def __init__(self, message=None, response=None):
         super(PDFGeneratorAPIException, self).__init__(message)
-        if response:
+        if response is not None:
             http_body = response.text
             http_status = response.status_code
-            json_body = response.json()
+            try:
+                json_body = response.json()
+            except ValueError:
+                json_body = None
             self.http_body = http_body
             self.http_status = http_status
             self.json_body = json_body
@@ -47,6 +51,10 @@ class InternalServerError(PDFGeneratorAPIException):
     pass
 
 
+class TooManyRequests(PDFGeneratorAPIException):
+    pass
+
+
 class AccessNotGrantedError(PDFGeneratorAPIException):
     pass
 
@@ -73,3 +81,26 @@ class InvalidFormat(PDFGeneratorAPIException):
 
 class InvalidAccessType(PDFGeneratorAPIException):
     pass
+
+
+class RequestTimeout(PDFGeneratorAPIException):
+    """ A request, or the <deadline.Deadline> of a call, ran out of time.
+
+    :param phase: What expired: `connect`, `read`, `write` or `pool` (waiting for a free
+                  connection) for the timeouts of one request, `queue` while waiting for
+                  the rate limiter, `deadline` for the overall deadline of the call.
+    :param timeout: The seconds which expired, when known.
+    """
+
+    def __init__(self, message=None, phase=None, timeout=None):
+        super(RequestTimeout, self).__init__(message)
+        self.phase = phase
+        self.timeout = timeout
+
+
+class RequestCancelled(PDFGeneratorAPIException):
+    """ The call was cancelled with `Deadline.cancel()`. """
+
+
+class MissingFieldWarning(UserWarning):
+    """ Data passed to `create_document` lacks a field its template references. """
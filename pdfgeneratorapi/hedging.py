@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.hedging
+~~~~~~~~~~~~~~~~~~~~~~~
+
+This module contains the hedged requests of `create_document`: a call which has not
+answered within a delay sends a second, identical request and keeps the first
+successful answer.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .deadline import Deadline
+from .exceptions import IncorrectParameterError
+
+
+class HedgeTimer(object):
+    """ Calls functions after a delay, from a single thread started on first use. """
+
+    def __init__(self):
+        self._entries = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def call_later(self, seconds, callback):
+        """ Calls `callback()` in `seconds`. Returns a handle for `cancel()`. """
+        entry = [time.monotonic() + seconds, next(self._counter), callback]
+        with self._condition:
+            heapq.heappush(self._entries, entry)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="pdfg-hedge-timer", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify()
+        return entry
+
+    @staticmethod
+    def cancel(entry):
+        entry[2] = None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if not self._entries:
+                        self._condition.wait()
+                        continue
+                    remaining = self._entries[0][0] - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if self._closed:
+                    return
+                callback = heapq.heappop(self._entries)[2]
+            if callback is not None:
+                callback()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._entries = []
+            self._condition.notify()
+
+
+class HedgePolicy(object):
+    """ Decides when a call is hedged, runs its requests and keeps the statistics.
+
+    The delay is either fixed or adaptive: the `quantile` of the latest latencies of
+    successful requests, so that only the slowest calls are hedged. Hedges are budgeted:
+    every call adds `budget` to a reserve of at most `burst` hedges and a hedge takes one,
+    so hedges stay below `budget` of the calls even when the server slows down as a whole.
+    The request which loses is cancelled: not sent if it is still waiting, aborted when
+    its transport can do it (see `deadline.Deadline`), abandoned otherwise (its answer is
+    dropped).
+
+    :param delay: Seconds before the hedge is sent. Default: None, adaptive.
+    :param quantile: Latency quantile used as the adaptive delay. Default: 0.95.
+    :param initial_delay: Adaptive delay until `min_samples` latencies were observed.
+                          Default: 1.0.
+    :param min_delay: Lower bound of the adaptive delay. Default: 0.01.
+    :param min_samples: Latencies observed before the adaptive delay applies. Default: 20.
+    :param window: Latest latencies the quantile is computed on. Default: 1000.
+    :param budget: Share of the calls which may be hedged, between 0 and 1. Default: 0.1.
+    :param burst: Hedges which may be sent in a row. Default: 10.
+    :param max_workers: Threads sending the hedges, first requests are sent from the
+                        calling threads. Default: 64.
+
+    Usage::
+
+      >>> pdfg_client = PDFGenerator(hedge=HedgePolicy(budget=0.05))
+      >>> pdfg_client.create_document(template_id=123, data={'name': 'Sameer Kumar'})
+      >>> pdfg_client.hedge.stats()
+       {'calls': 1, 'hedged': 0, 'hedge_wins': 0, 'budget_denied': 0, 'hedge_rate': 0.0,
+        'win_rate': 0.0, 'delay': 1.0}
+    """
+
+    def __init__(
+        self,
+        delay: float = None,
+        quantile: float = 0.95,
+        initial_delay: float = 1.0,
+        min_delay: float = 0.01,
+        min_samples: int = 20,
+        window: int = 1000,
+        budget: float = 0.1,
+        burst: float = 10,
+        max_workers: int = 64,
+    ):
+        if not 0 <= budget <= 1:
+            raise IncorrectParameterError("The hedging budget must be between 0 and 1.")
+        self.fixed_delay = delay
+        self.quantile = quantile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.budget = budget
+        self.burst = burst
+        self.max_workers = max_workers
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+        self._tokens = 0.0
+        self._delay = initial_delay if delay is None else delay
+        self._new_samples = 0
+        self._executor = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    @property
+    def delay(self):
+        """ Seconds a call waits for its first request before it is hedged. """
+        return self._delay
+
+    def observe(self, seconds):
+        """ Records the latency of a successful request. """
+        with self._lock:
+            self.latencies.append(seconds)
+            if self.fixed_delay is not None or len(self.latencies) < self.min_samples:
+                return
+            # The quantile is recomputed every few samples, not on every call.
+            self._new_samples += 1
+            if self._new_samples < max(1, len(self.latencies) // 50):
+                return
+            self._new_samples = 0
+            latencies = sorted(self.latencies)
+            index = min(len(latencies) - 1, int(self.quantile * len(latencies)))
+            self._delay = max(self.min_delay, latencies[index])
+
+    def _start_call(self):
+        with self._lock:
+            self.calls += 1
+            self._tokens = min(self.burst, self._tokens + self.budget)
+
+    def _take_hedge(self):
+        """ Takes a hedge from the budget. Returns False when there is none left. """
+        with self._lock:
+            if self._tokens < 1:
+                self.budget_denied += 1
+                return False
+            self._tokens -= 1
+            self.hedged += 1
+            return True
+
+    def _won(self, hedge):
+        if hedge:
+            with self._lock:
+                self.hedge_wins += 1
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="pdfg-hedge"
+                )
+            return self._executor
+
+    @property
+    def timer(self):
+        with self._lock:
+            if self._timer is None:
+                self._timer = HedgeTimer()
+            return self._timer
+
+    def _timed(self, send, deadline):
+        start = time.perf_counter()
+        result = send(deadline)
+        self.observe(time.perf_counter() - start)
+        return result
+
+    def run(self, send, deadline=None):
+        """ Returns `send(deadline)`, hedged. The first request is sent from the calling
+        thread, the hedge from the policy's threads. Each gets a <deadline.Deadline> of
+        its own, cancelled when the other request wins, bound to `deadline` when given.
+        The exception of the first request is raised when neither succeeds.
+        """
+        self._start_call()
+        primary = Deadline() if deadline is None else deadline.child()
+        lock = threading.Lock()
+        # The hedge's future and deadline, once sent; `finished` once the call is over.
+        hedge = {"future": None, "deadline": None, "finished": False}
+
+        def hedge_done(future):
+            if not future.cancelled() and future.exception() is None:
+                primary.cancel("Another hedged request answered first.")
+
+        def send_hedge():
+            with lock:
+                if hedge["finished"] or (deadline is not None and deadline.done):
+                    return
+                if not self._take_hedge():
+                    return
+                attempt = Deadline() if deadline is None else deadline.child()
+                try:
+                    future = self.executor.submit(self._timed, send, attempt)
+                except RuntimeError:
+                    # The policy was closed.
+                    return
+                hedge["future"], hedge["deadline"] = future, attempt
+            future.add_done_callback(hedge_done)
+
+        delay = self.delay if deadline is None else deadline.cap(self.delay)
+        timer = self.timer.call_later(delay, send_hedge)
+        try:
+            try:
+                return self._timed(send, primary)
+            except Exception as error:
+                with lock:
+                    hedge["finished"] = True
+                    future = hedge["future"]
+                if future is None:
+                    raise
+                try:
+                    result = future.result()
+                except Exception:
+                    raise error
+                self._won(True)
+                return result
+        finally:
+            self.timer.cancel(timer)
+            with lock:
+                hedge["finished"] = True
+                future, attempt = hedge["future"], hedge["deadline"]
+            if future is not None and not future.done():
+                attempt.cancel("Another hedged request answered first.")
+            if deadline is not None:
+                deadline.remove_callback(primary.cancel)
+                if attempt is not None:
+                    deadline.remove_callback(attempt.cancel)
+
+    async def arun(self, send, deadline=None):
+        """ The asyncio counterpart of `run()`: `send(deadline)` is a coroutine function and
+        the request which loses is cancelled at once.
+        """
+        self._start_call()
+
+        async def timed(attempt):
+            start = time.perf_counter()
+            result = await send(attempt)
+            self.observe(time.perf_counter() - start)
+            return result
+
+        primary = asyncio.ensure_future(timed(deadline))
+        tasks = [primary]
+        try:
+            delay = self.delay if deadline is None else deadline.cap(self.delay)
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and not (deadline is not None and deadline.done):
+                if self._take_hedge():
+                    tasks.append(asyncio.ensure_future(timed(deadline)))
+            pending = list(tasks)
+            error = None
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in [task for task in pending if task in done]:
+                    pending.remove(task)
+                    if task.exception() is None:
+                        self._won(task is not primary)
+                        return task.result()
+                    if task is primary or error is None:
+                        error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self):
+        """ Returns the calls, hedges and hedges which answered first, the hedge rate
+        (hedged calls / calls), the win rate (hedge wins / hedges) and the current delay.
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "budget_denied": self.budget_denied,
+                "hedge_rate": self.hedged / self.calls if self.calls else 0.0,
+                "win_rate": self.hedge_wins / self.hedged if self.hedged else 0.0,
+                "delay": self._delay,
+            }
+
+    def close(self):
+        """ Stops the threads of the policy, abandoned requests finish in the background. """
+        with self._lock:
+            executor, self._executor = self._executor, None
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.close()
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.instrumentation
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+This module contains the request hooks, per-call timings and the metrics registry.
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left
+
+HOOK_EVENTS = ("pre_request", "post_request")
+
+# Latency histogram buckets, in seconds.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+TEMPLATE_ID_PATTERN = re.compile(r"(?<=^templates/)[^/]+")
+
+
+def endpoint(resource):
+    """ Returns the endpoint of a resource, e.g. templates/{id}/output for templates/12/output. """
+    return TEMPLATE_ID_PATTERN.sub("{id}", resource)
+
+
+class Timings(dict):
+    """ Seconds spent per phase of one call:
+
+    - queue: waiting for the rate limiter.
+    - sign: computing the signature and headers.
+    - encode: encoding the request body.
+    - wait: connecting, uploading and waiting for the response headers. requests and httpx
+      do not time DNS and connection setup separately, so they are part of this phase.
+    - download: reading the response body, not timed for streamed calls.
+    - decode: decoding the JSON response.
+    - build: building the <PDFGeneratorResponse>.
+
+    Phases are added with `mark(phase)`, which charges the time elapsed since the previous
+    mark (or creation) to `phase`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(Timings, self).__init__(*args, **kwargs)
+        self._last = time.perf_counter()
+
+    def mark(self, phase):
+        """ Charges the time since the previous mark to `phase`. Returns it. """
+        now = time.perf_counter()
+        seconds = now - self._last
+        self.add(phase, seconds)
+        self._last = now
+        return seconds
+
+    def add(self, phase, seconds):
+        self[phase] = self.get(phase, 0.0) + seconds
+
+    def copy(self):
+        return Timings(self)
+
+    @property
+    def total(self):
+        return sum(self.values())
+
+
+class TimedList(list):
+    """ The list returned by listing calls when hooks are registered, carrying `timings`. """
+
+    timings = None
+
+
+def attach_timings(result, timings):
+    """ Sets `timings` on a call result. Returns the result. """
+    if type(result) is list:
+        result = TimedList(result)
+    result.timings = timings
+    return result
+
+
+def body_size(response):
+    """ Returns the bytes of the response body read so far, as received (compressed). """
+    raw = response.raw
+    tell = getattr(raw, "tell", None)
+    if tell is not None:
+        try:
+            return tell()
+        except (OSError, ValueError):
+            pass
+    content = response._content
+    return len(content) if content else 0
+
+
+class RequestInfo(object):
+    """ What hooks are called with. Post-request hooks also see `status_code` (None when
+    the request failed), `exception`, `response`, the `timings` up to the response body
+    and the body bytes sent and received (as on the wire, i.e. compressed). Streamed
+    bodies are read after the hooks ran and not counted.
+    """
+
+    __slots__ = (
+        "method",
+        "resource",
+        "params",
+        "timings",
+        "status_code",
+        "exception",
+        "response",
+        "bytes_sent",
+        "bytes_received",
+    )
+
+    def __init__(self, method, resource, params=None, timings=None):
+        self.method = method
+        self.resource = resource
+        self.params = params
+        self.timings = timings
+        self.status_code = None
+        self.exception = None
+        self.response = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    @property
+    def endpoint(self):
+        return endpoint(self.resource)
+
+
+class Histogram(object):
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self, buckets):
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, buckets, value):
+        # Counts are stored per bucket and accumulated when rendered.
+        index = bisect_left(buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+class MetricsRegistry(object):
+    """ Request counters and latency histograms per endpoint, method and status code,
+    rendered in the Prometheus text exposition format. Register it as a post-request hook,
+    or pass `metrics=True` to the client.
+
+    :param buckets: Upper bounds, in seconds, of the latency histogram buckets.
+    :param namespace: Prefix of the metric names. Default: pdfgeneratorapi.
+
+    Usage::
+
+      >>> pdfg_client = PDFGenerator(metrics=True)
+      >>> print(pdfg_client.metrics.render())
+       # TYPE pdfgeneratorapi_requests_total counter
+       pdfgeneratorapi_requests_total{endpoint="templates/{id}",method="GET",status="200"} 12
+       ...
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, namespace="pdfgeneratorapi"):
+        self.buckets = tuple(sorted(buckets))
+        self.namespace = namespace
+        self._histograms = {}
+        self._phases = {}
+        self._bytes = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, info):
+        self.observe(info)
+
+    def observe(self, info):
+        """ Records a finished request described by a <RequestInfo>. """
+        labels = (
+            info.endpoint,
+            info.method,
+            "error" if info.status_code is None else str(info.status_code),
+        )
+        with self._lock:
+            histogram = self._histograms.get(labels)
+            if histogram is None:
+                histogram = self._histograms[labels] = Histogram(self.buckets)
+            histogram.observe(self.buckets, info.timings.total)
+            for phase, seconds in info.timings.items():
+                key = (info.endpoint, phase)
+                self._phases[key] = self._phases.get(key, 0.0) + seconds
+            for direction, size in (
+                ("sent", info.bytes_sent),
+                ("received", info.bytes_received),
+            ):
+                key = (info.endpoint, direction)
+                self._bytes[key] = self._bytes.get(key, 0) + size
+
+    def render(self):
+        """ Returns the metrics in the Prometheus text exposition format. """
+        requests_total = "{0}_requests_total".format(self.namespace)
+        duration = "{0}_request_duration_seconds".format(self.namespace)
+        phases = "{0}_request_phase_seconds_total".format(self.namespace)
+        transferred = "{0}_body_bytes_total".format(self.namespace)
+        lines = [
+            "# HELP {0} Requests sent.".format(requests_total),
+            "# TYPE {0} counter".format(requests_total),
+        ]
+        with self._lock:
+            histograms = sorted(
+                (labels, list(h.counts), h.count, h.sum)
+                for labels, h in self._histograms.items()
+            )
+            phase_totals = sorted(self._phases.items())
+            byte_totals = sorted(self._bytes.items())
+
+        for (path, method, status), _, count, _ in histograms:
+            lines.append(
+                '{0}{{endpoint="{1}",method="{2}",status="{3}"}} {4}'.format(
+                    requests_total, path, method, status, count
+                )
+            )
+        lines += [
+            "# HELP {0} Request latency up to the response body.".format(duration),
+            "# TYPE {0} histogram".format(duration),
+        ]
+        for (path, method, status), counts, count, total in histograms:
+            labels = 'endpoint="{0}",method="{1}",status="{2}"'.format(
+                path, method, status
+            )
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(
+                    '{0}_bucket{{{1},le="{2}"}} {3}'.format(
+                        duration, labels, bound, cumulative
+                    )
+                )
+            lines.append(
+                '{0}_bucket{{{1},le="+Inf"}} {2}'.format(duration, labels, count)
+            )
+            lines.append("{0}_sum{{{1}}} {2}".format(duration, labels, total))
+            lines.append("{0}_count{{{1}}} {2}".format(duration, labels, count))
+        lines += [
+            "# HELP {0} Seconds spent per request phase.".format(phases),
+            "# TYPE {0} counter".format(phases),
+        ]
+        for (path, phase), seconds in phase_totals:
+            lines.append(
+                '{0}{{endpoint="{1}",phase="{2}"}} {3}'.format(
+                    phases, path, phase, seconds
+                )
+            )
+        lines += [
+            "# HELP {0} Body bytes sent and received.".format(transferred),
+            "# TYPE {0} counter".format(transferred),
+        ]
+        for (path, direction), size in byte_totals:
+            lines.append(
+                '{0}{{endpoint="{1}",direction="{2}"}} {3}'.format(
+                    transferred, path, direction, size
+                )
+            )
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.listing
+~~~~~~~~~~~~~~~~~~~~~~~
+
+This module contains the columnar template listing returned by `PDFGenerator.template_listing`.
+"""
+
+import datetime
+import re
+from array import array
+from itertools import compress
+
+from .exceptions import IncorrectParameterError
+from .response import parse_date
+from .serialization import DEFAULT_CODEC
+from .utils import create_py_object
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+EPOCH = datetime.datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+API_DATE_PATTERN = re.compile(r"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\Z")
+NO_DATE = float("nan")
+# Codes of the `owner` column.
+OWNER_CODES = {False: 0, True: 1}
+NO_OWNER = 2
+COLUMN_FIELDS = ("id", "name", "modified", "owner", "access", "tags")
+# Bit of each column field in the mask of the fields a row has.
+FIELD_BITS = {field: 1 << bit for bit, field in enumerate(COLUMN_FIELDS)}
+
+
+def to_timestamp(value):
+    """ Returns seconds since the epoch of a date, a <datetime.datetime> or an API date
+    string, NaN when it is not one. Naive dates are taken as UTC.
+    """
+    if isinstance(value, str):
+        value = parse_date(value)
+    elif isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        value = datetime.datetime(value.year, value.month, value.day)
+    if not isinstance(value, datetime.datetime):
+        return NO_DATE
+    if value.tzinfo is not None:
+        return value.timestamp()
+    return (value - EPOCH).total_seconds()
+
+
+def api_timestamp(value):
+    """ Returns the timestamp of a date string in the API format (2017-10-30 16:49:28),
+    None for any other value. Faster than `to_timestamp`, and exact: `format_timestamp`
+    gives the string back.
+    """
+    if type(value) is not str or API_DATE_PATTERN.match(value) is None:
+        return None
+    try:
+        day = datetime.date(int(value[:4]), int(value[5:7]), int(value[8:10]))
+    except ValueError:
+        return None
+    hour, minute, second = int(value[11:13]), int(value[14:16]), int(value[17:19])
+    if hour > 23 or minute > 59 or second > 59:
+        return None
+    return (day.toordinal() - EPOCH_ORDINAL) * 86400.0 + (
+        hour * 3600 + minute * 60 + second
+    )
+
+
+def format_timestamp(timestamp):
+    return (EPOCH + datetime.timedelta(seconds=timestamp)).strftime(DATE_FORMAT)
+
+
+class TemplateColumns(object):
+    """ The storage of a template listing, one compact column per field: ids and
+    modification dates in arrays, owner and access as byte codes, tags interned and
+    stored as tag ids with per-row offsets, plus an index of the rows of every tag.
+    Fields the columns cannot hold exactly are kept as is in `extras`, per row, and
+    `fields` holds a bit mask of the column fields each row has.
+    """
+
+    __slots__ = (
+        "fields",
+        "ids",
+        "names",
+        "modified",
+        "owner",
+        "access",
+        "access_names",
+        "tag_names",
+        "tag_index",
+        "tag_ids",
+        "tag_offsets",
+        "tag_rows",
+        "extras",
+        "odd_ids",
+        "unnamed",
+        "undated",
+    )
+
+    def __init__(self):
+        self.fields = bytearray()
+        self.ids = array("q")
+        self.names = []
+        self.modified = array("d")
+        self.owner = bytearray()
+        self.access = bytearray()
+        self.access_names = [None]
+        self.tag_names = []
+        self.tag_index = {}
+        self.tag_ids = array("l")
+        self.tag_offsets = array("l", [0])
+        self.tag_rows = []
+        self.extras = {}
+        self.odd_ids = set()
+        self.unnamed = 0
+        self.undated = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def append(self, item):
+        """ Adds a template of the API listing, a dict. """
+        row = len(self.ids)
+        fields = 0
+        present = 0
+        for field, bit in FIELD_BITS.items():
+            if field in item:
+                fields |= bit
+                present += 1
+        self.fields.append(fields)
+        extras = None
+        if len(item) > present:
+            extras = {
+                key: value for key, value in item.items() if key not in FIELD_BITS
+            }
+
+        template_id = item.get("id")
+        if type(template_id) is int and -(2 ** 63) <= template_id < 2 ** 63:
+            self.ids.append(template_id)
+        else:
+            self.ids.append(0)
+            self.odd_ids.add(row)
+            extras = self._extra(extras, "id", template_id)
+
+        name = item.get("name")
+        if isinstance(name, str):
+            self.names.append(name)
+        else:
+            self.names.append(None)
+            self.unnamed += 1
+            if name is not None:
+                extras = self._extra(extras, "name", name)
+
+        modified = item.get("modified")
+        timestamp = api_timestamp(modified)
+        if timestamp is None:
+            # Not in the API format, the original value is kept.
+            timestamp = to_timestamp(modified)
+            if modified is not None:
+                extras = self._extra(extras, "modified", modified)
+        if timestamp != timestamp:
+            self.undated += 1
+        self.modified.append(timestamp)
+
+        owner = item.get("owner")
+        if type(owner) is bool:
+            self.owner.append(OWNER_CODES[owner])
+        else:
+            self.owner.append(NO_OWNER)
+            if owner is not None:
+                extras = self._extra(extras, "owner", owner)
+
+        access = item.get("access")
+        if isinstance(access, str):
+            if access not in self.access_names:
+                self.access_names.append(access)
+            self.access.append(self.access_names.index(access))
+        else:
+            self.access.append(0)
+            if access is not None:
+                extras = self._extra(extras, "access", access)
+
+        tags = item.get("tags")
+        if type(tags) is list and all(type(tag) is str for tag in tags):
+            tag_index = self.tag_index
+            for tag in tags:
+                tag_id = tag_index.get(tag)
+                if tag_id is None:
+                    tag_id = tag_index[tag] = len(self.tag_names)
+                    self.tag_names.append(tag)
+                    self.tag_rows.append(array("l"))
+                self.tag_ids.append(tag_id)
+                rows = self.tag_rows[tag_id]
+                if not rows or rows[-1] != row:
+                    rows.append(row)
+        elif tags is not None:
+            extras = self._extra(extras, "tags", tags)
+        self.tag_offsets.append(len(self.tag_ids))
+
+        if extras:
+            self.extras[row] = extras
+
+    @staticmethod
+    def _extra(extras, key, value):
+        if extras is None:
+            extras = {}
+        extras[key] = value
+        return extras
+
+    def row(self, row):
+        """ Returns the template of `row` as the dict the API sent. """
+        extras = self.extras.get(row, {})
+        fields = self.fields[row]
+        item = {}
+        if fields & FIELD_BITS["id"]:
+            item["id"] = extras.get("id", self.ids[row])
+        if fields & FIELD_BITS["name"]:
+            item["name"] = extras.get("name", self.names[row])
+        if fields & FIELD_BITS["modified"]:
+            timestamp = self.modified[row]
+            item["modified"] = extras.get(
+                "modified",
+                None if timestamp != timestamp else format_timestamp(timestamp),
+            )
+        if fields & FIELD_BITS["owner"]:
+            owner = self.owner[row]
+            item["owner"] = extras.get(
+                "owner", None if owner == NO_OWNER else owner == 1
+            )
+        if fields & FIELD_BITS["access"]:
+            item["access"] = extras.get("access", self.access_names[self.access[row]])
+        if fields & FIELD_BITS["tags"]:
+            item["tags"] = extras.get("tags", self.tags(row))
+        for key, value in extras.items():
+            if key not in FIELD_BITS:
+                item[key] = value
+        return item
+
+    def tags(self, row):
+        return [
+            self.tag_names[tag_id]
+            for tag_id in self.tag_ids[
+                self.tag_offsets[row] : self.tag_offsets[row + 1]
+            ]
+        ]
+
+
+class TemplateListing(object):
+    """ A template listing stored column-wise, a fraction of the memory of a list of
+    <PDFGeneratorResponse>, filtered and sorted without building one object per template.
+    Filters and sorts return new listings sharing the same columns. Rows are
+    materialised as <PDFGeneratorResponse> when indexed or iterated.
+
+    :param columns: The <TemplateColumns> holding the templates.
+    :param rows: Row numbers of the listing, in order. Default: every row.
+    :param codec: JSON codec of the materialised responses.
+
+    Usage::
+
+      >>> templates = pdfg_client.template_listing()
+      >>> recent = templates.filter(tags=['invoice'], modified_after='2020-01-01')
+      >>> recent.sort_by('modified', reverse=True).ids[:10]
+       [24382, ...]
+      >>> recent[0]
+       <PDFGeneratorResponse>
+    """
+
+    __slots__ = ("columns", "rows", "codec")
+
+    def __init__(self, columns, rows=None, codec=DEFAULT_CODEC):
+        self.columns = columns
+        self.rows = rows
+        self.codec = codec
+
+    @classmethod
+    def from_items(cls, items, codec=DEFAULT_CODEC):
+        """ Builds a listing from an iterable of template dicts. """
+        columns = TemplateColumns()
+        for item in items:
+            columns.append(item)
+        return cls(columns, codec=codec)
+
+    def _rows(self):
+        return range(len(self.columns)) if self.rows is None else self.rows
+
+    def _view(self, rows):
+        return TemplateListing(self.columns, array("l", rows), self.codec)
+
+    def __len__(self):
+        return len(self.columns) if self.rows is None else len(self.rows)
+
+    def __iter__(self):
+        for row in self._rows():
+            yield create_py_object(self.columns.row(row), self.codec)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._view(self._rows()[index])
+        return create_py_object(self.columns.row(self._rows()[index]), self.codec)
+
+    def __repr__(self):
+        return "<TemplateListing of {0} templates>".format(len(self))
+
+    def to_dicts(self):
+        """ Returns the templates as a list of dicts, as the API sent them. """
+        return [self.columns.row(row) for row in self._rows()]
+
+    @property
+    def ids(self):
+        columns = self.columns
+        if self.rows is None:
+            ids = columns.ids.tolist()
+        else:
+            ids = list(map(columns.ids.__getitem__, self.rows))
+        if columns.odd_ids:
+            # Ids the array cannot hold, e.g. strings.
+            for i, row in enumerate(self._rows()):
+                if row in columns.odd_ids:
+                    ids[i] = columns.extras[row]["id"]
+        return ids
+
+    @property
+    def names(self):
+        if self.rows is None:
+            return list(self.columns.names)
+        return list(map(self.columns.names.__getitem__, self.rows))
+
+    def get(self, template_id):
+        """ Returns the <PDFGeneratorResponse> of template `template_id`, None if absent. """
+        columns = self.columns
+        for row in self._rows():
+            if row in columns.odd_ids:
+                found = columns.extras[row]["id"] == template_id
+            else:
+                found = columns.ids[row] == template_id
+            if found:
+                return create_py_object(columns.row(row), self.codec)
+        return None
+
+    def filter(
+        self,
+        tags: list = None,
+        access: str = None,
+        owner: bool = None,
+        modified_after=None,
+        modified_before=None,
+    ):
+        """ Returns the templates matching every given condition.
+
+        :param tags: Templates with at least one of these tags.
+        :param access: Templates of this access type, when the listing carries `access`.
+        :param owner: Templates owned (True) or not (False) by the workspace.
+        :param modified_after: Templates modified at or after this date (a <datetime>,
+                               <date> or API date string).
+        :param modified_before: Templates modified before this date.
+        """
+        columns = self.columns
+        # None: every row, in order.
+        rows = self.rows
+        if tags is not None:
+            tag_rows = [
+                columns.tag_rows[columns.tag_index[tag]]
+                for tag in ([tags] if isinstance(tags, str) else tags)
+                if tag in columns.tag_index
+            ]
+            if rows is None and len(tag_rows) == 1:
+                rows = tag_rows[0]
+            else:
+                selected = bytearray(len(columns))
+                for tagged in tag_rows:
+                    for row in tagged:
+                        selected[row] = 1
+                rows = self._select(rows, selected, (1).__eq__)
+        if access is not None:
+            if access not in columns.access_names:
+                if len(columns.access_names) == 1:
+                    raise IncorrectParameterError(
+                        "The listing has no access field, pass access to template_listing."
+                    )
+                return self._view([])
+            code = columns.access_names.index(access)
+            rows = self._select(rows, columns.access, code.__eq__)
+        if owner is not None:
+            code = OWNER_CODES[bool(owner)]
+            rows = self._select(rows, columns.owner, code.__eq__)
+        if modified_after is not None or modified_before is not None:
+            # NaN (no date) never compares true.
+            for bound, compare in (
+                (modified_after, "__le__"),
+                (modified_before, "__gt__"),
+            ):
+                if bound is None:
+                    continue
+                timestamp = to_timestamp(bound)
+                if timestamp != timestamp:
+                    raise IncorrectParameterError("{0!r} is not a date.".format(bound))
+                rows = self._select(rows, columns.modified, getattr(timestamp, compare))
+        if rows is None:
+            return self
+        return self._view(rows)
+
+    @staticmethod
+    def _select(rows, column, matches):
+        """ Returns the `rows` (None for every row) whose value in `column` `matches`. """
+        if rows is None:
+            return list(compress(range(len(column)), map(matches, column)))
+        return list(compress(rows, map(matches, map(column.__getitem__, rows))))
+
+    def sort_by(self, field: str = "id", reverse: bool = False):
+        """ Returns the templates sorted by `field`: id, name or modified. Templates
+        without a name or modification date sort after the others, before when reversed.
+        """
+        columns = self.columns
+        if field == "id":
+            key = columns.ids.__getitem__
+        elif field == "name":
+            names = columns.names
+            key = names.__getitem__
+            if columns.unnamed:
+                key = lambda row: (names[row] is None, names[row] or "")  # noqa: E731
+        elif field == "modified":
+            column = columns.modified
+            key = column.__getitem__
+            if columns.undated:
+                key = lambda row: (  # noqa: E731
+                    column[row] != column[row],
+                    column[row] if column[row] == column[row] else 0.0,
+                )
+        else:
+            raise IncorrectParameterError(
+                "{0} is not a sortable field. Available: id, name, modified".format(
+                    field
+                )
+            )
+        return self._view(sorted(self._rows(), key=key, reverse=reverse))
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.pruning
+~~~~~~~~~~~~~~~~~~~~~~~
+
+This module contains the template-aware pruning of `create_document` data: the field paths
+a template references are read from its configuration and the other keys are not sent.
+"""
+
+import re
+import threading
+import time
+import warnings
+
+from .exceptions import MissingFieldWarning
+
+# {customer.name}, {line_items::price}, {items[0].name}, also inside {% expressions %}.
+PLACEHOLDER_PATTERN = re.compile(r"\{([^{}%\"\n]+)\}")
+PATH_SEPARATOR_PATTERN = re.compile(r"::|\.|\[\d*\]")
+# Characters of expressions and CSS rules, never of a field name.
+NOT_A_FIELD_PATTERN = re.compile(r"[:;,()=<>!+*/'$]|^\s*$|^\d+$")
+
+# Component settings naming fields relative to the component data index.
+FIELD_SETTINGS = ("sortBy", "groupBy", "filterBy")
+FIELD_SETTING_KEYS = ("field", "property", "column", "dataIndex")
+
+
+def parse_path(text, context=None):
+    """ Returns the keys of a field path, None when `text` is not one.
+    A path starting with :: is relative to the data index `context`.
+    """
+    text = text.strip()
+    if text.startswith("::"):
+        if not context:
+            return None
+        text = context + text
+    keys = [key.strip() for key in PATH_SEPARATOR_PATTERN.split(text)]
+    keys = [key for key in keys if key]
+    if not keys or any(NOT_A_FIELD_PATTERN.search(key) for key in keys):
+        return None
+    return tuple(keys)
+
+
+class TemplateFields(object):
+    """ The fields a template configuration references.
+
+    `tree` maps each referenced key to the tree of its own referenced keys, None when the
+    whole value is used. Arrays are transparent: the tree of an array applies to each of
+    its members. `paths` holds the placeholder paths, the ones strict mode checks.
+
+    :param template: The template configuration, as returned by `get_template`.
+    """
+
+    def __init__(self, template):
+        self.tree = {}
+        self.paths = set()
+        self._collect(template, None)
+
+    def __bool__(self):
+        return bool(self.tree)
+
+    def add(self, keys, whole=True):
+        """ Adds a path. `whole` keeps its entire value, otherwise only the key itself and
+        the other paths beneath it.
+        """
+        node = self.tree
+        for key in keys[:-1]:
+            child = node.setdefault(key, {})
+            if child is None:
+                return
+            node = child
+        if whole:
+            node[keys[-1]] = None
+        elif node.get(keys[-1], {}) is not None:
+            node.setdefault(keys[-1], {})
+
+    def _add_text(self, text, context, whole=True):
+        """ Adds `text` as a path, also relative to the data index `context`. """
+        keys = parse_path(text, context)
+        if keys is not None:
+            self.add(keys, whole)
+        if context and not text.strip().startswith("::"):
+            keys = parse_path("::" + text, context)
+            if keys is not None:
+                self.add(keys, whole)
+
+    def _collect(self, value, context):
+        if isinstance(value, dict):
+            data_index = value.get("dataIndex")
+            if isinstance(data_index, str) and data_index.strip():
+                self._add_text(data_index, None, whole=False)
+                context = data_index.strip()
+            for key, item in value.items():
+                if key in FIELD_SETTINGS:
+                    self._collect_settings(item, context)
+                elif key != "dataIndex":
+                    self._collect(item, context)
+        elif isinstance(value, list):
+            for item in value:
+                self._collect(item, context)
+        elif isinstance(value, str) and "{" in value:
+            for match in PLACEHOLDER_PATTERN.finditer(value):
+                keys = parse_path(match.group(1), context)
+                if keys is not None:
+                    self.add(keys)
+                    self.paths.add(keys)
+
+    def _collect_settings(self, value, context):
+        if isinstance(value, str):
+            self._add_text(value, context)
+        elif isinstance(value, list):
+            for item in value:
+                self._collect_settings(item, context)
+        elif isinstance(value, dict):
+            for key in FIELD_SETTING_KEYS:
+                if isinstance(value.get(key), str):
+                    self._add_text(value[key], context)
+
+
+def prune(data, tree, dropped=None):
+    """ Returns `data` without the keys absent from `tree` (see <TemplateFields>).
+    The removed (key, value) pairs are appended to `dropped` when given.
+    """
+    if tree is None:
+        return data
+    if isinstance(data, dict):
+        pruned = {}
+        for key, value in data.items():
+            if key in tree:
+                pruned[key] = prune(value, tree[key], dropped)
+            elif dropped is not None:
+                dropped.append((key, value))
+        return pruned
+    if isinstance(data, list):
+        return [prune(item, tree, dropped) for item in data]
+    return data
+
+
+def has_path(data, keys):
+    """ Tells whether `data` holds the path `keys`, in every member of the arrays on it. """
+    if not keys:
+        return True
+    if isinstance(data, list):
+        return all(has_path(item, keys) for item in data)
+    if isinstance(data, dict) and keys[0] in data:
+        return has_path(data[keys[0]], keys[1:])
+    return False
+
+
+class PayloadPruner(object):
+    """ Drops the keys of `create_document` data that the template does not reference,
+    so that they are neither encoded nor uploaded. The fields of a template are read from
+    its `get_template` configuration once per `ttl`: placeholders ({customer.name},
+    {line_items::price}), component data indexes and sort, group and filter settings.
+    Data of a template without any recognised field is sent as is.
+
+    :param ttl: Seconds the fields of a template are used before its configuration is
+                read again. Default: 300.
+    :param strict: Warn with a <MissingFieldWarning> when data lacks a referenced field.
+                   Default: False.
+
+    Usage::
+
+      >>> pdfg_client = PDFGenerator(prune_payloads=PayloadPruner(strict=True))
+      >>> pdfg_client.create_document(template_id=123, data=customer_record)
+      >>> pdfg_client.payload_pruner.stats()
+       {'payloads': 1, 'pruned_keys': 86, 'bytes_saved': 20417, 'templates': 1}
+    """
+
+    def __init__(self, ttl: float = 300, strict: bool = False):
+        self.ttl = ttl
+        self.strict = strict
+        self.payloads = 0
+        self.pruned_keys = 0
+        self.bytes_saved = 0
+        self._fields = {}
+        self._lock = threading.Lock()
+
+    def fields(self, key, load):
+        """ Returns the <TemplateFields> of template `key`, calling `load()` for its
+        configuration when they are not known or expired.
+        """
+        with self._lock:
+            entry = self._fields.get(key)
+        if entry is not None and time.monotonic() < entry[1]:
+            return entry[0]
+        fields = TemplateFields(load())
+        with self._lock:
+            self._fields[key] = (fields, time.monotonic() + self.ttl)
+        return fields
+
+    def prune(self, key, data, load, codec):
+        """ Returns `data` pruned to the fields of template `key`.
+        Bytes saved are estimated by encoding the removed keys with `codec`.
+        """
+        fields = self.fields(key, load)
+        if not fields or not isinstance(data, dict):
+            return data
+        if self.strict:
+            for path in sorted(fields.paths):
+                if not has_path(data, path):
+                    warnings.warn(
+                        "Template {0} references {1}, missing from the data.".format(
+                            key[-1], ".".join(path)
+                        ),
+                        MissingFieldWarning,
+                        stacklevel=4,
+                    )
+        dropped = []
+        pruned = prune(data, fields.tree, dropped)
+        # Each removed entry also saves a separator, and loses the braces of the dict.
+        saved = sum(len(codec.dumps({k: v})) - 1 for k, v in dropped)
+        with self._lock:
+            self.payloads += 1
+            self.pruned_keys += len(dropped)
+            self.bytes_saved += saved
+        return pruned
+
+    def invalidate(self, *keys):
+        """ Forgets the fields of the given templates, or of every template when none is given. """
+        with self._lock:
+            if not keys:
+                self._fields.clear()
+            for key in keys:
+                self._fields.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "payloads": self.payloads,
+                "pruned_keys": self.pruned_keys,
+                "bytes_saved": self.bytes_saved,
+                "templates": len(self._fields),
+            }
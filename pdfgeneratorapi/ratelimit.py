@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.ratelimit
+~~~~~~~~~~~~~~~~~~~~~~~~~
+
+This module contains the client-side adaptive rate limiter.
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Statuses telling the client to slow down. Only those in RETRY_STATUS_CODES are
+# retried, the server did not process the request.
+BACKOFF_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+RETRY_STATUS_CODES = frozenset([429, 503])
+
+
+def parse_retry_after(value):
+    """ Returns the seconds to wait from a Retry-After value (seconds or HTTP date). """
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter(object):
+    """ A token bucket capping the request rate combined with an AIMD (additive increase,
+    multiplicative decrease) limit on the requests in flight. Both back off on 429/5xx
+    answers and ramp up again while answers are healthy. Retry-After and X-RateLimit-*
+    response headers are honoured. One limiter is shared by every thread using a client.
+
+    :param rate: Initial allowed requests per second. Default: 10.
+    :param max_rate: Upper bound of the allowed rate. Default: 100.
+    :param min_rate: Lower bound of the allowed rate. Default: 0.5.
+    :param burst: Token bucket size, requests sent at once after idling. Default: `rate`.
+    :param concurrency: Initial limit of requests in flight. Default: 8.
+    :param max_concurrency: Upper bound of requests in flight. Default: 64.
+    :param rate_step: Requests/sec added to the rate per second of healthy answers. Default: 1.
+    :param backoff: Factor applied to rate and concurrency on a backoff status. Default: 0.5.
+    :param cooldown: Minimum seconds between two backoffs, so a burst of errors from
+                     requests sent together counts once. Default: 1.
+    :param max_retries: Times a 429/503 answered request is resent. Default: 2.
+    :param window: Seconds the X-RateLimit-Limit header counts requests over. Default: 60.
+
+    Usage::
+
+      >>> pdfg_client = PDFGenerator(rate_limiter=RateLimiter(rate=5, max_rate=20))
+      >>> pdfg_client.rate_limiter.stats()
+       {'allowed_rate': 5.0, 'concurrency_limit': 8, 'in_flight': 0, 'queue_depth': 0, ...}
+    """
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        max_rate: float = 100.0,
+        min_rate: float = 0.5,
+        burst: float = None,
+        concurrency: int = 8,
+        max_concurrency: int = 64,
+        rate_step: float = 1.0,
+        backoff: float = 0.5,
+        cooldown: float = 1.0,
+        max_retries: int = 2,
+        window: float = 60.0,
+    ):
+        self.rate = float(rate)
+        self.max_rate = float(max_rate)
+        self.min_rate = float(min_rate)
+        self.burst = float(burst or rate)
+        self.concurrency = float(concurrency)
+        self.max_concurrency = max_concurrency
+        self.rate_step = rate_step
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.max_retries = max_retries
+        self.window = window
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.backoffs = 0
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._backed_off_at = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def allowed_rate(self):
+        """ Requests per second currently allowed. """
+        return self.rate
+
+    @property
+    def concurrency_limit(self):
+        """ Requests in flight currently allowed. """
+        return max(1, int(self.concurrency))
+
+    def _refill(self, now):
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._refilled_at) * self.rate
+        )
+        self._refilled_at = now
+
+    def acquire(self, deadline=None):
+        """ Blocks until a request may be sent, or raises <RequestTimeout> (phase `queue`)
+        once `deadline` expires first.
+        """
+        if deadline is not None:
+            # Cancelling the deadline wakes the waiting threads up.
+            deadline.add_callback(self._wake)
+        with self._condition:
+            self.queue_depth += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if now < self._blocked_until:
+                        timeout = self._blocked_until - now
+                    elif self.in_flight >= self.concurrency_limit:
+                        timeout = None
+                    elif self._tokens < 1:
+                        timeout = (1 - self._tokens) / self.rate
+                    else:
+                        self._tokens -= 1
+                        self.in_flight += 1
+                        return
+                    if deadline is not None:
+                        deadline.check("queue")
+                        timeout = deadline.cap(timeout)
+                    self._condition.wait(timeout)
+            finally:
+                self.queue_depth -= 1
+                if deadline is not None:
+                    deadline.remove_callback(self._wake)
+
+    def _wake(self):
+        with self._condition:
+            self._condition.notify_all()
+
+    def release(self, status_code=None, headers=None):
+        """ Reports the outcome of a request sent after `acquire()`.
+        :param status_code: Status of the answer, None when the request failed without one.
+        :param headers: Headers of the answer.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if status_code is None or status_code in BACKOFF_STATUS_CODES:
+                self._back_off(now)
+            else:
+                self._ramp_up()
+            if headers:
+                self._apply_headers(headers, now)
+            self._condition.notify_all()
+
+    def _back_off(self, now):
+        if now - self._backed_off_at < self.cooldown:
+            return
+        self._backed_off_at = now
+        self.backoffs += 1
+        self.rate = max(self.min_rate, self.rate * self.backoff)
+        self.concurrency = max(1.0, self.concurrency * self.backoff)
+        self._tokens = min(self._tokens, 1.0)
+
+    def _ramp_up(self):
+        # Per answer, so the rate grows by `rate_step` per second of healthy answers
+        # and the concurrency limit by one per `concurrency` answers.
+        self.rate = min(self.max_rate, self.rate + self.rate_step / self.rate)
+        self.burst = max(self.burst, self.rate)
+        self.concurrency = min(
+            self.max_concurrency, self.concurrency + 1.0 / self.concurrency
+        )
+
+    def _apply_headers(self, headers, now):
+        retry_after = headers.get("Retry-After")
+        if retry_after is not None:
+            seconds = parse_retry_after(retry_after)
+            if seconds is not None:
+                self._blocked_until = max(self._blocked_until, now + seconds)
+        limit = headers.get("X-RateLimit-Limit")
+        if limit is not None:
+            try:
+                self.max_rate = max(self.min_rate, float(limit) / self.window)
+                self.rate = min(self.rate, self.max_rate)
+            except ValueError:
+                pass
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is not None and reset is not None:
+            try:
+                if int(remaining) <= 0:
+                    reset = float(reset)
+                    # Either an epoch timestamp or seconds from now.
+                    seconds = reset - time.time() if reset > 1e9 else reset
+                    self._blocked_until = max(self._blocked_until, now + seconds)
+            except ValueError:
+                pass
+
+    def stats(self):
+        with self._condition:
+            return {
+                "allowed_rate": self.rate,
+                "concurrency_limit": self.concurrency_limit,
+                "in_flight": self.in_flight,
+                "queue_depth": self.queue_depth,
+                "backoffs": self.backoffs,
+            }
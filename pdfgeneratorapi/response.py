@@ -7,25 +7,129 @@ pdfgeneratorapi.response
 This module contains the response class.
 """
 
-from dateutil.parser import parse
+import datetime
 import re
+from functools import lru_cache
+
+from dateutil.parser import parse
+from dateutil.tz import tzoffset, tzutc
+
+from .constants import DATE_FIELDS
 
+FIRST_CAP_RE = re.compile("(.)([A-Z][a-z]+)")
+ALL_CAP_RE = re.compile("([a-z0-9])([A-Z])")
+# ISO-8601 and the API's "YYYY-MM-DD HH:MM:SS" format.
+DATE_RE = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})"
+    r"(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:[.,](\d{1,6})\d*)?)?)?"
+    r"\s*(Z|[+-]\d{2}(?::?\d{2})?)?$"
+)
 
+
+@lru_cache(maxsize=4096)
 def convert_snake_case(name):
-    s1 = re.sub("(.)([A-Z][a-z]+)", r"\1_\2", name)
-    return re.sub("([a-z0-9])([A-Z])", r"\1_\2", s1).lower()
+    s1 = FIRST_CAP_RE.sub(r"\1_\2", name)
+    return ALL_CAP_RE.sub(r"\1_\2", s1).lower()
+
+
+def parse_date(value):
+    """ Strictly parses an ISO-8601 / API formatted date string.
+    Returns a <datetime.datetime> or None when `value` is not in that format.
+    """
+    match = DATE_RE.match(value)
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, fraction, zone = match.groups()
+    if zone is None:
+        tzinfo = None
+    elif zone == "Z":
+        tzinfo = tzutc()
+    else:
+        sign = -1 if zone[0] == "-" else 1
+        digits = zone[1:].replace(":", "")
+        offset = int(digits[:2]) * 3600 + int(digits[2:] or 0) * 60
+        tzinfo = tzoffset(None, sign * offset)
+    try:
+        return datetime.datetime(
+            int(year),
+            int(month),
+            int(day),
+            int(hour or 0),
+            int(minute or 0),
+            int(second or 0),
+            int((fraction or "0").ljust(6, "0")),
+            tzinfo=tzinfo,
+        )
+    except ValueError:
+        return None
+
+
+def convert_value(name, value):
+    """ Converts date strings to <datetime.datetime>. Only values of known date fields or
+    strings shaped like an ISO date are parsed, anything else is returned unchanged.
+    """
+    if not isinstance(value, str):
+        return value
+    if name in DATE_FIELDS:
+        date = parse_date(value)
+        if date is not None:
+            return date
+        try:
+            # Uncommon formats of a known date field.
+            return parse(value)
+        except (ValueError, OverflowError):
+            return value
+    if len(value) >= 10 and value[4:5] == "-" and value[:4].isdigit():
+        date = parse_date(value)
+        if date is not None:
+            return date
+    return value
 
 
 class PDFGeneratorResponse(object):
+    """ Exposes the keys of an API response dict as snake_case attributes.
+
+    Nothing is converted up front: the raw dict is kept and a field is converted (date
+    parsing, wrapping of nested dicts) the first time its attribute is read, then cached.
+    """
+
+    # The JSON codec serving `to_json`, set on top-level responses by `create_py_object`.
+    _codec = None
+
     # Source - https://stackoverflow.com/a/6993694/7448094
     def __init__(self, data):
-        for name, value in data.items():
-            try:
-                # string to datetime
-                value = parse(value)
-            except (ValueError, TypeError):
-                pass
-            setattr(self, convert_snake_case(name), self._wrap(value))
+        self._data = data
+        self._attribute_keys = None
+
+    def _keys(self):
+        """ Maps attribute names to the keys of the raw dict. """
+        if self._attribute_keys is None:
+            self._attribute_keys = {
+                convert_snake_case(name): name for name in self._data
+            }
+        return self._attribute_keys
+
+    def __getattr__(self, name):
+        # Only called for attributes which are not materialised yet.
+        if name.startswith("__") or name in ("_data", "_attribute_keys"):
+            raise AttributeError(name)
+        if name == "to_json" and self._codec is not None:
+            self.to_json = self._codec.dumps(self.to_dict).decode("utf-8")
+            return self.to_json
+        try:
+            key = self._keys()[name]
+        except KeyError:
+            raise AttributeError(
+                "{0!r} object has no attribute {1!r}".format(type(self).__name__, name)
+            )
+        value = self._wrap(convert_value(name, self._data[key]))
+        self.__dict__[name] = value
+        return value
+
+    def __dir__(self):
+        return sorted(
+            set(super(PDFGeneratorResponse, self).__dir__()) | set(self._keys())
+        )
 
     def _wrap(self, value):
         if isinstance(value, (tuple, list, set, frozenset)):
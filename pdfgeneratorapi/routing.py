@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.routing
+~~~~~~~~~~~~~~~~~~~~~~~
+
+This module contains the client pool serving many workspaces from several regions over
+one connection pool per region.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from requests.exceptions import RequestException
+
+from .cache import TemplateCache
+from .exceptions import IncorrectParameterError, RequiredParameterMissing
+from .hedging import HedgePolicy
+from .instrumentation import MetricsRegistry
+from .pruning import PayloadPruner
+from .transport import Transport
+from .wrapper import PDFGenerator
+
+# Client options whose True value is turned into one instance shared by every client.
+SHARED_OPTIONS = {
+    "template_cache": TemplateCache,
+    "metrics": MetricsRegistry,
+    "prune_payloads": PayloadPruner,
+    "hedge": HedgePolicy,
+}
+
+
+class BoundPDFGenerator(PDFGenerator):
+    """ A <PDFGenerator> bound for good to one workspace of one region, handed out by a
+    <ClientPool>. It shares the connection pool of its region, so `close()` leaves the
+    connections open: they belong to the pool.
+    """
+
+    @property
+    def workspace(self):
+        return self._workspace
+
+    @workspace.setter
+    def workspace(self, workspace):
+        if getattr(self, "_workspace", workspace) != workspace:
+            raise IncorrectParameterError(
+                "This client is bound to workspace {0}. Get a client for {1} from its "
+                "ClientPool instead.".format(self._workspace, workspace)
+            )
+        self._workspace = workspace
+
+    def set_workspace(self, workspace):
+        self.workspace = workspace
+        return workspace
+
+    def close(self):
+        pass
+
+
+class RegionStats(object):
+    """ Latency and health of one region, fed by every request sent to it.
+
+    :param region: The region.
+    :param alpha: Weight of the newest sample in the latency moving average.
+    :param max_failures: Consecutive failures (connection errors, 5xx) after which the
+                         region is unhealthy.
+    :param retry_after: Seconds an unhealthy region is skipped before it is tried again.
+    """
+
+    __slots__ = (
+        "region",
+        "alpha",
+        "max_failures",
+        "retry_after",
+        "latency",
+        "requests",
+        "errors",
+        "failures",
+        "retry_at",
+        "_lock",
+    )
+
+    def __init__(self, region, alpha=0.2, max_failures=3, retry_after=30):
+        self.region = region
+        self.alpha = alpha
+        self.max_failures = max_failures
+        self.retry_after = retry_after
+        self.latency = None
+        self.requests = 0
+        self.errors = 0
+        self.failures = 0
+        self.retry_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def healthy(self):
+        return self.failures < self.max_failures
+
+    def available(self, now):
+        """ Tells whether requests may be routed to the region at monotonic time `now`. """
+        return self.healthy or now >= self.retry_at
+
+    def observe(self, seconds, ok):
+        with self._lock:
+            self.requests += 1
+            if self.latency is None:
+                self.latency = seconds
+            else:
+                self.latency += self.alpha * (seconds - self.latency)
+            if ok:
+                self.failures = 0
+            else:
+                self._fail()
+
+    def failure(self):
+        """ Records a request which got no answer. """
+        with self._lock:
+            self._fail()
+
+    def _fail(self):
+        self.errors += 1
+        self.failures += 1
+        if self.failures >= self.max_failures:
+            self.retry_at = time.monotonic() + self.retry_after
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "latency": self.latency,
+                "healthy": self.healthy,
+                "requests": self.requests,
+                "errors": self.errors,
+            }
+
+
+class RegionTransport(Transport):
+    """ Wraps the transport of a region, recording the latency (up to the response
+    headers) and the outcome of every request in its <RegionStats>.
+    """
+
+    def __init__(self, transport, stats):
+        self.transport = transport
+        self.stats = stats
+
+    @property
+    def session(self):
+        return self.transport.session
+
+    def request(
+        self,
+        method,
+        url,
+        headers=None,
+        params=None,
+        data=None,
+        stream=False,
+        timeout=None,
+    ):
+        start = time.perf_counter()
+        try:
+            response = self.transport.request(
+                method,
+                url,
+                headers=headers,
+                params=params,
+                data=data,
+                stream=stream,
+                timeout=timeout,
+            )
+        except RequestException:
+            self.stats.failure()
+            raise
+        self.stats.observe(time.perf_counter() - start, response.status_code < 500)
+        return response
+
+    def interrupt(self, thread_id):
+        self.transport.interrupt(thread_id)
+
+    def close(self):
+        self.transport.close()
+
+
+class ClientPool(object):
+    """ Hands out clients bound to a (region, workspace) pair. Clients of a region share
+    one connection pool; every pair gets its own signing context. Clients are cached, so
+    getting one per call is cheap and lets region-agnostic calls follow the fastest
+    healthy region.
+
+    :param api_key: API Key for PDFGeneratorAPI.com. Default: $PDF_GENERATOR_KEY.
+    :param api_secret: API Secret Key for PDFGeneratorAPI.com. Default: $PDF_GENERATOR_SECRET.
+    :param regions: Regions (subdomains) to route to. Default: (us1,).
+    :param api_urls: {region: base url} replacing the public url of a region, e.g. for a
+                     local stand-in server.
+    :param max_clients: Bound clients kept, least recently used are dropped. Default: 1024.
+    :param health_check_interval: Seconds between background `check_health()` runs.
+                                  Default: None (only when called).
+    :param max_failures: Consecutive failures making a region unhealthy. Default: 3.
+    :param retry_after: Seconds an unhealthy region is skipped before it is tried again,
+                        unless a health check finds it healthy earlier. Default: 30.
+    :param client_options: Any other <PDFGenerator> parameter, applied to every client.
+                           `template_cache`, `metrics`, `prune_payloads` and `hedge` given
+                           as True are shared by every client.
+
+    Usage::
+
+      >>> pool = ClientPool(regions=("us1", "eu1"), pool_maxsize=32, metrics=True)
+      >>> pool.client("customer@example.com").create_document(template_id=123, data={})
+      >>> pool.client("other@example.com", region="eu1").all_templates()
+      >>> pool.stats()
+       {'us1': {'latency': 0.212, 'healthy': True, 'requests': 1, 'errors': 0}, ...}
+    """
+
+    def __init__(
+        self,
+        api_key: str = None,
+        api_secret: str = None,
+        regions=("us1",),
+        api_urls: dict = None,
+        max_clients: int = 1024,
+        health_check_interval: float = None,
+        max_failures: int = 3,
+        retry_after: float = 30,
+        **client_options
+    ):
+        self.__api_key = api_key or os.environ.get("PDF_GENERATOR_KEY")
+        self.__api_secret = api_secret or os.environ.get("PDF_GENERATOR_SECRET")
+        if not (self.__api_key and self.__api_secret):
+            raise RequiredParameterMissing("Missing API Required Parameters")
+        if not regions:
+            raise IncorrectParameterError("A ClientPool needs at least one region.")
+        self.regions = tuple(regions)
+        self.api_urls = dict(api_urls or {})
+        self.max_clients = max_clients
+        # A hedging policy built here is closed with the pool, a given one by its owner.
+        self._owns_hedge = client_options.get("hedge") is True
+        for name, factory in SHARED_OPTIONS.items():
+            if client_options.get(name) is True:
+                client_options[name] = factory()
+        self.client_options = client_options
+        self.metrics = client_options.get("metrics")
+        self._stats = OrderedDict(
+            (
+                region,
+                RegionStats(region, max_failures=max_failures, retry_after=retry_after),
+            )
+            for region in self.regions
+        )
+        self._transports = {}
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._health_thread = None
+        if health_check_interval:
+            self._health_thread = threading.Thread(
+                target=self._check_health_every,
+                args=(health_check_interval,),
+                daemon=True,
+            )
+            self._health_thread.start()
+
+    def client(self, workspace: str, region: str = None):
+        """ Returns the <BoundPDFGenerator> of `workspace` in `region`, the fastest
+        healthy region when not given.
+        """
+        if region is None:
+            region = self.select_region()
+        elif region not in self._stats:
+            raise IncorrectParameterError(
+                "{0} is not a region of this pool. Available: {1}".format(
+                    region, ", ".join(self.regions)
+                )
+            )
+        key = (region, workspace)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+            client = self._clients[key] = self._new_client(region, workspace)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+            return client
+
+    def _new_client(self, region, workspace):
+        options = dict(self.client_options, region=region)
+        if region in self.api_urls:
+            options["api_url"] = self.api_urls[region]
+        transport = self._transports.get(region)
+        if transport is not None:
+            options["transport"] = transport
+        client = BoundPDFGenerator(
+            api_key=self.__api_key,
+            api_secret=self.__api_secret,
+            workspace=workspace,
+            **options
+        )
+        if transport is None:
+            # The first client of a region builds its connection pool, shared from then on.
+            transport = RegionTransport(client.transport, self._stats[region])
+            client.transport = self._transports[region] = transport
+        return client
+
+    def select_region(self):
+        """ Returns the healthy region with the lowest latency. Regions without a latency
+        sample yet come first, every region when none is healthy.
+        """
+        now = time.monotonic()
+        stats = self._stats.values()
+        candidates = [region for region in stats if region.available(now)] or stats
+        return min(
+            candidates,
+            key=lambda region: 0.0 if region.latency is None else region.latency,
+        ).region
+
+    def check_health(self):
+        """ Probes the base url of every region, unsigned: any answer below 500 is healthy.
+        The probe latency feeds the region latency. Returns {region: healthy}.
+        """
+        health = {}
+        for region in self.regions:
+            client = self.client(None, region)
+            try:
+                response = client.transport.request(
+                    "GET", client.API_URL, timeout=client.request_timeout()
+                )
+                response.close()
+                health[region] = response.status_code < 500
+            except RequestException:
+                health[region] = False
+        return health
+
+    def _check_health_every(self, interval):
+        while not self._stopped.wait(interval):
+            self.check_health()
+
+    def stats(self):
+        """ Returns {region: {latency, healthy, requests, errors}}. """
+        return {region: stats.as_dict() for region, stats in self._stats.items()}
+
+    def close(self):
+        """ Stops the health checks, closes the connections of every region and the
+        hedging threads of `hedge=True`.
+        """
+        self._stopped.set()
+        if self._health_thread is not None:
+            self._health_thread.join()
+        with self._lock:
+            transports = list(self._transports.values())
+            self._transports.clear()
+            self._clients.clear()
+        for transport in transports:
+            transport.close()
+        if self._owns_hedge:
+            self.client_options["hedge"].close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
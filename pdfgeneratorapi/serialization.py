@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.serialization
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+This module contains the JSON codecs used for request bodies and responses.
+`orjson` and `ujson` are used when installed, the standard library otherwise.
+"""
+
+import json
+
+from .exceptions import IncorrectParameterError
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None
+
+
+class JSONCodec(object):
+    """ The standard library codec. Every codec encodes to and decodes from UTF-8 bytes. """
+
+    name = "json"
+
+    def dumps(self, obj):
+        return json.dumps(obj).encode("utf-8")
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    name = "orjson"
+
+    def dumps(self, obj):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+class UjsonCodec(JSONCodec):
+    name = "ujson"
+
+    def dumps(self, obj):
+        return ujson.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+    def loads(self, data):
+        return ujson.loads(data)
+
+
+CODECS = {"json": JSONCodec, "orjson": OrjsonCodec, "ujson": UjsonCodec}
+AVAILABLE_CODECS = [
+    name
+    for name, module in (("orjson", orjson), ("ujson", ujson), ("json", json))
+    if module is not None
+]
+
+
+def get_codec(codec="auto"):
+    """ Returns a codec instance.
+    :param codec: A codec name (auto, orjson, ujson, json) or a <JSONCodec> instance.
+                  `auto` picks the fastest installed one.
+    """
+    if isinstance(codec, JSONCodec):
+        return codec
+    if codec == "auto":
+        codec = AVAILABLE_CODECS[0]
+    if codec not in AVAILABLE_CODECS:
+        raise IncorrectParameterError(
+            "{0} is not an available JSON codec. Available: {1}".format(
+                codec, ", ".join(AVAILABLE_CODECS)
+            )
+        )
+    return CODECS[codec]()
+
+
+DEFAULT_CODEC = JSONCodec()
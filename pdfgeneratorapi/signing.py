@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.signing
+~~~~~~~~~~~~~~~~~~~~~~~
+
+This module contains the request signing used for Signature Authentication.
+"""
+
+import hashlib
+import hmac
+import sys
+from functools import lru_cache
+
+from . import __version__
+
+USER_AGENT = (
+    "pdfgeneratorapi/{api_region}/{api_version} Python/{package_version}/{sys_version}"
+)
+PYTHON_VERSION = sys.version.split(" ", 1)[0]
+
+
+def user_agent(region, version):
+    return USER_AGENT.format(
+        package_version=__version__,
+        sys_version=PYTHON_VERSION,
+        api_region=region,
+        api_version=version,
+    )
+
+
+class Signer(object):
+    """ Signs resources for one (api_key, api_secret, workspace) and holds the static
+    request headers of that workspace.
+    The signature is HMAC-SHA256(api_secret, api_key + resource + workspace): the keyed
+    HMAC state with `api_key` already absorbed is computed once and copied per resource,
+    and signatures are memoised per resource.
+
+    :param api_key: API Key for PDFGeneratorAPI.com.
+    :param api_secret: API Secret Key for PDFGeneratorAPI.com.
+    :param workspace: Name of the workspace.
+    :param headers: Request headers which do not depend on the resource.
+    :param cache_size: Number of memoised resource signatures. Default: 4096.
+    """
+
+    def __init__(self, api_key, api_secret, workspace, headers=None, cache_size=4096):
+        self.api_key = api_key
+        self.workspace = workspace
+        self.headers = headers or {}
+        self._prefix = hmac.new(
+            bytes(api_secret, "UTF-8"), bytes(api_key, "UTF-8"), hashlib.sha256
+        )
+        self._suffix = bytes("{0}".format(workspace), "UTF-8")
+        self.signature = lru_cache(maxsize=cache_size)(self._sign)
+
+    def _sign(self, resource):
+        signature = self._prefix.copy()
+        signature.update(bytes(resource, "UTF-8"))
+        signature.update(self._suffix)
+        return signature.hexdigest()
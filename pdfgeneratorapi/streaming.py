@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.streaming
+~~~~~~~~~~~~~~~~~~~~~~~~~
+
+This module contains the helpers which stream generated documents into a file, and
+listings into objects, without holding the whole payload in memory.
+"""
+
+import base64
+import binascii
+import codecs
+import json
+import os
+import re
+
+from .exceptions import InvalidFormat
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover
+    ijson = None
+
+JSON_ESCAPES = {
+    ord("/"): b"/",
+    ord("\\"): b"\\",
+    ord('"'): b'"',
+    ord("n"): b"",
+    ord("r"): b"",
+    ord("t"): b"",
+}
+BASE64_WHITESPACE = re.compile(rb"\s+")
+
+
+class open_sink(object):
+    """ Context manager yielding a binary file object for `sink`.
+    A path is opened (and closed) here, a file object is used as is.
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.file = None
+
+    def __enter__(self):
+        if isinstance(self.sink, (str, bytes, os.PathLike)):
+            self.file = open(self.sink, "wb")
+            return self.file
+        return self.sink
+
+    def __exit__(self, *args):
+        if self.file is not None:
+            self.file.close()
+
+
+class TeeWriter(object):
+    """ Writes every chunk to all of `fileobjs`. """
+
+    def __init__(self, *fileobjs):
+        self.fileobjs = fileobjs
+
+    def write(self, chunk):
+        for fileobj in self.fileobjs:
+            fileobj.write(chunk)
+
+
+class Base64Writer(object):
+    """ Decodes base64 text fed in arbitrary chunks and writes the bytes to `fileobj`. """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.pending = b""
+        self.bytes_written = 0
+
+    def write(self, chunk):
+        chunk = self.pending + BASE64_WHITESPACE.sub(b"", chunk)
+        usable = len(chunk) - len(chunk) % 4
+        self.pending = chunk[usable:]
+        if usable:
+            self._write(chunk[:usable])
+
+    def close(self):
+        if self.pending:
+            # Unpadded tail, pad it so `b64decode` accepts it.
+            self._write(self.pending + b"=" * (-len(self.pending) % 4))
+            self.pending = b""
+
+    def _write(self, encoded):
+        try:
+            decoded = base64.b64decode(encoded, validate=True)
+        except binascii.Error as err:
+            raise InvalidFormat("Document is not valid base64: {0}".format(err))
+        self.fileobj.write(decoded)
+        self.bytes_written += len(decoded)
+
+
+class JSONStringExtractor(object):
+    """ Streams the string value of a top-level `key` of a JSON document into `writer`
+    while keeping the rest of the document (usually a small `meta` object) in memory.
+
+    Feed the body chunk by chunk with `feed()`, then call `close()` which returns the
+    remaining document as a dict, with `key` mapped to an empty string.
+    """
+
+    def __init__(self, key, writer):
+        self.key = key
+        self.marker = re.compile(rb'"' + re.escape(key.encode("utf-8")) + rb'"\s*:\s*"')
+        self.writer = writer
+        self.head = b""
+        self.tail = []
+        self.state = "seek"
+        self.escaped = False
+
+    def feed(self, chunk):
+        if self.state == "seek":
+            self.head += chunk
+            match = self.marker.search(self.head)
+            if match is None:
+                return
+            chunk = self.head[match.end() :]
+            self.head = self.head[: match.end()]
+            self.state = "value"
+        if self.state == "value":
+            chunk = self._feed_value(chunk)
+        if self.state == "tail" and chunk:
+            self.tail.append(chunk)
+
+    def _feed_value(self, chunk):
+        """ Writes the string value out of `chunk`, returns whatever follows it. """
+        if not chunk:
+            return b""
+        parts = []
+        start = 0
+        if self.escaped:
+            parts.append(JSON_ESCAPES.get(chunk[0], b""))
+            self.escaped = False
+            start = 1
+        rest = b""
+        while True:
+            quote = chunk.find(b'"', start)
+            backslash = chunk.find(b"\\", start, None if quote < 0 else quote)
+            if backslash >= 0:
+                parts.append(chunk[start:backslash])
+                if backslash + 1 == len(chunk):
+                    self.escaped = True
+                    break
+                parts.append(JSON_ESCAPES.get(chunk[backslash + 1], b""))
+                start = backslash + 2
+            elif quote < 0:
+                parts.append(chunk[start:])
+                break
+            else:
+                parts.append(chunk[start:quote])
+                self.state = "tail"
+                rest = chunk[quote:]
+                break
+        self.writer.write(b"".join(parts))
+        return rest
+
+    def close(self):
+        if self.state == "seek":
+            raise InvalidFormat("Response has no `{0}` string value.".format(self.key))
+        self.writer.close()
+        return json.loads((self.head + b"".join(self.tail)).decode("utf-8"))
+
+
+class ChunkReader(object):
+    """ A read()-able file object over an iterable of byte chunks. """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = b""
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+        if size < 0:
+            data, self.buffer = self.buffer, b""
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+VALUE_DELIMITERS = frozenset(",]} \t\n\r")
+
+
+class JSONArrayScanner(object):
+    """ Incrementally decodes the elements of the array under `key` in a top-level JSON
+    object, with `json.JSONDecoder.raw_decode`. Memory is bounded by the largest element,
+    not the array. `feed()` returns the elements completed by a chunk.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.position = 0
+        # start, key, colon, value, array, done
+        self.state = "start"
+        self.current_key = None
+
+    def feed(self, chunk, final=False):
+        self.buffer = self.buffer[self.position :] + self.text_decoder.decode(
+            chunk, final
+        )
+        self.position = 0
+        items = []
+        while self.state != "done" and self._step(items, final):
+            pass
+        return items
+
+    def _skip(self, characters=""):
+        """ Skips whitespace and then one of `characters`. Returns the next character. """
+        self.position = WHITESPACE.match(self.buffer, self.position).end()
+        if self.position >= len(self.buffer):
+            return None
+        character = self.buffer[self.position]
+        if character in characters:
+            self.position += 1
+            return self._skip()
+        return character
+
+    def _decode(self, final):
+        """ Returns (True, value) for a complete value at the position, (False, None) when
+        more data is needed.
+        """
+        try:
+            value, end = self.decoder.raw_decode(self.buffer, self.position)
+        except ValueError:
+            if final:
+                raise InvalidFormat("Truncated or invalid JSON listing.")
+            return False, None
+        if (
+            not final
+            and self.buffer[self.position] not in '{["'
+            and (end == len(self.buffer) or self.buffer[end] not in VALUE_DELIMITERS)
+        ):
+            # A number or literal may continue in the next chunk.
+            return False, None
+        self.position = end
+        return True, value
+
+    def _step(self, items, final):
+        """ Advances the state machine once. Returns False when it needs more data. """
+        if self.state == "array":
+            character = self._skip(",")
+            if character is None:
+                return False
+            if character == "]":
+                self.position += 1
+                self.state = "key"
+                return True
+            complete, value = self._decode(final)
+            if complete:
+                items.append(value)
+            return complete
+        if self.state == "start":
+            character = self._skip()
+            if character is None:
+                return False
+            if character != "{":
+                raise InvalidFormat("Expected a JSON object.")
+            self.position += 1
+            self.state = "key"
+            return True
+        if self.state == "key":
+            character = self._skip(",")
+            if character is None:
+                return False
+            if character == "}":
+                self.state = "done"
+                return False
+            complete, self.current_key = self._decode(final)
+            if complete:
+                self.state = "colon"
+            return complete
+        if self.state == "colon":
+            character = self._skip()
+            if character is None:
+                return False
+            if character != ":":
+                raise InvalidFormat("Expected ':' in JSON object.")
+            self.position += 1
+            self.state = "value"
+            return True
+        # value
+        character = self._skip()
+        if character is None:
+            return False
+        if character == "[" and self.current_key == self.key:
+            self.position += 1
+            self.state = "array"
+            return True
+        # Other members are decoded and dropped.
+        complete, _ = self._decode(final)
+        if complete:
+            self.state = "key"
+        return complete
+
+
+def iter_json_items(chunks, key):
+    """ Yields the elements of the array under `key` in a top-level JSON object streamed as
+    byte `chunks`, as they are decoded. Uses `ijson` when installed.
+    """
+    if ijson is not None:
+        for item in ijson.items(ChunkReader(chunks), key + ".item", use_float=True):
+            yield item
+        return
+    scanner = JSONArrayScanner(key)
+    for chunk in chunks:
+        for item in scanner.feed(chunk):
+            yield item
+    for item in scanner.feed(b"", final=True):
+        yield item
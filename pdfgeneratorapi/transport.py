@@ -0,0 +1,934 @@
+# -*- coding: utf-8 -*-
+
+"""
+pdfgeneratorapi.transport
+~~~~~~~~~~~~~~~~~~~~~~~~~
+
+This module contains the transports `PDFGenerator` sends its prepared requests through:
+`requests` (the default), `httpx` (HTTP/2 capable) and an in-memory fake for tests and
+load tests. Every transport returns <requests.Response> objects, so error mapping,
+caching and streaming work the same whatever sends the requests.
+"""
+
+import asyncio
+import base64
+import datetime
+import json as jsonlib
+import re
+import socket
+import threading
+import time
+from collections import defaultdict, deque
+from http.client import responses
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from .exceptions import RequestTimeout
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+try:
+    import h2
+except ImportError:  # pragma: no cover
+    h2 = None
+
+
+class Transport(object):
+    """ Sends prepared requests. Subclasses implement `request()` and, when they hold
+    connections, `close()`.
+    """
+
+    def request(
+        self,
+        method,
+        url,
+        headers=None,
+        params=None,
+        data=None,
+        stream=False,
+        timeout=None,
+    ):
+        """ Returns a <requests.Response>. With `stream`, the body is left unread, to be
+        consumed with `iter_content()`. `timeout` is a (connect, read) tuple of seconds,
+        None for no limit. Connection errors raise <requests.RequestException>, timeouts
+        <requests.Timeout>.
+        """
+        raise NotImplementedError
+
+    def interrupt(self, thread_id):
+        """ Aborts the request the thread `thread_id` is waiting on, which then raises
+        <requests.RequestException>. Called from other threads to cancel requests at once;
+        transports which cannot abort a request let it finish.
+        """
+
+    def close(self):
+        pass
+
+
+# The connections RequestsTransport is waiting on, by thread, so that other threads can
+# abort them.
+_waiting_connections = {}
+_waiting_lock = threading.Lock()
+
+
+class TrackedPoolMixin(object):
+    """ Registers the connection a thread is waiting on until the response headers arrive. """
+
+    def _make_request(self, conn, *args, **kwargs):
+        thread_id = threading.get_ident()
+        with _waiting_lock:
+            _waiting_connections[thread_id] = conn
+        try:
+            return super(TrackedPoolMixin, self)._make_request(conn, *args, **kwargs)
+        finally:
+            with _waiting_lock:
+                _waiting_connections.pop(thread_id, None)
+
+
+class TrackedHTTPConnectionPool(TrackedPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class TrackedHTTPSConnectionPool(TrackedPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class RequestsTransport(Transport):
+    """ Sends requests with `requests` over a connection pool shared by every thread.
+
+    :param pool_connections: Number of per-host connection pools to keep. Default: 10.
+    :param pool_maxsize: Maximum number of connections kept open per host. Default: 10.
+    :param pool_block: Block when all `pool_maxsize` connections of a host are busy instead
+                       of opening a throwaway connection. Default: False.
+    :param keep_alive: Reuse connections between requests. Default: True.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        keep_alive: bool = True,
+    ):
+        self.keep_alive = keep_alive
+        # The adapter (and the urllib3 pool manager behind it) is thread-safe and shared by all
+        # threads. Sessions carry mutable state (cookies, hooks), so every thread gets its own.
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+        )
+        self.adapter.poolmanager.pool_classes_by_scheme = {
+            "http": TrackedHTTPConnectionPool,
+            "https": TrackedHTTPSConnectionPool,
+        }
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        """ Returns the calling thread's <requests.Session> bound to the shared connection pool. """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self.adapter)
+            session.mount("http://", self.adapter)
+            if not self.keep_alive:
+                session.headers["Connection"] = "close"
+            self._local.session = session
+        return session
+
+    def request(
+        self,
+        method,
+        url,
+        headers=None,
+        params=None,
+        data=None,
+        stream=False,
+        timeout=None,
+    ):
+        return self.session.request(
+            method,
+            url=url,
+            headers=headers,
+            params=params,
+            data=data,
+            stream=stream,
+            timeout=timeout,
+        )
+
+    def interrupt(self, thread_id):
+        """ Shuts the socket the thread is waiting for response headers on down. """
+        with _waiting_lock:
+            sock = getattr(_waiting_connections.get(thread_id), "sock", None)
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def close(self):
+        """ Closes all pooled connections. """
+        self.adapter.close()
+
+
+class HTTPXRaw(object):
+    """ The `raw` of a <requests.Response> built from a streamed <httpx.Response>. The
+    connection is given back (`on_close`) once the body is read to the end or closed,
+    whichever comes first.
+    """
+
+    def __init__(self, response, on_close=None):
+        self.response = response
+        self.on_close = on_close
+
+    def stream(self, chunk_size, decode_content=True):
+        for chunk in self.response.iter_bytes(chunk_size):
+            yield chunk
+        self.release_conn()
+
+    def read(self, amt=None, decode_content=True):
+        content = self.response.read()
+        self.release_conn()
+        return content
+
+    def release_conn(self):
+        # Called by `requests.Response.close()`, which skips `close()` once the body
+        # was consumed.
+        self.response.close()
+        on_close, self.on_close = self.on_close, None
+        if on_close is not None:
+            on_close()
+
+    def close(self):
+        self.release_conn()
+
+
+def httpx_to_requests(response, elapsed=None, stream=False, on_close=None):
+    """ Returns a <requests.Response> with the status, headers and body of an <httpx.Response>.
+    `on_close` is called once a streamed body is read to the end or closed.
+    """
+    converted = requests.Response()
+    converted.status_code = response.status_code
+    converted.headers = CaseInsensitiveDict(response.headers)
+    converted.url = str(response.url)
+    converted.reason = response.reason_phrase
+    converted.encoding = response.encoding
+    converted.elapsed = elapsed or response.elapsed
+    if stream:
+        converted.raw = HTTPXRaw(response, on_close)
+    else:
+        converted._content = response.content
+        converted._content_consumed = True
+    return converted
+
+
+def httpx_timeout(timeout):
+    """ Returns the <httpx.Timeout> of a (connect, read) tuple. Writes get the read
+    timeout and waiting for a pooled connection the connect one.
+    """
+    if timeout is None:
+        return httpx.Timeout(None)
+    connect, read = timeout
+    return httpx.Timeout(read, connect=connect, pool=connect)
+
+
+def send_httpx(
+    client,
+    method,
+    url,
+    headers=None,
+    params=None,
+    data=None,
+    stream=False,
+    timeout=None,
+):
+    """ Sends a request with an <httpx.Client>. Returns the <httpx.Response> and the time
+    to its headers, httpx errors are raised as their `requests` counterparts.
+    """
+    start = time.perf_counter()
+    try:
+        request = client.build_request(
+            method,
+            url,
+            headers=headers,
+            params=params,
+            content=data,
+            timeout=httpx_timeout(timeout),
+        )
+        response = client.send(request, stream=stream)
+    except httpx.ConnectTimeout as exc:
+        raise requests.exceptions.ConnectTimeout(exc)
+    except httpx.ReadTimeout as exc:
+        raise requests.exceptions.ReadTimeout(exc)
+    except httpx.TimeoutException as exc:
+        raise requests.exceptions.Timeout(exc)
+    except httpx.TransportError as exc:
+        raise requests.exceptions.ConnectionError(exc)
+    return response, datetime.timedelta(seconds=time.perf_counter() - start)
+
+
+class HTTPXTransport(Transport):
+    """ Sends requests with `httpx`, optionally over HTTP/2. Requires `httpx`, and `h2` for
+    HTTP/2 (pip install pdfgeneratorapi[http2]). httpx puts every HTTP/2 request to a host
+    on a single connection, see <HTTP2Transport> to spread them over several.
+
+    :param http2: Negotiate HTTP/2. Default: True when `h2` is installed.
+    :param pool_maxsize: Maximum number of connections kept open per host. Default: 10.
+    :param keep_alive: Reuse connections between requests. Default: True.
+    """
+
+    def __init__(self, http2: bool = None, pool_maxsize: int = 10, keep_alive=True):
+        if httpx is None:
+            raise ImportError(
+                "HTTPXTransport requires httpx: pip install pdfgeneratorapi[async]"
+            )
+        self.http2 = h2 is not None if http2 is None else http2
+        self.client = httpx.Client(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=pool_maxsize,
+                max_keepalive_connections=pool_maxsize if keep_alive else 0,
+            ),
+        )
+
+    def request(
+        self,
+        method,
+        url,
+        headers=None,
+        params=None,
+        data=None,
+        stream=False,
+        timeout=None,
+    ):
+        response, elapsed = send_httpx(
+            self.client, method, url, headers, params, data, stream, timeout
+        )
+        return httpx_to_requests(response, elapsed, stream)
+
+    def close(self):
+        self.client.close()
+
+
+# The cleartext HTTP/2 connection preface and an empty SETTINGS frame (length 0, type 4,
+# no flags, stream 0). HTTP/2 servers answer with their own SETTINGS frame.
+H2_PREFACE = b"PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n\x00\x00\x00\x04\x00\x00\x00\x00\x00"
+H2_FRAME_HEADER_SIZE = 9
+H2_SETTINGS_FRAME = 0x04
+
+
+def origin_address(origin):
+    """ Returns the (host, port) of a cleartext (scheme, netloc) origin. """
+    parts = urlsplit("//" + origin[1])
+    return parts.hostname, parts.port or 80
+
+
+def is_h2_settings(data):
+    """ Tells whether the first bytes answered to <H2_PREFACE> are a SETTINGS frame. """
+    return len(data) == H2_FRAME_HEADER_SIZE and data[3] == H2_SETTINGS_FRAME
+
+
+def probe_h2c(origin, timeout=None):
+    """ Tells whether a cleartext origin speaks HTTP/2, sending it the connection preface
+    on a connection of its own: no request is ever written. Connection errors raise
+    <requests.ConnectionError>, timeouts <requests.ConnectTimeout>.
+    """
+    try:
+        with socket.create_connection(origin_address(origin), timeout) as sock:
+            sock.sendall(H2_PREFACE)
+            data = b""
+            while len(data) < H2_FRAME_HEADER_SIZE:
+                chunk = sock.recv(H2_FRAME_HEADER_SIZE - len(data))
+                if not chunk:
+                    break
+                data += chunk
+    except socket.timeout as exc:
+        raise requests.exceptions.ConnectTimeout(exc)
+    except OSError as exc:
+        raise requests.exceptions.ConnectionError(exc)
+    return is_h2_settings(data)
+
+
+async def async_probe_h2c(origin, timeout=None):
+    """ The coroutine counterpart of <probe_h2c>, raising <httpx.ConnectTimeout> and
+    <httpx.ConnectError>.
+    """
+
+    async def probe():
+        reader, writer = await asyncio.open_connection(*origin_address(origin))
+        try:
+            writer.write(H2_PREFACE)
+            await writer.drain()
+            data = b""
+            while len(data) < H2_FRAME_HEADER_SIZE:
+                chunk = await reader.read(H2_FRAME_HEADER_SIZE - len(data))
+                if not chunk:
+                    break
+                data += chunk
+            return data
+        finally:
+            writer.close()
+
+    try:
+        data = await asyncio.wait_for(probe(), timeout)
+    except asyncio.TimeoutError:
+        raise httpx.ConnectTimeout("The HTTP/2 preface timed out.")
+    except OSError as exc:
+        raise httpx.ConnectError(str(exc))
+    return is_h2_settings(data)
+
+
+class HTTP2Connection(object):
+    """ One HTTP/2 connection (an httpx client limited to one connection) and its number of
+    open streams.
+    """
+
+    __slots__ = ("client", "streams")
+
+    def __init__(self, client):
+        self.client = client
+        self.streams = 0
+
+
+class HTTP2Pool(object):
+    """ The connection selection shared by <HTTP2Transport> and <AsyncHTTP2Transport>.
+
+    Requests to an origin go to its least busy HTTP/2 connection with a free stream. A new
+    connection is opened only when every connection has `max_streams` open streams, up to
+    `max_connections`; callers wait beyond that. Origins answering over HTTP/1.1 fall back
+    to a plain HTTP/1.1 pool for good: TLS origins without h2 in their negotiation, and
+    cleartext origins not answering the HTTP/2 preface, sent on a probe connection before
+    their first request. A failure once a request went out is raised, the request is
+    never sent again.
+    """
+
+    client_class = None
+
+    def __init__(
+        self,
+        max_connections: int = 2,
+        max_streams: int = 100,
+        pool_maxsize: int = 10,
+        keep_alive: bool = True,
+    ):
+        if httpx is None:
+            raise ImportError(
+                "HTTP/2 requires httpx and h2: pip install pdfgeneratorapi[http2]"
+            )
+        self.max_connections = max_connections
+        self.max_streams = max_streams
+        # Without h2 installed, every origin uses HTTP/1.1.
+        self.http2 = h2 is not None
+        self.connections = defaultdict(list)
+        self.http1_origins = set()
+        self.http2_origins = set()
+        self.fallbacks = 0
+        self.http1 = self.client_class(
+            limits=httpx.Limits(
+                max_connections=pool_maxsize,
+                max_keepalive_connections=pool_maxsize if keep_alive else 0,
+            )
+        )
+
+    @staticmethod
+    def origin(url):
+        parts = urlsplit(url)
+        return parts.scheme, parts.netloc
+
+    @property
+    def connection_count(self):
+        """ Number of HTTP/2 connections opened. """
+        return sum(len(connections) for connections in self.connections.values())
+
+    def _pick(self, origin):
+        """ Returns a connection with a free stream, counting it, or None when callers
+        have to wait.
+        """
+        connections = self.connections[origin]
+        connection = min(connections, key=lambda c: c.streams, default=None)
+        if connection is None or connection.streams >= self.max_streams:
+            if len(connections) >= self.max_connections:
+                return None
+            # TLS origins negotiate HTTP/2 with ALPN, cleartext ones use prior knowledge.
+            connection = HTTP2Connection(
+                self.client_class(
+                    http1=origin[0] == "https",
+                    http2=True,
+                    limits=httpx.Limits(max_connections=1),
+                )
+            )
+            connections.append(connection)
+        connection.streams += 1
+        return connection
+
+    def _needs_probe(self, origin):
+        return (
+            origin[0] == "http"
+            and origin not in self.http2_origins
+            and origin not in self.http1_origins
+        )
+
+    def _probed(self, origin, http2):
+        if http2:
+            self.http2_origins.add(origin)
+        else:
+            self._fall_back(origin)
+
+    def _fall_back(self, origin):
+        if origin not in self.http1_origins:
+            self.http1_origins.add(origin)
+            self.fallbacks += 1
+
+
+class HTTP2Transport(HTTP2Pool, Transport):
+    """ Multiplexes concurrent requests over few HTTP/2 connections per origin (i.e. per
+    region), with at most `max_streams` requests in flight on each connection, and falls
+    back to HTTP/1.1 when the server does not speak HTTP/2. Requires `httpx` and `h2`
+    (pip install pdfgeneratorapi[http2]).
+
+    :param max_connections: HTTP/2 connections opened per origin. Default: 2.
+    :param max_streams: Requests in flight per connection. The server's
+                        SETTINGS_MAX_CONCURRENT_STREAMS also applies. Default: 100.
+    :param pool_maxsize: Connections per host of the HTTP/1.1 fallback. Default: 10.
+    :param keep_alive: Reuse HTTP/1.1 fallback connections. Default: True.
+
+    Usage::
+
+      >>> pdfg_client = PDFGenerator(transport=HTTP2Transport(max_connections=2, max_streams=200))
+    """
+
+    client_class = httpx.Client if httpx is not None else None
+
+    def __init__(self, *args, **kwargs):
+        super(HTTP2Transport, self).__init__(*args, **kwargs)
+        self._condition = threading.Condition()
+        self._probe_lock = threading.Lock()
+
+    def _acquire(self, origin, timeout=None):
+        """ Returns a connection with a free stream, waiting up to `timeout` seconds for
+        one (None for no limit). Raises <RequestTimeout> with the pool phase after that.
+        """
+        with self._condition:
+            connection = self._condition.wait_for(lambda: self._pick(origin), timeout)
+        if connection is None:
+            raise RequestTimeout(
+                "No HTTP/2 stream was free within {0} seconds.".format(timeout),
+                "pool",
+                timeout,
+            )
+        return connection
+
+    def _release(self, connection):
+        with self._condition:
+            connection.streams -= 1
+            self._condition.notify()
+
+    def request(
+        self,
+        method,
+        url,
+        headers=None,
+        params=None,
+        data=None,
+        stream=False,
+        timeout=None,
+    ):
+        origin = self.origin(url)
+        if self.http2 and self._needs_probe(origin):
+            # Concurrent first requests wait for one probe.
+            with self._probe_lock:
+                if self._needs_probe(origin):
+                    http2 = probe_h2c(origin, None if timeout is None else timeout[0])
+                    with self._condition:
+                        self._probed(origin, http2)
+        if not self.http2 or origin in self.http1_origins:
+            return self._request_http1(
+                method, url, headers, params, data, stream, timeout
+            )
+
+        # Waiting for a stream counts as connecting, so the capped connect timeout
+        # bounds it by the deadline too.
+        connection = self._acquire(origin, None if timeout is None else timeout[0])
+        try:
+            response, elapsed = send_httpx(
+                connection.client, method, url, headers, params, data, stream, timeout
+            )
+        except BaseException:
+            self._release(connection)
+            raise
+        if response.http_version != "HTTP/2":
+            with self._condition:
+                self._fall_back(origin)
+        if stream:
+            return httpx_to_requests(
+                response, elapsed, stream, lambda: self._release(connection)
+            )
+        self._release(connection)
+        return httpx_to_requests(response, elapsed)
+
+    def _request_http1(self, method, url, headers, params, data, stream, timeout):
+        response, elapsed = send_httpx(
+            self.http1, method, url, headers, params, data, stream, timeout
+        )
+        return httpx_to_requests(response, elapsed, stream)
+
+    def close(self):
+        with self._condition:
+            for connections in self.connections.values():
+                for connection in connections:
+                    connection.client.close()
+            self.connections.clear()
+        self.http1.close()
+
+
+class AsyncHTTP2Transport(HTTP2Pool):
+    """ The asyncio counterpart of <HTTP2Transport>, used by `AsyncPDFGenerator(http2=True)`.
+    `request()` is a coroutine returning an <httpx.Response>.
+    """
+
+    client_class = httpx.AsyncClient if httpx is not None else None
+
+    def __init__(self, *args, **kwargs):
+        super(AsyncHTTP2Transport, self).__init__(*args, **kwargs)
+        self._condition = asyncio.Condition()
+        self._probe_lock = asyncio.Lock()
+
+    async def request(
+        self, method, url, headers=None, params=None, content=None, timeout=None
+    ):
+        origin = self.origin(url)
+        if self.http2 and self._needs_probe(origin):
+            async with self._probe_lock:
+                if self._needs_probe(origin):
+                    self._probed(
+                        origin,
+                        await async_probe_h2c(
+                            origin, None if timeout is None else timeout.connect
+                        ),
+                    )
+        if not self.http2 or origin in self.http1_origins:
+            return await self.http1.request(
+                method,
+                url,
+                headers=headers,
+                params=params,
+                content=content,
+                timeout=timeout,
+            )
+
+        async with self._condition:
+            connection = self._pick(origin)
+            while connection is None:
+                await self._condition.wait()
+                connection = self._pick(origin)
+        try:
+            response = await connection.client.request(
+                method,
+                url,
+                headers=headers,
+                params=params,
+                content=content,
+                timeout=timeout,
+            )
+        finally:
+            async with self._condition:
+                connection.streams -= 1
+                self._condition.notify()
+        if response.http_version != "HTTP/2":
+            self._fall_back(origin)
+        return response
+
+    async def aclose(self):
+        for connections in self.connections.values():
+            for connection in connections:
+                await connection.client.aclose()
+        self.connections.clear()
+        await self.http1.aclose()
+
+
+class FakeRequest(object):
+    """ A request received by a <FakeTransport>. """
+
+    __slots__ = ("method", "url", "path", "params", "headers", "data")
+
+    def __init__(self, method, url, params, headers, data):
+        self.method = method
+        self.url = url
+        self.path = urlsplit(url).path
+        self.params = params or {}
+        self.headers = headers or {}
+        self.data = data
+
+    def json(self):
+        return None if self.data is None else jsonlib.loads(self.data)
+
+
+class FakeRoute(object):
+    __slots__ = ("method", "pattern", "answer", "latency", "times")
+
+    def __init__(self, method, pattern, answer, latency, times):
+        self.method = method
+        self.pattern = re.compile(pattern)
+        self.answer = answer
+        self.latency = latency
+        self.times = times
+
+    def matches(self, request):
+        return (
+            self.times != 0
+            and self.method in (request.method, "*")
+            and self.pattern.search(request.path) is not None
+        )
+
+
+def make_response(request, status, headers, body):
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers or {})
+    response.url = request.url
+    response.reason = responses.get(status, "")
+    response._content = body
+    response._content_consumed = True
+    return response
+
+
+class FakeTransport(Transport):
+    """ An in-memory transport answering from scripted routes. Nothing touches the network,
+    so signing, error mapping and the pipelines around the client can be load-tested at
+    millions of calls.
+
+    Routes are tried in the order they were added; a route added with `times` answers that
+    many requests and then steps aside, which scripts sequences such as two 429s followed by
+    a success. Unmatched requests get a 404.
+
+    :param latency: Seconds every answer is delayed by, or a callable taking the
+                    <FakeRequest> and returning them. Default: 0.
+    :param history: Number of received requests kept in `requests`. Default: 1000.
+
+    Usage::
+
+      >>> transport = FakeTransport(latency=lambda request: random.expovariate(20))
+      >>> transport.add("POST", r"templates/\\d+/output$", json={"response": "JVBERi0=", "meta": {}})
+      >>> transport.add("GET", r"templates/\\d+$", status=429, headers={"Retry-After": "1"}, times=1)
+      >>> pdfg_client = PDFGenerator(api_key="key", api_secret="secret", transport=transport)
+    """
+
+    def __init__(self, latency=0, history: int = 1000):
+        self.latency = latency
+        self.routes = []
+        self.requests = deque(maxlen=history)
+        self.request_count = 0
+        self._waiting = {}
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        method,
+        pattern,
+        status: int = 200,
+        json=None,
+        body: bytes = b"",
+        headers: dict = None,
+        callback=None,
+        latency=None,
+        times: int = None,
+    ):
+        """ Scripts the answer to requests whose URL path matches the `pattern` regular
+        expression.
+
+        :param method: HTTP method, or * for any.
+        :param status: Status code of the answer.
+        :param json: Object sent as the JSON body of the answer.
+        :param body: Raw body of the answer, when `json` is not given.
+        :param headers: Headers of the answer.
+        :param callback: Callable taking the <FakeRequest> and returning a
+                         (status, headers, body) tuple, replaces the arguments above.
+        :param latency: Seconds this route delays its answers by, overrides the transport's.
+        :param times: Number of requests answered before the route is dropped. Default: all.
+        """
+        if callback is None:
+            headers = dict(headers or {})
+            if json is not None:
+                body = jsonlib.dumps(json).encode("utf-8")
+                headers.setdefault("Content-Type", "application/json")
+            answer = (status, headers, body)
+            callback = lambda request: answer  # noqa: E731
+        with self._lock:
+            self.routes.append(FakeRoute(method, pattern, callback, latency, times))
+
+    def _match(self, request):
+        with self._lock:
+            self.request_count += 1
+            self.requests.append(request)
+            for route in self.routes:
+                if route.matches(request):
+                    if route.times is not None:
+                        route.times -= 1
+                    return route
+        return None
+
+    def request(
+        self,
+        method,
+        url,
+        headers=None,
+        params=None,
+        data=None,
+        stream=False,
+        timeout=None,
+    ):
+        start = time.perf_counter()
+        request = FakeRequest(method, url, params, headers, data)
+        route = self._match(request)
+        if route is None:
+            status, response_headers, body = (
+                404,
+                {"Content-Type": "application/json"},
+                b'{"error": "Entity not found", "status": 404}',
+            )
+            latency = self.latency
+        else:
+            status, response_headers, body = route.answer(request)
+            latency = self.latency if route.latency is None else route.latency
+        if callable(latency):
+            latency = latency(request)
+        read_timeout = None if timeout is None else timeout[1]
+        if latency:
+            self._wait(latency if read_timeout is None else min(latency, read_timeout))
+        if latency and read_timeout is not None and latency > read_timeout:
+            raise requests.exceptions.ReadTimeout(
+                "Read timed out. (read timeout={0})".format(read_timeout)
+            )
+        response = make_response(request, status, response_headers, body)
+        response.elapsed = datetime.timedelta(seconds=time.perf_counter() - start)
+        return response
+
+    def _wait(self, seconds):
+        """ Sleeps `seconds`, raising <requests.ConnectionError> when interrupted. """
+        interrupted = threading.Event()
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._waiting[thread_id] = interrupted
+        try:
+            if interrupted.wait(seconds):
+                raise requests.exceptions.ConnectionError("The request was aborted.")
+        finally:
+            with self._lock:
+                self._waiting.pop(thread_id, None)
+
+    def interrupt(self, thread_id):
+        with self._lock:
+            interrupted = self._waiting.get(thread_id)
+        if interrupted is not None:
+            interrupted.set()
+
+    @classmethod
+    def replay(cls, path, latency=0, history: int = 1000):
+        """ Returns a transport answering with the exchanges recorded by a
+        <RecordingTransport> at `path`. Requests with the same method, path and params get
+        the recorded answers in order, the last one is repeated once they run out.
+        """
+        answers = defaultdict(list)
+        with open(path) as f:
+            for line in f:
+                exchange = jsonlib.loads(line)
+                answers[
+                    replay_key(exchange["method"], exchange["path"], exchange["params"])
+                ].append(
+                    (
+                        exchange["status"],
+                        exchange["headers"],
+                        base64.b64decode(exchange["body"]),
+                    )
+                )
+
+        transport = cls(latency=latency, history=history)
+        positions = defaultdict(int)
+        lock = threading.Lock()
+
+        def answer(request):
+            key = replay_key(request.method, request.path, request.params)
+            recorded = answers.get(key)
+            if not recorded:
+                return 404, {}, b'{"error": "Not recorded", "status": 404}'
+            with lock:
+                position = positions[key]
+                positions[key] = position + 1
+            return recorded[min(position, len(recorded) - 1)]
+
+        transport.add("*", "", callback=answer)
+        return transport
+
+
+def replay_key(method, path, params):
+    return method, path, tuple(sorted((params or {}).items()))
+
+
+class RecordingTransport(Transport):
+    """ Sends requests through `transport` and records the exchanges, to be saved with
+    `save()` and replayed offline with `FakeTransport.replay()`. Request headers, which
+    carry the credentials, are not recorded.
+
+    Usage::
+
+      >>> recorder = RecordingTransport(RequestsTransport())
+      >>> PDFGenerator(transport=recorder).create_document(template_id=123, data=data)
+      >>> recorder.save("exchanges.jsonl")
+      >>> PDFGenerator(transport=FakeTransport.replay("exchanges.jsonl")).create_document(...)
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.exchanges = []
+        self._lock = threading.Lock()
+
+    def request(
+        self,
+        method,
+        url,
+        headers=None,
+        params=None,
+        data=None,
+        stream=False,
+        timeout=None,
+    ):
+        # Read in full, the body is both recorded and handed out.
+        response = self.transport.request(
+            method, url, headers=headers, params=params, data=data, timeout=timeout
+        )
+        exchange = {
+            "method": method,
+            "path": urlsplit(url).path,
+            "params": params or {},
+            "status": response.status_code,
+            # The body is stored decoded.
+            "headers": {
+                name: value
+                for name, value in response.headers.items()
+                if name.lower() not in ("content-encoding", "transfer-encoding")
+            },
+            "body": base64.b64encode(response.content).decode("ascii"),
+        }
+        with self._lock:
+            self.exchanges.append(exchange)
+        return response
+
+    def interrupt(self, thread_id):
+        self.transport.interrupt(thread_id)
+
+    def save(self, path):
+        """ Writes the recorded exchanges to `path`, one JSON object per line. """
+        with self._lock, open(path, "w") as f:
+            for exchange in self.exchanges:
+                f.write(jsonlib.dumps(exchange) + "\n")
+
+    def close(self):
+        self.transport.close()
@@ -7,22 +7,31 @@ pdfgeneratorapi.utils
 This module contains the utility functions.
 """
 
+import hashlib
 import json
 
 from .response import PDFGeneratorResponse
+from .serialization import DEFAULT_CODEC
 
 
-def create_py_object(item: dict):
+def canonical_hash(data):
+    """ Returns a stable SHA-256 hex digest of a JSON-like object, independent of key order. """
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def create_py_object(item: dict, codec=DEFAULT_CODEC):
     if not len(item):
         return item
     map_item = PDFGeneratorResponse(item)
 
     map_item.__setattr__("to_dict", item)
-    map_item.__setattr__("to_json", json.dumps(item))
+    # `to_json` is encoded with `codec` on first access.
+    map_item.__setattr__("_codec", codec)
     return map_item
 
 
-def dict_to_object(data: dict):
+def dict_to_object(data: dict, codec=DEFAULT_CODEC):
     response_dict = {}
     for key, value in data.items():
         if not value:
@@ -34,11 +43,11 @@ def dict_to_object(data: dict):
         elif type(value) is list:
             response_list = []
             for element in value:
-                map_item = create_py_object(element)
+                map_item = create_py_object(element, codec)
                 response_list.append(map_item)
             return response_list
     if len(response_dict):
-        response_object = create_py_object(response_dict)
+        response_object = create_py_object(response_dict, codec)
         return response_object
     else:
         return []
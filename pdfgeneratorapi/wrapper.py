@@ -7,17 +7,64 @@ pdfgeneratorapi.wrapper
 This module contains the resource wrapper for PDFGeneratorAPI.com.
 """
 
-import hashlib
-import hmac
+import base64
 import json
 import os
-import sys
+import tempfile
+import threading
 import urllib
+from functools import partial
 
-import requests
-from .constants import ALL_DOCUMENT_FORMATS, ALL_RESPONSE_FORMATS, ALL_ACCESS_TYPES
-from .decorators import make_response
-from .exceptions import IncorrectParameterError, RequiredParameterMissing
+from requests.exceptions import RequestException
+from .archive import DocumentArchive
+from .batch import DocumentBatch
+from .cache import TemplateCache
+from .coalesce import SingleFlight, request_key
+from .compression import (
+    ACCEPT_ENCODING,
+    COMPRESSION_REFUSED_STATUS_CODES,
+    compress,
+    get_encoding,
+)
+from .constants import (
+    ALL_DOCUMENT_FORMATS,
+    ALL_RESPONSE_FORMATS,
+    ALL_ACCESS_TYPES,
+    ARCHIVE_SPOOL_SIZE,
+    CONNECT_TIMEOUT,
+    READ_TIMEOUT,
+    STREAM_CHUNK_SIZE,
+)
+from .deadline import Deadline, iter_content, timeout_error
+from .decorators import check_response, make_response
+from .document_cache import DocumentCache
+from .hedging import HedgePolicy
+from .exceptions import (
+    IncorrectParameterError,
+    InternalServerError,
+    RequiredParameterMissing,
+)
+from .instrumentation import (
+    HOOK_EVENTS,
+    MetricsRegistry,
+    RequestInfo,
+    Timings,
+    body_size,
+)
+from .listing import TemplateListing
+from .pruning import PayloadPruner
+from .ratelimit import RETRY_STATUS_CODES, RateLimiter
+from .serialization import get_codec
+from .signing import Signer, user_agent
+from .streaming import (
+    Base64Writer,
+    JSONStringExtractor,
+    TeeWriter,
+    iter_json_items,
+    open_sink,
+)
+from .transport import HTTP2Transport, RequestsTransport
+from .utils import create_py_object, dict_to_object
 
 
 class APIBase(object):
@@ -36,8 +83,61 @@ class APIBase(object):
                    This wrapper was made considering `us1` subdomain.
     :param version: The version of the PDFGeneratorAPI.com. This wrapper was made in consideration of v3.
     :param api_url: The complete base url of the PDFGeneratorAPI excluding the resource endpoints.
+    :param pool_connections: Number of per-host connection pools to keep. Default: 10.
+    :param pool_maxsize: Maximum number of connections kept open per host. Default: 10.
+    :param pool_block: Block when all `pool_maxsize` connections of a host are busy instead of
+                       opening a throwaway connection. Default: False.
+    :param keep_alive: Reuse connections between requests. Default: True.
+    :param connect_timeout: Seconds to open a connection, None for no limit. Default: 10.
+    :param read_timeout: Seconds to wait for every read of an answer: for the server to
+                         start answering, then between chunks. None for no limit.
+                         Default: 120.
+    :param compress_requests: Encoding of request bodies above `compression_threshold`:
+                              gzip (or True), deflate, br or zstd (when `brotli` or
+                              `zstandard` is installed). Bodies a server refuses compressed
+                              (400/415) are resent as is and compression is turned off.
+                              Default: None (not compressed).
+    :param compression_threshold: Smallest body, in bytes, that is compressed. Default: 16 KiB.
+    :param compression_level: Compression level. Default: 6.
+    :param http2: Multiplex concurrent requests over few HTTP/2 connections per region,
+                  falling back to HTTP/1.1 when the server does not support it. Requires
+                  httpx and h2 (pip install pdfgeneratorapi[http2]). Default: False.
+    :param http2_connections: HTTP/2 connections opened per region. Default: 2.
+    :param max_streams_per_connection: Requests in flight per HTTP/2 connection, further
+                                       requests open a new connection or wait. Default: 100.
+    :param transport: The <transport.Transport> requests are sent through. Default: a
+                      <transport.RequestsTransport> built from the pool parameters above,
+                      or a <transport.HTTP2Transport> with `http2`.
+                      See `transport.HTTPXTransport` and `transport.FakeTransport`.
+    :param codec: JSON codec for request bodies and responses: `auto`, `orjson`, `ujson`,
+                  `json` or a <serialization.JSONCodec> instance. Default: auto (orjson or
+                  ujson when installed, the standard library otherwise).
+    :param hooks: Request hooks, {event: [callables]} with event `pre_request` or
+                  `post_request`. Each hook is called with a <instrumentation.RequestInfo>.
+                  See `register_hook()`.
+    :param metrics: Record request counters and latency histograms. Either a
+                    <instrumentation.MetricsRegistry> or True for one with default settings.
+
+    Every call also takes `timeout`, overriding the client's timeouts with seconds for
+    both or a (connect, read) tuple, and `deadline`, a <deadline.Deadline> or seconds
+    bounding the whole call including its retries. Timeouts raise
+    <exceptions.RequestTimeout>, cancelled deadlines <exceptions.RequestCancelled>::
+
+      >>> pdfg_client.create_document(template_id=123, data={}, timeout=(2, 30), deadline=60)
+
+    When hooks are registered, call results carry a `timings` attribute, an
+    <instrumentation.Timings> breakdown of the call (signing, upload and server time,
+    download, JSON decoding, response construction). Calls are not timed otherwise.
+
+    The client owns a connection pool (its transport) which is shared by every thread using it. Close it with
+    `close()` or use the client as a context manager::
+
+      >>> with PDFGenerator() as pdfg_client:
+      ...     pdfg_client.all_templates()
     """
 
+    rate_limiter = None
+
     def __init__(self, **kwargs):
         self.__api_key = kwargs.get("api_key", os.environ.get("PDF_GENERATOR_KEY"))
         self.__api_secret = kwargs.get(
@@ -61,6 +161,291 @@ class APIBase(object):
         self.API_URL = kwargs.get("api_url", api_url)
 
         self._validate_formats(self.document_format, self.response_format)
+        self.codec = get_codec(kwargs.get("codec", "auto"))
+        self._user_agent = user_agent(self.region, self.version)
+        self._signer = None
+
+        self.pool_connections = kwargs.get("pool_connections", 10)
+        self.pool_maxsize = kwargs.get("pool_maxsize", 10)
+        self.keep_alive = kwargs.get("keep_alive", True)
+        self.connect_timeout = kwargs.get("connect_timeout", CONNECT_TIMEOUT)
+        self.read_timeout = kwargs.get("read_timeout", READ_TIMEOUT)
+        self.request_encoding = get_encoding(kwargs.get("compress_requests"))
+        self.compression_threshold = kwargs.get("compression_threshold", 16 * 1024)
+        self.compression_level = kwargs.get("compression_level", 6)
+
+        self.http2 = kwargs.get("http2", False)
+        self.http2_connections = kwargs.get("http2_connections", 2)
+        self.max_streams_per_connection = kwargs.get("max_streams_per_connection", 100)
+        transport = kwargs.get("transport")
+        if transport is None:
+            transport = self._default_transport(kwargs.get("pool_block", False))
+        self.transport = transport
+
+        self.hooks = {event: [] for event in HOOK_EVENTS}
+        for event, event_hooks in kwargs.get("hooks", {}).items():
+            for hook in [event_hooks] if callable(event_hooks) else event_hooks:
+                self.register_hook(event, hook)
+        metrics = kwargs.get("metrics")
+        if metrics is True:
+            metrics = MetricsRegistry()
+        self.metrics = metrics
+        if metrics is not None:
+            self.register_hook("post_request", metrics)
+
+    def _default_transport(self, pool_block):
+        if self.http2:
+            return HTTP2Transport(
+                max_connections=self.http2_connections,
+                max_streams=self.max_streams_per_connection,
+                pool_maxsize=self.pool_maxsize,
+                keep_alive=self.keep_alive,
+            )
+        return RequestsTransport(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=pool_block,
+            keep_alive=self.keep_alive,
+        )
+
+    def register_hook(self, event, hook):
+        """ Registers `hook` for `event`: `pre_request` hooks run before a request is
+        signed, `post_request` hooks once its response arrived or it failed.
+        """
+        if event not in self.hooks:
+            raise IncorrectParameterError(
+                "{0} is not a hook event. Available: {1}".format(
+                    event, ", ".join(HOOK_EVENTS)
+                )
+            )
+        self.hooks[event].append(hook)
+
+    def deregister_hook(self, event, hook):
+        """ Removes `hook` from `event`. Returns True if it was registered. """
+        try:
+            self.hooks[event].remove(hook)
+            return True
+        except ValueError:
+            return False
+
+    def _dispatch_hooks(self, event, info):
+        for hook in self.hooks[event]:
+            hook(info)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """ Closes all pooled connections. """
+        self.transport.close()
+
+    @property
+    def session(self):
+        """ Returns the calling thread's <requests.Session> of the default transport. """
+        return self.transport.session
+
+    def request_timeout(self, timeout=None, deadline=None):
+        """ Returns the (connect, read) timeouts of a request: `timeout` (seconds for both,
+        or a tuple) or the client's, capped to the time left before `deadline`.
+        """
+        if timeout is None:
+            connect, read = self.connect_timeout, self.read_timeout
+        elif isinstance(timeout, tuple):
+            connect, read = timeout
+        else:
+            connect = read = timeout
+        if deadline is not None:
+            connect, read = deadline.cap(connect), deadline.cap(read)
+        return connect, read
+
+    def _request(
+        self,
+        method,
+        resource,
+        params=None,
+        json=None,
+        headers=None,
+        stream=False,
+        timeout=None,
+        deadline=None,
+    ):
+        """ Sends a signed request for `resource` through the transport.
+        :param method: HTTP method.
+        :param resource: Resource endpoint that needs to be hit. ..API_URL../<RESOURCE>
+        :param json: Request body, encoded once with the client's codec.
+        :param headers: Extra request headers.
+        :param stream: Leave the body unread, to be consumed with `iter_content()`.
+        :param timeout: Seconds, or (connect, read) seconds, overriding the client's.
+        :param deadline: <deadline.Deadline> of the call.
+        Returns a <requests.Response>.
+        """
+        hooks = self.hooks
+        if hooks["pre_request"] or hooks["post_request"]:
+            return self._instrumented_request(
+                method, resource, params, json, headers, stream, timeout, deadline
+            )
+        request_headers = self.prepare_headers(resource)
+        if headers:
+            request_headers.update(headers)
+        request_kwargs = dict(
+            url="{api_url}{resource}".format(api_url=self.API_URL, resource=resource),
+            headers=request_headers,
+            params=params,
+            data=None if json is None else self.codec.dumps(json),
+            stream=stream,
+        )
+        return self._send_body(
+            method, request_kwargs, timeout=timeout, deadline=deadline
+        )
+
+    def _instrumented_request(
+        self, method, resource, params, json, headers, stream, timeout, deadline
+    ):
+        """ `_request` timing every phase and running the hooks. The returned response
+        carries the <instrumentation.Timings> as `timings`.
+        """
+        info = RequestInfo(method, resource, params)
+        self._dispatch_hooks("pre_request", info)
+        info.timings = timings = Timings()
+        request_headers = self.prepare_headers(resource)
+        if headers:
+            request_headers.update(headers)
+        timings.mark("sign")
+        request_kwargs = dict(
+            url="{api_url}{resource}".format(api_url=self.API_URL, resource=resource),
+            headers=request_headers,
+            params=params,
+            data=None if json is None else self.codec.dumps(json),
+            stream=stream,
+        )
+        timings.mark("encode")
+        try:
+            response = self._send_body(
+                method, request_kwargs, timings, info, timeout, deadline
+            )
+        except Exception as exc:
+            timings.mark("wait")
+            info.exception = exc
+            self._dispatch_hooks("post_request", info)
+            raise
+        # requests stops `elapsed` once the headers are parsed, the rest is the body.
+        sent = timings.mark("download")
+        wait = min(sent, response.elapsed.total_seconds())
+        timings.add("wait", wait)
+        timings.add("download", -wait)
+        info.status_code = response.status_code
+        info.response = response
+        info.bytes_received = body_size(response)
+        response.timings = timings
+        self._dispatch_hooks("post_request", info)
+        return response
+
+    def _send_body(
+        self,
+        method,
+        request_kwargs,
+        timings=None,
+        info=None,
+        timeout=None,
+        deadline=None,
+    ):
+        """ `_send`, compressing the body when enabled and above the threshold. A compressed
+        request refused with 400/415 is resent as is, and compression is turned off for
+        the client when that one is accepted.
+        """
+        data = request_kwargs["data"]
+        body, encoding = self._compress_body(data)
+        if info is not None:
+            info.bytes_sent = 0 if body is None else len(body)
+        if encoding is None:
+            return self._send(method, request_kwargs, timings, timeout, deadline)
+
+        compressed_kwargs = dict(
+            request_kwargs,
+            data=body,
+            headers=dict(request_kwargs["headers"], **{"Content-Encoding": encoding}),
+        )
+        if timings is not None:
+            timings.mark("compress")
+        response = self._send(method, compressed_kwargs, timings, timeout, deadline)
+        if response.status_code not in COMPRESSION_REFUSED_STATUS_CODES:
+            return response
+        response.close()
+        response = self._send(method, request_kwargs, timings, timeout, deadline)
+        if response.status_code not in COMPRESSION_REFUSED_STATUS_CODES:
+            self.request_encoding = None
+        if info is not None:
+            info.bytes_sent += len(data)
+        return response
+
+    def _compress_body(self, data):
+        """ Returns the body to send and its encoding, None when left uncompressed. """
+        encoding = self.request_encoding
+        if encoding is None or data is None or len(data) < self.compression_threshold:
+            return data, None
+        return compress(data, encoding, self.compression_level), encoding
+
+    def _send(self, method, request_kwargs, timings=None, timeout=None, deadline=None):
+        """ Sends a prepared request through the rate limiter, if any. """
+        rate_limiter = self.rate_limiter
+        if rate_limiter is None:
+            return self._transport_request(method, request_kwargs, timeout, deadline)
+
+        retries = 0
+        while True:
+            if deadline is not None:
+                deadline.check()
+            rate_limiter.acquire(deadline)
+            if timings is not None:
+                timings.mark("queue")
+            try:
+                response = self._transport_request(
+                    method, request_kwargs, timeout, deadline
+                )
+            except BaseException:
+                # Cancellations and interrupts too, or the slot would stay taken.
+                rate_limiter.release()
+                raise
+            rate_limiter.release(response.status_code, response.headers)
+            if (
+                response.status_code not in RETRY_STATUS_CODES
+                or retries >= rate_limiter.max_retries
+            ):
+                return response
+            response.close()
+            retries += 1
+            if timings is not None:
+                timings.mark("wait")
+
+    def _transport_request(self, method, request_kwargs, timeout=None, deadline=None):
+        """ Sends a prepared request through the transport within `timeout` and before
+        `deadline`. Timeouts raise <RequestTimeout>.
+        """
+        interrupt = None
+        if deadline is not None:
+            deadline.check()
+            # A cancellation aborts the request at once when the transport can do it.
+            if hasattr(self.transport, "interrupt"):
+                interrupt = partial(self.transport.interrupt, threading.get_ident())
+                deadline.add_callback(interrupt)
+        request_timeout = self.request_timeout(timeout, deadline)
+        try:
+            return self.transport.request(
+                method, timeout=request_timeout, **request_kwargs
+            )
+        except RequestException as exc:
+            if deadline is not None and deadline.cancelled:
+                deadline.check()
+            error = timeout_error(exc, request_timeout, deadline)
+            if error is None:
+                raise
+            raise error
+        finally:
+            if interrupt is not None:
+                deadline.remove_callback(interrupt)
 
     def _validate_formats(self, document_format, response_format):
         if response_format not in ALL_RESPONSE_FORMATS:
@@ -72,15 +457,57 @@ class APIBase(object):
                 "{0} is an invalid document format.".format(self.document_format)
             )
 
+    def _templates_params(self, access=None, tags=None):
+        """ Validates the `templates` listing filters and returns them as query params. """
+        request_params = {}
+        if access:
+            if set(access) <= set(ALL_ACCESS_TYPES):
+                request_params.update({"access": ",".join(access)})
+            else:
+                raise IncorrectParameterError(
+                    "{0} is not a valid access type".format(access)
+                )
+        if tags:
+            if type(tags) is list:
+                request_params.update({"tags": ",".join(tags)})
+            else:
+                raise IncorrectParameterError("Tags must be a list.")
+        return request_params
+
+    def _document_params(self, document_format=None, response_format=None):
+        """ Applies the client defaults, validates the formats and returns them as query params. """
+        document_format = (
+            self.document_format if document_format is None else document_format
+        )
+        response_format = (
+            self.response_format if response_format is None else response_format
+        )
+        self._validate_formats(document_format, response_format)
+        return {"format": document_format, "output": response_format}
+
+    @property
+    def signer(self):
+        """ The <signing.Signer> of the current workspace, rebuilt when the workspace changes. """
+        signer = self._signer
+        if signer is None or signer.workspace != self.workspace:
+            signer = self._signer = Signer(
+                self.__api_key,
+                self.__api_secret,
+                self.workspace,
+                headers={
+                    "X-Auth-Key": self.__api_key,
+                    "X-Auth-Workspace": self.workspace,
+                    "Content-Type": "application/json; charset=utf-8",
+                    "Accept": "application/json",
+                    "Accept-Encoding": ACCEPT_ENCODING,
+                    "User-Agent": self._user_agent,
+                },
+            )
+        return signer
+
     def _get_signature(self, resource):
         """ Generates a signature based on `api_key`, `workspace` and `api_secret`. """
-        message = "{api_key}{resource}{workspace}".format(
-            api_key=self.__api_key, resource=resource, workspace=self.workspace
-        )
-        signature = hmac.new(
-            bytes(self.__api_secret, "UTF-8"), bytes(message, "UTF-8"), hashlib.sha256
-        ).hexdigest()
-        return signature
+        return self.signer.signature(resource)
 
     def set_workspace(self, workspace):
         self.workspace = workspace
@@ -104,30 +531,16 @@ class APIBase(object):
         :param resource: Resource endpoint that needs to be hit. ..API_URL../<RESOURCE>
         Returns a <dict>.
         """
-        import pdfgeneratorapi
-
-        user_agent = "pdfgeneratorapi/{api_region}/{api_version} Python/{package_version}/{sys_version}".format(
-            package_version=pdfgeneratorapi.__version__,
-            sys_version=sys.version.split(" ", 1)[0],
-            api_region=self.region,
-            api_version=self.version,
-        )
+        signer = self.signer
+        request_headers = dict(signer.headers)
         if self.signature_auth is True:
             if not resource:
                 raise RequiredParameterMissing(
                     "Signature Auth requires resource for signature creation."
                 )
-            header_auth = {"X-Auth-Signature": self._get_signature(resource)}
+            request_headers["X-Auth-Signature"] = signer.signature(resource)
         else:
-            header_auth = {"X-Auth-Secret": self.__api_secret}
-        request_headers = {
-            "X-Auth-Key": self.__api_key,
-            "X-Auth-Workspace": self.workspace,
-            "Content-Type": "application/json; charset=utf-8",
-            "Accept": "application/json",
-            "User-Agent": user_agent,
-        }
-        request_headers.update(header_auth)
+            request_headers["X-Auth-Secret"] = self.__api_secret
         return request_headers
 
 
@@ -135,28 +548,137 @@ class PDFGenerator(APIBase):
     """ The actual resource class which communicates with the API.
     Functions under this class:
         all_templates()
+        iter_templates()
+        template_listing()
         get_template()
         create_template()
         create_template_copy()
         delete_template()
         create_document()
+        create_documents()
+        create_document_to()
+        create_document_archive()
         get_editor_url()
+        get_editor_urls()
 
     Usage::
 
       >>> from pdfgeneratorapi import PDFGenerator
       >>> pdfg_client = PDFGenerator()
       >>> pdf_client.set_workspace('some@workspace.com')
+
+    :param template_cache: Cache `get_template` and `all_templates` responses. Either a
+                           <cache.TemplateCache> or True for one with default settings.
+                           Default: None (no caching).
+    :param rate_limiter: Adapt the request rate and concurrency to the server's answers.
+                         Either a <ratelimit.RateLimiter> or True for one with default
+                         settings. Default: None (no limiting).
+    :param coalesce: Share one in-flight request between concurrent identical
+                     `get_template`, `all_templates` and `create_document` calls.
+                     Default: False.
+    :param document_cache: Store generated base64 and inline (I) documents on disk. Either
+                           a <document_cache.DocumentCache> or the path of its directory.
+                           Default: None (no caching).
+    :param prune_payloads: Send only the `create_document` data fields the template
+                           references. Either a <pruning.PayloadPruner> or True for one
+                           with default settings. Default: None (data sent as is).
+    :param hedge: Send a second `create_document` request when the first one is slow and
+                  keep the first answer. Either a <hedging.HedgePolicy> or True for one
+                  with default settings. Default: None (no hedging).
     """
 
+    def __init__(self, **kwargs):
+        super(PDFGenerator, self).__init__(**kwargs)
+        template_cache = kwargs.get("template_cache")
+        if template_cache is True:
+            template_cache = TemplateCache()
+        self.template_cache = template_cache
+        rate_limiter = kwargs.get("rate_limiter")
+        if rate_limiter is True:
+            rate_limiter = RateLimiter()
+        self.rate_limiter = rate_limiter
+        self.coalescer = SingleFlight() if kwargs.get("coalesce") else None
+        document_cache = kwargs.get("document_cache")
+        if isinstance(document_cache, (str, os.PathLike)):
+            document_cache = DocumentCache(document_cache)
+        self.document_cache = document_cache
+        payload_pruner = kwargs.get("prune_payloads")
+        if payload_pruner is True:
+            payload_pruner = PayloadPruner()
+        self.payload_pruner = payload_pruner or None
+        hedge = kwargs.get("hedge")
+        # A policy built here is closed with the client, a given one by its owner.
+        self._owns_hedge = hedge is True
+        if hedge is True:
+            hedge = HedgePolicy()
+        self.hedge = hedge or None
+
+    def close(self):
+        """ Closes all pooled connections, and the hedging threads of `hedge=True`. """
+        super(PDFGenerator, self).close()
+        if self._owns_hedge:
+            self.hedge.close()
+
+    def _coalesced_request(
+        self,
+        method,
+        resource,
+        params=None,
+        json=None,
+        headers=None,
+        timeout=None,
+        deadline=None,
+        send=None,
+    ):
+        """ `_request`, shared with concurrent identical calls when coalescing is enabled.
+        Calls joining one in flight wait for it until their own `deadline`. `send`, called
+        with `deadline`, replaces `_request` when given.
+        """
+        if send is None:
+            send = lambda deadline: self._request(  # noqa: E731
+                method, resource, params, json, headers, False, timeout, deadline
+            )
+        if self.coalescer is None:
+            return send(deadline)
+        key = request_key(self.workspace, method, resource, params, json)
+        return self.coalescer.do(key, lambda: send(deadline), deadline)
+
+    def _read_template(self, resource, params=None, timeout=None, deadline=None):
+        """ GETs a template resource through the template cache, when enabled. """
+        if self.template_cache is None:
+            return self._coalesced_request(
+                "GET", resource, params, timeout=timeout, deadline=deadline
+            )
+        key = (self.workspace, resource, tuple(sorted((params or {}).items())))
+        entry = self.template_cache.get(key)
+        if entry is not None and entry.fresh:
+            return entry.response
+        headers = entry.conditional_headers() if entry is not None else None
+        response = self._coalesced_request(
+            "GET", resource, params, None, headers, timeout, deadline
+        )
+        if response.status_code == 304 and entry is not None:
+            return self.template_cache.revalidated(key, entry).response
+        if response.ok:
+            self.template_cache.set(key, response)
+        return response
+
+    def _invalidate_templates(self, *resources):
+        if self.template_cache is not None:
+            self.template_cache.invalidate("templates", *resources)
+
     @make_response
-    def all_templates(self, access: list = None, tags: list = None):
+    def all_templates(
+        self, access: list = None, tags: list = None, timeout=None, deadline=None
+    ):
         """ Returns list of templates in the workspace.
         
         :param access: Allows to filter templates by access type.
                        Comma separated list of access types. [`organization`, `private`]
         :param tags: Allows to filter templates by assigned tags.
                      Comma separated list of tags assigned to template.
+        :param timeout: Seconds, or (connect, read) seconds, overriding the client's timeouts.
+        :param deadline: A <deadline.Deadline>, or seconds, bounding the whole call.
 
         Usage::
 
@@ -164,31 +686,115 @@ class PDFGenerator(APIBase):
            [List of <PDFGeneratorResponse>]
         """
         resource = "templates"
-        request_params = {}
-        if access:
-            if set(access) <= set(ALL_ACCESS_TYPES):
-                request_params.update({"access": ",".join(access)})
-            else:
-                raise IncorrectParameterError(
-                    "{0} is not a valid access type".format(access)
-                )
-        if tags:
-            if type(tags) is list:
-                request_params.update({"tags": ",".join(tags)})
-            else:
-                raise IncorrectParameterError("Tags must be a list.")
-        response = requests.get(
-            url="{api_url}{resource}".format(api_url=self.API_URL, resource=resource),
-            headers=self.prepare_headers(resource),
-            params=request_params,
+        request_params = self._templates_params(access, tags)
+        response = self._read_template(
+            resource, request_params, timeout, Deadline.coerce(deadline)
         )
         return response
 
+    def template_listing(
+        self, access: list = None, tags: list = None, timeout=None, deadline=None
+    ):
+        """ Returns the templates in the workspace as a <listing.TemplateListing>: stored
+        column-wise in a fraction of the memory of `all_templates`, filtered by tag, access
+        and date without building one object per template.
+
+        :param access: Allows to filter templates by access type. See `all_templates`.
+        :param tags: Allows to filter templates by assigned tags. See `all_templates`.
+        :param timeout: Seconds, or (connect, read) seconds, overriding the client's timeouts.
+        :param deadline: A <deadline.Deadline>, or seconds, bounding the whole call.
+
+        Usage::
+
+          >>> templates = pdfg_client.template_listing()
+          >>> templates.filter(tags=['invoice'], modified_after='2020-01-01').ids
+           [24382, ...]
+        """
+        resource = "templates"
+        request_params = self._templates_params(access, tags)
+        response = self._read_template(
+            resource, request_params, timeout, Deadline.coerce(deadline)
+        )
+        check_response(response)
+        items = self.codec.loads(response.content).get("response") or []
+        return TemplateListing.from_items(items, self.codec)
+
+    def iter_templates(
+        self,
+        access: list = None,
+        tags: list = None,
+        page_size: int = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        timeout=None,
+        deadline=None,
+    ):
+        """ Yields the templates in the workspace as they are decoded from the streamed
+        listing, so memory stays bounded however many templates there are. The template cache
+        and request coalescing do not apply.
+
+        :param access: Allows to filter templates by access type. See `all_templates`.
+        :param tags: Allows to filter templates by assigned tags. See `all_templates`.
+        :param page_size: Fetch the listing in pages of `page_size` templates (`page` and
+                          `per_page` parameters), for API versions paginating it. The
+                          iteration stops at a page without new templates, so servers
+                          ignoring the parameters are read once. Default: None, a single
+                          request.
+        :param chunk_size: Bytes read from the network at once. Default: 64 KiB.
+        :param timeout: Seconds, or (connect, read) seconds, overriding the client's timeouts.
+        :param deadline: A <deadline.Deadline>, or seconds, bounding the whole iteration.
+
+        Usage::
+
+          >>> for template in pdfg_client.iter_templates(tags=['invoice']):
+          ...     print(template.id, template.name)
+        """
+        resource = "templates"
+        request_params = self._templates_params(access, tags)
+        deadline = Deadline.coerce(deadline)
+        page = 1
+        previous_ids = set()
+        while True:
+            if page_size:
+                request_params.update({"page": page, "per_page": page_size})
+            count = new = 0
+            page_ids = set()
+            with self._request(
+                "GET",
+                resource,
+                params=request_params,
+                stream=True,
+                timeout=timeout,
+                deadline=deadline,
+            ) as response:
+                check_response(response)
+                chunks = iter_content(
+                    response,
+                    chunk_size,
+                    self.request_timeout(timeout, deadline),
+                    deadline,
+                )
+                for item in iter_json_items(chunks, "response"):
+                    count += 1
+                    template_id = item.get("id") if isinstance(item, dict) else None
+                    if template_id is not None:
+                        if template_id in previous_ids:
+                            # Servers ignoring `page` answer the same page again.
+                            continue
+                        page_ids.add(template_id)
+                    new += 1
+                    yield create_py_object(item, self.codec)
+            if not page_size or count < page_size or not new:
+                return
+            previous_ids = page_ids
+            page += 1
+
     @make_response
-    def get_template(self, template_id: int):
+    def get_template(self, template_id: int, timeout=None, deadline=None):
         """ Returns template configuration.
 
         :param template_id: Unique ID of the template.
+        :param timeout: Seconds, or (connect, read) seconds, overriding the client's timeouts.
+        :param deadline: A <deadline.Deadline>, or seconds, bounding the whole call.
 
         Usage::
 
@@ -196,19 +802,20 @@ class PDFGenerator(APIBase):
            <PDFGeneratorResponse>
         """
         resource = "templates/{template_id}".format(template_id=str(template_id))
-        response = requests.get(
-            url="{base_url}{resource}".format(base_url=self.API_URL, resource=resource),
-            headers=self.prepare_headers(resource),
+        response = self._read_template(
+            resource, timeout=timeout, deadline=Deadline.coerce(deadline)
         )
         # TODO: Great to have: ...get_template(template_id=123).delete()
         # TODO: Great to have: ...get_template(template_id=123).copy(name='first_copy')
         return response
 
     @make_response
-    def create_template(self, name):
+    def create_template(self, name, timeout=None, deadline=None):
         """ Creates a blank template with given name. 
         
         :param name: Name of the newly created template.
+        :param timeout: Seconds, or (connect, read) seconds, overriding the client's timeouts.
+        :param deadline: A <deadline.Deadline>, or seconds, bounding the whole call.
 
         Usage::
 
@@ -216,19 +823,26 @@ class PDFGenerator(APIBase):
            <PDFGeneratorResponse>
         """
         resource = "templates"
-        response = requests.post(
-            url="{base_url}{resource}".format(base_url=self.API_URL, resource=resource),
-            headers=self.prepare_headers(resource),
+        response = self._request(
+            "POST",
+            resource,
             json={"name": name},
+            timeout=timeout,
+            deadline=Deadline.coerce(deadline),
         )
+        self._invalidate_templates()
         return response
 
     @make_response
-    def create_template_copy(self, template_id: int, name: str = ""):
+    def create_template_copy(
+        self, template_id: int, name: str = "", timeout=None, deadline=None
+    ):
         """ Creates a copy of a template to the workspace.
 
         :param template_id: Unique ID of the template.
         :param name: Name of the newly created template.
+        :param timeout: Seconds, or (connect, read) seconds, overriding the client's timeouts.
+        :param deadline: A <deadline.Deadline>, or seconds, bounding the whole call.
 
         Usage::
 
@@ -237,18 +851,23 @@ class PDFGenerator(APIBase):
         """
         resource = "templates/{template_id}/copy".format(template_id=str(template_id))
         request_params = {"name": name}
-        response = requests.post(
-            url="{base_url}{resource}".format(base_url=self.API_URL, resource=resource),
-            headers=self.prepare_headers(resource),
+        response = self._request(
+            "POST",
+            resource,
             params=request_params,
+            timeout=timeout,
+            deadline=Deadline.coerce(deadline),
         )
+        self._invalidate_templates()
         return response
 
     @make_response
-    def delete_template(self, template_id: int):
+    def delete_template(self, template_id: int, timeout=None, deadline=None):
         """ Deletes a Template.
 
         :param template_id: Unique ID of the template.
+        :param timeout: Seconds, or (connect, read) seconds, overriding the client's timeouts.
+        :param deadline: A <deadline.Deadline>, or seconds, bounding the whole call.
 
         Usage::
 
@@ -256,19 +875,24 @@ class PDFGenerator(APIBase):
            <bool>
         """
         resource = "templates/{template_id}".format(template_id=str(template_id))
-        response = requests.delete(
-            url="{base_url}{resource}".format(base_url=self.API_URL, resource=resource),
-            headers=self.prepare_headers(resource),
+        response = self._request(
+            "DELETE", resource, timeout=timeout, deadline=Deadline.coerce(deadline)
         )
+        self._invalidate_templates(resource)
+        if self.document_cache is not None:
+            self.document_cache.invalidate(template_id)
+        if self.payload_pruner is not None:
+            self.payload_pruner.invalidate((self.workspace, str(template_id)))
         return response
 
-    @make_response
     def create_document(
         self,
         template_id: int,
         data: dict,
         document_format: str = None,
         response_format: str = None,
+        timeout=None,
+        deadline=None,
     ):
         """ Merges template with data and returns base64 encoded document or public url to a document.
             In simple words, Create/Generate a Document.
@@ -277,29 +901,331 @@ class PDFGenerator(APIBase):
         :param data: A dict of data that is needed to fill the PDF.
         :param document_format: Document format. Available formats: (pdf, html, zip) Default: pdf.
         :param response_format: Response format. Available formats: (base64, url, I). Default: base64.
+        :param timeout: Seconds, or (connect, read) seconds, overriding the client's timeouts.
+        :param deadline: A <deadline.Deadline>, or seconds, bounding the whole call.
 
         Usage::
 
           >>> pdfg_client.create_document(template_id=123, data={'name': 'Sameer Kumar'})
            <PDFGeneratorResponse>
         """
-        document_format = (
-            self.document_format if document_format is None else document_format
+        request_params = self._document_params(document_format, response_format)
+        deadline = Deadline.coerce(deadline)
+        data = self._prune_data(template_id, data, deadline)
+        if self.document_cache is None or request_params["output"] != "base64":
+            return self._create_document(
+                template_id, data, request_params, timeout, deadline
+            )
+
+        cache_key = self._document_cache_key(
+            template_id, data, request_params, deadline
         )
-        response_format = (
-            self.response_format if response_format is None else response_format
+        cached = self.document_cache.get(template_id, cache_key)
+        if cached is not None:
+            with cached:
+                document = base64.b64encode(cached.data).decode("ascii")
+            # The stored meta is the rest of the answer, decoded like a fresh one.
+            answer = {"response": document}
+            answer.update(cached.meta)
+            return dict_to_object(answer, self.codec)
+
+        document = self._create_document(
+            template_id, data, request_params, timeout, deadline
         )
-        self._validate_formats(document_format, response_format)
+        meta = {
+            key: value for key, value in document.to_dict.items() if key != "response"
+        }
+        pending = self.document_cache.put(template_id, cache_key)
+        try:
+            pending.write(base64.b64decode(document.to_dict["response"]))
+        except BaseException:
+            pending.discard()
+            raise
+        pending.commit({"meta": meta})
+        return document
+
+    @make_response
+    def _create_document(
+        self, template_id, data, request_params, timeout=None, deadline=None
+    ):
         resource = "templates/{template_id}/output".format(template_id=str(template_id))
-        request_params = {"format": document_format, "output": response_format}
-        response = requests.post(
-            url="{base_url}{resource}".format(base_url=self.API_URL, resource=resource),
-            headers=self.prepare_headers(resource),
-            params=request_params,
-            json=data,
+        send = None
+        if self.hedge is not None:
+            send = partial(
+                self.hedge.run,
+                lambda attempt: self._hedged_attempt(
+                    resource, request_params, data, timeout, attempt
+                ),
+            )
+        response = self._coalesced_request(
+            "POST", resource, request_params, data, None, timeout, deadline, send
         )
         return response
 
+    def _hedged_attempt(self, resource, params, data, timeout, deadline):
+        """ Sends one request of a hedged call. Server errors raise, so that the other
+        request of the call may still answer.
+        """
+        response = self._request(
+            "POST", resource, params, data, None, False, timeout, deadline
+        )
+        if response.status_code >= 500:
+            response.close()
+            raise InternalServerError(
+                "{0} answer to a hedged request.".format(response.status_code), response
+            )
+        return response
+
+    def _prune_data(self, template_id, data, deadline=None):
+        """ Returns `data` without the fields the template does not use, when enabled. """
+        if self.payload_pruner is None:
+            return data
+        return self.payload_pruner.prune(
+            (self.workspace, str(template_id)),
+            data,
+            lambda: self.get_template(template_id, deadline=deadline).to_dict,
+            self.codec,
+        )
+
+    def _document_cache_key(self, template_id, data, request_params, deadline=None):
+        """ Returns the document cache key. The template version is its modification date
+        when the template cache is enabled, otherwise documents of a template live until
+        `delete_template` or `document_cache.invalidate()` drops them.
+        """
+        template_version = ""
+        if self.template_cache is not None:
+            template = self.get_template(template_id, deadline=deadline).to_dict
+            template_version = template.get("modified") or template.get("updated_at")
+        return self.document_cache.key(
+            template_id,
+            template_version,
+            data,
+            request_params["format"],
+            request_params["output"],
+        )
+
+    def create_documents(
+        self,
+        jobs,
+        max_workers: int = None,
+        ordered: bool = True,
+        progress=None,
+        timeout=None,
+        deadline=None,
+    ):
+        """ Creates many documents in parallel over the shared connection pool.
+        A failing job does not abort the batch, its result carries the exception instead.
+
+        :param jobs: Iterable of jobs. Either dicts of `create_document` arguments or
+                     (template_id, data[, document_format[, response_format]]) tuples.
+        :param max_workers: Number of worker threads. Default: `pool_maxsize`.
+        :param ordered: Yield results in input order (True) or as they complete (False).
+        :param progress: Optional callable, called as `progress(result, batch)` after every job.
+        :param timeout: Seconds, or (connect, read) seconds, overriding the client's timeouts.
+        :param deadline: A <deadline.Deadline>, or seconds, bounding the whole batch. Once
+                         it expires or is cancelled no further job starts and the jobs in
+                         flight fail.
+
+        Usage::
+
+          >>> batch = pdfg_client.create_documents([(123, {'name': 'Sameer'}), (123, {'name': 'Kumar'})])
+          >>> [result.response for result in batch]
+           [<PDFGeneratorResponse>, <PDFGeneratorResponse>]
+          >>> batch.throughput
+           <float> documents per second
+        """
+        return DocumentBatch(
+            self,
+            jobs,
+            max_workers=max_workers or self.pool_maxsize,
+            ordered=ordered,
+            progress=progress,
+            timeout=timeout,
+            deadline=Deadline.coerce(deadline),
+        )
+
+    def create_document_to(
+        self,
+        sink,
+        template_id: int,
+        data: dict,
+        document_format: str = None,
+        response_format: str = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        timeout=None,
+        deadline=None,
+    ):
+        """ Creates a document and streams its bytes into `sink`, chunk by chunk.
+        Memory use does not depend on the document size: a base64 response is decoded while
+        it is read, a url response is downloaded and an inline (I) response is copied as is.
+
+        :param sink: A file path or a binary file object to write the document to.
+        :param template_id: Unique ID of the template.
+        :param data: A dict of data that is needed to fill the PDF.
+        :param document_format: Document format. Available formats: (pdf, html, zip) Default: pdf.
+        :param response_format: Response format. Available formats: (base64, url, I). Default: base64.
+        :param chunk_size: Bytes read per chunk.
+        :param timeout: Seconds, or (connect, read) seconds, overriding the client's timeouts.
+        :param deadline: A <deadline.Deadline>, or seconds, bounding the whole call.
+
+        Usage::
+
+          >>> pdfg_client.create_document_to('invoice.pdf', template_id=123, data={'name': 'Sameer Kumar'})
+           <int> bytes written
+        """
+        request_params = self._document_params(document_format, response_format)
+        deadline = Deadline.coerce(deadline)
+        data = self._prune_data(template_id, data, deadline)
+        pending = None
+        if self.document_cache is not None and request_params["output"] != "url":
+            cache_key = self._document_cache_key(
+                template_id, data, request_params, deadline
+            )
+            cached = self.document_cache.get(template_id, cache_key)
+            if cached is not None:
+                with cached, open_sink(sink) as fileobj:
+                    fileobj.write(cached.data)
+                return len(cached)
+            pending = self.document_cache.put(template_id, cache_key)
+        try:
+            bytes_written, meta = self._stream_document_to(
+                sink,
+                template_id,
+                data,
+                request_params,
+                chunk_size,
+                pending,
+                timeout,
+                deadline,
+            )
+        except BaseException:
+            if pending is not None:
+                pending.discard()
+            raise
+        if pending is not None:
+            pending.commit(meta)
+        return bytes_written
+
+    def _stream_document_to(
+        self,
+        sink,
+        template_id,
+        data,
+        request_params,
+        chunk_size,
+        pending=None,
+        timeout=None,
+        deadline=None,
+    ):
+        """ Streams a new document into `sink`, and into `pending` when given.
+        Returns a (bytes written, document meta) tuple.
+        """
+        resource = "templates/{template_id}/output".format(template_id=str(template_id))
+        with self._request(
+            "POST",
+            resource,
+            params=request_params,
+            json=data,
+            stream=True,
+            timeout=timeout,
+            deadline=deadline,
+        ) as response:
+            check_response(response)
+            chunks = iter_content(
+                response, chunk_size, self.request_timeout(timeout, deadline), deadline
+            )
+            if request_params["output"] == "url":
+                url = self.codec.loads(b"".join(chunks))["response"]
+                return (
+                    self._download_to(sink, url, chunk_size, timeout, deadline),
+                    None,
+                )
+            with open_sink(sink) as fileobj:
+                if pending is not None:
+                    fileobj = TeeWriter(fileobj, pending)
+                if request_params["output"] == "I":
+                    meta = {"content-type": response.headers.get("Content-Type")}
+                    return self._copy_to(fileobj, chunks), meta
+                writer = Base64Writer(fileobj)
+                extractor = JSONStringExtractor("response", writer)
+                for chunk in chunks:
+                    extractor.feed(chunk)
+                meta = extractor.close()
+                meta.pop("response", None)
+                return writer.bytes_written, meta
+
+    def _download_to(self, sink, url, chunk_size, timeout=None, deadline=None):
+        """ Streams the public document `url` into `sink`. Returns the number of bytes written. """
+        with self._transport_request(
+            "GET", {"url": url, "stream": True}, timeout, deadline
+        ) as response:
+            check_response(response)
+            with open_sink(sink) as fileobj:
+                return self._copy_to(
+                    fileobj,
+                    iter_content(
+                        response,
+                        chunk_size,
+                        self.request_timeout(timeout, deadline),
+                        deadline,
+                    ),
+                )
+
+    @staticmethod
+    def _copy_to(fileobj, chunks):
+        bytes_written = 0
+        for chunk in chunks:
+            fileobj.write(chunk)
+            bytes_written += len(chunk)
+        return bytes_written
+
+    def create_document_archive(
+        self,
+        template_id: int,
+        data: dict,
+        response_format: str = None,
+        spool_size: int = ARCHIVE_SPOOL_SIZE,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        timeout=None,
+        deadline=None,
+    ):
+        """ Creates a zip document and returns it as a <archive.DocumentArchive>, whose
+        members are read lazily. The archive is decoded while it is downloaded into a
+        temporary file kept in memory up to `spool_size` bytes, so memory use does not
+        depend on the archive size. Close the archive to delete the file.
+
+        :param template_id: Unique ID of the template.
+        :param data: A dict of data that is needed to fill the documents.
+        :param response_format: Response format. Available formats: (base64, url, I). Default: base64.
+        :param spool_size: Bytes of the archive kept in memory before it moves to disk.
+        :param chunk_size: Bytes read per chunk.
+        :param timeout: Seconds, or (connect, read) seconds, overriding the client's timeouts.
+        :param deadline: A <deadline.Deadline>, or seconds, bounding the whole call.
+
+        Usage::
+
+          >>> with pdfg_client.create_document_archive(template_id=123, data=statements) as archive:
+          ...     archive.extract_all('statements/', max_workers=8)
+           ['statements/documents/0.pdf', ...]
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=spool_size)
+        try:
+            self.create_document_to(
+                spool,
+                template_id,
+                data,
+                document_format="zip",
+                response_format=response_format,
+                chunk_size=chunk_size,
+                timeout=timeout,
+                deadline=deadline,
+            )
+            spool.seek(0)
+            return DocumentArchive(spool)
+        except BaseException:
+            spool.close()
+            raise
+
     def get_editor_url(self, template_id: int, data):
         """ Prepares and returns a one-click URL to the web editor.
 
@@ -323,3 +1249,45 @@ class PDFGenerator(APIBase):
             query_string=urllib.parse.urlencode(request_params),
         )
         return url
+
+    def _editor_url_prefix(self, template_id):
+        """ Returns the editor URL of `template_id` up to, and including, the `&` before `data`. """
+        resource = "templates/{template_id}/editor".format(template_id=str(template_id))
+        return "{base_url}{resource}?{query_string}&".format(
+            base_url=self.API_URL,
+            resource=resource,
+            query_string=urllib.parse.urlencode(self.prepare_auth_params(resource)),
+        )
+
+    def get_editor_urls(self, template_ids, data_list):
+        """ Prepares one-click URLs to the web editor in bulk, e.g. for email campaigns.
+        The signed part of the URL is computed once per template.
+
+        :param template_ids: Unique ID of the template used for every URL, or a list with one
+                             template ID per element of `data_list`.
+        :param data_list: List of data to be pre-filled in the web editor.
+
+        Usage::
+
+          >>> pdfg_client.get_editor_urls(template_ids=123, data_list=[{'name': 'Sameer'}, {'name': 'Kumar'}])
+           [<str>, <str>]
+        """
+        if isinstance(template_ids, (int, str)):
+            template_ids = [template_ids] * len(data_list)
+        elif len(template_ids) != len(data_list):
+            raise IncorrectParameterError(
+                "template_ids and data_list must have the same length."
+            )
+
+        url_prefixes = {}
+        urls = []
+        for template_id, data in zip(template_ids, data_list):
+            url_prefix = url_prefixes.get(template_id)
+            if url_prefix is None:
+                url_prefix = url_prefixes[template_id] = self._editor_url_prefix(
+                    template_id
+                )
+            if not type(data) is str:
+                data = json.dumps(data)
+            urls.append(url_prefix + urllib.parse.urlencode({"data": data}))
+        return urls
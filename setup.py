@@ -37,13 +37,21 @@ setup(
         "Topic :: Software Development :: Libraries :: Python Modules",
     ],
     keywords="api wrapper client library pdfgeneratorapi pdfgenerator",
-    packages=find_packages(exclude=["contrib", "docs", "tests", "venv"]),
+    packages=find_packages(exclude=["benchmarks", "contrib", "docs", "tests", "venv"]),
     install_requires=["requests", "python-dateutil"],
+    entry_points={"console_scripts": ["pdfgeneratorapi = pdfgeneratorapi.cli:main"]},
     test_suite="tests",
     test_require=["python-dotenv"],
     # List additional groups of dependencies here (e.g. development
     # dependencies). You can install these using the following syntax,
     # for example:
     # $ pip install -e .[dev]
-    extras_require={"dev": ["sphinx", "sphinx-autobuild"], "test": ["python-dotenv"]},
+    extras_require={
+        "async": ["httpx"],
+        "dev": ["sphinx", "sphinx-autobuild"],
+        "compression": ["brotli", "zstandard"],
+        "http2": ["httpx[http2]"],
+        "speedups": ["orjson"],
+        "test": ["python-dotenv", "httpx[http2]"],
+    },
 )
@@ -1,9 +1,68 @@
+import asyncio
+import contextlib
+import datetime
+import hashlib
+import hmac
+import io
 import json
 import os
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from uuid import uuid4
 import unittest
 
-from pdfgeneratorapi import PDFGenerator
+import requests
+from urllib3.exceptions import ReadTimeoutError
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+try:
+    import h2
+except ImportError:  # pragma: no cover
+    h2 = None
+
+from benchmarks.server import StubServer
+from benchmarks.suite import regressions, run_suite
+from pdfgeneratorapi import AsyncPDFGenerator, PDFGenerator, cli
+from pdfgeneratorapi.archive import DocumentArchive, member_path
+from pdfgeneratorapi.batch import Checkpoint
+from pdfgeneratorapi.cache import TemplateCache
+from pdfgeneratorapi.coalesce import SingleFlight
+from pdfgeneratorapi.deadline import Deadline, timeout_phase
+from pdfgeneratorapi.document_cache import DocumentCache
+from pdfgeneratorapi.hedging import HedgePolicy
+from pdfgeneratorapi.instrumentation import MetricsRegistry
+from pdfgeneratorapi.exceptions import (
+    IncorrectParameterError,
+    InternalServerError,
+    InvalidFormat,
+    MissingFieldWarning,
+    PDFGeneratorAPIException,
+    RequestCancelled,
+    RequestTimeout,
+    ResourceEntityNotFound,
+    TooManyRequests,
+)
+from pdfgeneratorapi.listing import TemplateListing
+from pdfgeneratorapi.pruning import PayloadPruner, TemplateFields
+from pdfgeneratorapi.ratelimit import RateLimiter
+from pdfgeneratorapi.routing import ClientPool
+from pdfgeneratorapi.response import PDFGeneratorResponse
+from pdfgeneratorapi.serialization import AVAILABLE_CODECS
+from pdfgeneratorapi.streaming import JSONArrayScanner
+from pdfgeneratorapi.transport import (
+    FakeTransport,
+    HTTP2Transport,
+    HTTPXTransport,
+    RecordingTransport,
+    RequestsTransport,
+)
 from pdfgeneratorapi.utils import dict_to_object
 
 
@@ -76,3 +135,1451 @@ class PDFGeneratorAPITests(TestCase):
         )
         self.assertEqual(type(document), type(response))
         self.assertEqual(len(document.to_dict), len(response.to_dict))
+
+
+class StubServerTestCase(unittest.TestCase):
+    """ Runs the wrapper against the local stand-in server, no credentials needed. """
+
+    server_options = {}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StubServer(**cls.server_options).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def make_client(self, **kwargs):
+        client = PDFGenerator(
+            api_key="key",
+            api_secret="secret",
+            workspace="test@example.com",
+            api_url=self.server.api_url,
+            **kwargs
+        )
+        self.addCleanup(client.close)
+        return client
+
+
+class ConnectionPoolTests(StubServerTestCase):
+    def test_connections_are_reused(self):
+        client = self.make_client()
+        before = self.server.connection_count
+        for template_id in range(5):
+            client.get_template(template_id=template_id)
+        self.assertEqual(self.server.connection_count - before, 1)
+
+    def test_pool_is_shared_across_threads(self):
+        client = self.make_client(pool_maxsize=4, pool_block=True)
+        before = self.server.connection_count
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            templates = list(
+                executor.map(lambda i: client.get_template(template_id=i), range(40))
+            )
+        self.assertEqual([template.id for template in templates], list(range(40)))
+        self.assertLessEqual(self.server.connection_count - before, 4)
+
+    def test_context_manager_closes_pool(self):
+        with self.make_client() as client:
+            client.all_templates()
+        self.assertEqual(len(client.transport.adapter.poolmanager.pools), 0)
+
+
+@unittest.skipUnless(httpx, "requires httpx")
+class AsyncPDFGeneratorTests(StubServerTestCase):
+    def run_client(self, coroutine_function, **kwargs):
+        async def run():
+            async with AsyncPDFGenerator(
+                api_key="key",
+                api_secret="secret",
+                workspace="test@example.com",
+                api_url=self.server.api_url,
+                **kwargs
+            ) as client:
+                return await coroutine_function(client)
+
+        return asyncio.run(run())
+
+    def test_rejects_sync_usage(self):
+        with self.assertRaises(IncorrectParameterError):
+            AsyncPDFGenerator(
+                api_key="key", api_secret="secret", transport=FakeTransport()
+            )
+        client = AsyncPDFGenerator(api_key="key", api_secret="secret")
+        with self.assertRaises(TypeError):
+            with client:
+                pass
+        with self.assertRaises(TypeError):
+            client.close()
+        asyncio.run(client.aclose())
+
+    def test_fan_out_create_document(self):
+        async def fan_out(client):
+            return await asyncio.gather(
+                *[
+                    client.create_document(template_id=i, data={"name": "Sameer"})
+                    for i in range(50)
+                ]
+            )
+
+        documents = self.run_client(fan_out, max_concurrency=5)
+        self.assertEqual(
+            [document.name for document in documents],
+            ["{0}.pdf".format(i) for i in range(50)],
+        )
+
+    def test_all_templates(self):
+        async def all_templates(client):
+            return await client.all_templates(tags=["invoice"])
+
+        templates = self.run_client(all_templates)
+        self.assertEqual(len(templates), 2)
+        self.assertEqual(templates[0].id, 24382)
+
+    def test_errors_are_mapped(self):
+        async def missing_template(client):
+            return await client.get_template(template_id="missing")
+
+        with self.assertRaises(ResourceEntityNotFound) as context:
+            self.run_client(missing_template)
+        self.assertEqual(context.exception.http_status, 404)
+        self.server.queue_errors(502)
+        with self.assertRaises(PDFGeneratorAPIException) as context:
+            self.run_client(missing_template)
+        self.assertEqual(context.exception.http_status, 502)
+
+    def test_connection_errors_are_mapped(self):
+        listener = socket.create_server(("127.0.0.1", 0))
+        port = listener.getsockname()[1]
+        listener.close()
+
+        async def refused():
+            async with AsyncPDFGenerator(
+                api_key="key",
+                api_secret="secret",
+                workspace="test@example.com",
+                api_url="http://127.0.0.1:{0}/api/v3/".format(port),
+            ) as client:
+                return await client.get_template(template_id=1)
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            asyncio.run(refused())
+
+
+class CreateDocumentsTests(StubServerTestCase):
+    def test_ordered_results_and_failures(self):
+        client = self.make_client()
+        jobs = [(i, {"name": "Sameer"}) for i in range(20)]
+        jobs[7] = {"template_id": "missing", "data": {}}
+        seen = []
+        batch = client.create_documents(
+            jobs, max_workers=4, progress=lambda result, batch: seen.append(result)
+        )
+        results = batch.run()
+
+        self.assertEqual([result.index for result in results], list(range(20)))
+        self.assertIsInstance(results[7].exception, ResourceEntityNotFound)
+        self.assertEqual(results[8].response.name, "8.pdf")
+        self.assertEqual((batch.succeeded, batch.failed), (19, 1))
+        self.assertEqual(len(seen), 20)
+        self.assertGreater(batch.throughput, 0)
+
+    def test_unreadable_error_fails_its_job_only(self):
+        transport = FakeTransport()
+        transport.add(
+            "POST",
+            r"templates/3/output$",
+            status=502,
+            body=b"<html><body>502 Bad Gateway</body></html>",
+            headers={"Content-Type": "text/html"},
+        )
+        transport.add(
+            "POST",
+            r"templates/\d+/output$",
+            json={"response": "JVBERi0=", "meta": {"name": "a.pdf"}},
+        )
+        client = PDFGenerator(api_key="key", api_secret="secret", transport=transport)
+        results = client.create_documents(
+            [(i, {}) for i in range(6)], max_workers=2
+        ).run()
+        self.assertEqual(
+            [result.ok for result in results], [True] * 3 + [False, True, True]
+        )
+        self.assertIsInstance(results[3].exception, PDFGeneratorAPIException)
+
+    def test_unordered_results(self):
+        client = self.make_client()
+        jobs = ({"template_id": i, "data": {}} for i in range(30))
+        results = list(client.create_documents(jobs, max_workers=3, ordered=False))
+        self.assertEqual(sorted(result.index for result in results), list(range(30)))
+
+
+class CreateDocumentToTests(StubServerTestCase):
+    server_options = {"document_size": 300001}
+
+    def test_streams_every_response_format(self):
+        client = self.make_client()
+        for response_format in ("base64", "url", "I"):
+            sink = io.BytesIO()
+            written = client.create_document_to(
+                sink, template_id=1, data={}, response_format=response_format
+            )
+            self.assertEqual(written, 300001)
+            self.assertEqual(sink.getvalue(), self.server.httpd.document)
+
+    def test_writes_to_path(self):
+        client = self.make_client()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "document.pdf")
+            client.create_document_to(path, template_id=1, data={}, chunk_size=1000)
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), self.server.httpd.document)
+
+
+class DocumentArchiveTests(StubServerTestCase):
+    server_options = {"document_size": 50000, "archive_members": 20}
+
+    def test_iterates_members_lazily(self):
+        client = self.make_client()
+        with client.create_document_archive(1, {}, spool_size=1000) as archive:
+            self.assertTrue(archive.file._rolled)
+            self.assertEqual(len(archive), 20)
+            for info, stream in archive:
+                self.assertEqual(stream.read(), self.server.httpd.document)
+            self.assertEqual(info.filename, "documents/19.pdf")
+
+    def test_parallel_extraction(self):
+        client = self.make_client()
+        with tempfile.TemporaryDirectory() as directory:
+            with client.create_document_archive(1, {}, response_format="I") as archive:
+                paths = archive.extract_all(directory, max_workers=4, chunk_size=4096)
+            self.assertEqual(paths[0], os.path.join(directory, "documents", "0.pdf"))
+            for path in paths:
+                with open(path, "rb") as f:
+                    self.assertEqual(f.read(), self.server.httpd.document)
+
+    def test_member_paths_stay_in_directory(self):
+        self.assertEqual(member_path("out", "../../etc/passwd"), "out/etc/passwd")
+        self.assertEqual(member_path("out", "/abs\\x.pdf"), "out/abs/x.pdf")
+        with self.assertRaises(InvalidFormat):
+            DocumentArchive(io.BytesIO(b"not a zip"))
+
+
+class DocumentCacheTests(StubServerTestCase):
+    server_options = {"document_size": 5000}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_documents_are_served_from_disk(self):
+        client = self.make_client(document_cache=self.directory)
+        first = client.create_document(template_id=1, data={"a": 1, "b": 2})
+        before = self.server.request_count
+        second = client.create_document(template_id=1, data={"b": 2, "a": 1})
+        self.assertEqual(self.server.request_count, before)
+        self.assertEqual(second.to_dict, first.to_dict)
+        sink = io.BytesIO()
+        client.create_document_to(sink, template_id=1, data={"a": 1, "b": 2})
+        self.assertEqual(sink.getvalue(), self.server.httpd.document)
+        self.assertEqual(self.server.request_count, before)
+        self.assertEqual(client.document_cache.stats()["hits"], 2)
+
+    def test_cache_hits_match_misses(self):
+        transport = FakeTransport()
+        transport.add(
+            "POST",
+            r"output$",
+            json={
+                "response": "JVBERi0=",
+                "meta": {"name": "a.pdf", "pages": 0, "size": 1.5, "draft": False},
+            },
+        )
+        client = PDFGenerator(
+            api_key="key",
+            api_secret="secret",
+            transport=transport,
+            document_cache=self.directory,
+        )
+        miss = client.create_document(template_id=1, data={})
+        hit = client.create_document(template_id=1, data={})
+        self.assertEqual(transport.request_count, 1)
+        self.assertEqual(hit.to_dict, miss.to_dict)
+        for field in ("response", "name", "pages", "size", "draft"):
+            self.assertEqual(getattr(hit, field), getattr(miss, field))
+        self.assertEqual(hit.size, 1.5)
+
+    def test_streamed_documents_are_cached(self):
+        client = self.make_client(document_cache=self.directory)
+        for response_format in ("I", "I", "base64"):
+            sink = io.BytesIO()
+            client.create_document_to(
+                sink, template_id=1, data={}, response_format=response_format
+            )
+            self.assertEqual(sink.getvalue(), self.server.httpd.document)
+        before = self.server.request_count
+        document = client.create_document(template_id=1, data={})
+        self.assertEqual(self.server.request_count, before)
+        self.assertEqual(document.name, "1.pdf")
+
+    def test_least_recently_used_documents_are_evicted(self):
+        cache = DocumentCache(self.directory, max_bytes=12000)
+        client = self.make_client(document_cache=cache)
+        for i in range(3):
+            client.create_document(template_id=1, data={"i": i})
+            time.sleep(0.01)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertLessEqual(cache.stats()["bytes"], 12000)
+        before = self.server.request_count
+        client.create_document(template_id=1, data={"i": 2})
+        self.assertEqual(self.server.request_count, before)
+        client.create_document(template_id=1, data={"i": 0})
+        self.assertEqual(self.server.request_count, before + 1)
+
+    def test_delete_template_invalidates_documents(self):
+        client = self.make_client(document_cache=self.directory)
+        client.create_document(template_id=1, data={})
+        client.delete_template(template_id=1)
+        before = self.server.request_count
+        client.create_document(template_id=1, data={})
+        self.assertEqual(self.server.request_count, before + 1)
+
+
+class BenchmarkSuiteTests(StubServerTestCase):
+    def test_reports_every_method_and_parse_path(self):
+        results = run_suite(
+            self.server.api_url, calls=3, parse_calls_count=1, template_count=5
+        )
+        self.assertIn("create_document", results)
+        self.assertIn("parse.dict_to_object", results)
+        for metrics in results.values():
+            self.assertEqual(metrics["errors"], 0)
+            self.assertGreater(metrics["rps"], 0)
+            self.assertLessEqual(metrics["p50_ms"], metrics["p99_ms"])
+        baseline = {"results": {"get_template": dict(results["get_template"])}}
+        baseline["results"]["get_template"]["rps"] *= 10
+        self.assertEqual(
+            [found[:2] for found in regressions(results, baseline, 0.2)],
+            [("get_template", "rps")],
+        )
+
+    def test_error_rate(self):
+        with StubServer(error_rate=1.0) as server:
+            results = run_suite(server.api_url, calls=4, only=["get_template"])
+        self.assertEqual(results["get_template"]["errors"], 4)
+
+
+class InstrumentationTests(StubServerTestCase):
+    def test_hooks_and_timings(self):
+        calls = []
+        client = self.make_client(
+            hooks={
+                "pre_request": lambda info: calls.append(("pre", info.resource)),
+                "post_request": lambda info: calls.append(
+                    ("post", info.endpoint, info.status_code)
+                ),
+            }
+        )
+        template = client.get_template(template_id=7)
+        self.assertEqual(
+            calls, [("pre", "templates/7"), ("post", "templates/{id}", 200)]
+        )
+        for phase in ("sign", "encode", "wait", "download", "decode", "build"):
+            self.assertGreaterEqual(template.timings[phase], 0)
+        self.assertAlmostEqual(template.timings.total, sum(template.timings.values()))
+        templates = client.all_templates()
+        self.assertEqual(len(templates), 2)
+        self.assertIn("decode", templates.timings)
+
+    def test_no_timings_without_hooks(self):
+        client = self.make_client()
+        self.assertNotIn("timings", client.get_template(template_id=7).__dict__)
+        self.assertIs(type(client.all_templates()), list)
+        with self.assertRaises(IncorrectParameterError):
+            client.register_hook("response", print)
+
+    def test_metrics_registry(self):
+        metrics = MetricsRegistry(buckets=(0.001, 10))
+        client = self.make_client(metrics=metrics)
+        client.get_template(template_id=1)
+        client.get_template(template_id=2)
+        with self.assertRaises(ResourceEntityNotFound):
+            client.get_template(template_id="missing")
+        text = metrics.render()
+        self.assertIn(
+            'pdfgeneratorapi_requests_total{endpoint="templates/{id}",method="GET",'
+            'status="200"} 2',
+            text,
+        )
+        self.assertIn('status="404"} 1', text)
+        self.assertIn(
+            'pdfgeneratorapi_request_duration_seconds_bucket{endpoint="templates/{id}",'
+            'method="GET",status="200",le="10"} 2',
+            text,
+        )
+        self.assertIn('phase="sign"', text)
+
+
+class TimeoutTests(StubServerTestCase):
+    server_options = {"latency": 0.5}
+
+    def test_read_timeout(self):
+        client = self.make_client(read_timeout=0.1)
+        start = time.perf_counter()
+        with self.assertRaises(RequestTimeout) as context:
+            client.get_template(template_id=1)
+        self.assertEqual(context.exception.phase, "read")
+        self.assertEqual(context.exception.timeout, 0.1)
+        self.assertLess(time.perf_counter() - start, 0.4)
+        self.assertEqual(client.get_template(template_id=1, timeout=(1, 2)).id, 1)
+
+    def test_deadline_caps_timeouts(self):
+        client = self.make_client()
+        with self.assertRaises(RequestTimeout) as context:
+            client.create_document_to(
+                io.BytesIO(), template_id=1, data={}, deadline=0.2
+            )
+        self.assertEqual(context.exception.phase, "deadline")
+        deadline = Deadline(0.2)
+        time.sleep(0.2)
+        with self.assertRaises(RequestTimeout):
+            client.all_templates(deadline=deadline)
+
+    def test_deadline_spans_retries(self):
+        transport = FakeTransport()
+        transport.add("GET", r"templates/1$", status=429, latency=0.15)
+        client = PDFGenerator(
+            api_key="key",
+            api_secret="secret",
+            transport=transport,
+            rate_limiter=RateLimiter(rate=100, max_retries=10),
+        )
+        with self.assertRaises(RequestTimeout) as context:
+            client.get_template(template_id=1, deadline=0.4)
+        self.assertEqual(context.exception.phase, "deadline")
+        self.assertLessEqual(transport.request_count, 3)
+
+    def test_cancel_batch(self):
+        transport = FakeTransport(latency=0.05)
+        transport.add("POST", r"output$", json={"response": "JVBERi0=", "meta": {}})
+        client = PDFGenerator(api_key="key", api_secret="secret", transport=transport)
+        deadline = Deadline()
+        threading.Timer(0.2, deadline.cancel, ("shutdown",)).start()
+        results = client.create_documents(
+            ((1, {}) for _ in range(1000)), max_workers=2, deadline=deadline
+        ).run()
+        self.assertTrue(deadline.cancelled)
+        self.assertLess(len(results), 100)
+        self.assertTrue(
+            all(
+                result.ok or isinstance(result.exception, RequestCancelled)
+                for result in results
+            )
+        )
+
+    @unittest.skipUnless(httpx, "requires httpx")
+    def test_async_deadline_and_cancellation(self):
+        deadline = Deadline()
+
+        async def run():
+            async with AsyncPDFGenerator(
+                api_key="key",
+                api_secret="secret",
+                workspace="test@example.com",
+                api_url=self.server.api_url,
+            ) as client:
+                with self.assertRaises(RequestTimeout) as context:
+                    await client.get_template(template_id=1, deadline=0.1)
+                self.assertEqual(context.exception.phase, "deadline")
+                threading.Timer(0.1, deadline.cancel).start()
+                with self.assertRaises(RequestCancelled):
+                    await client.get_template(template_id=1, deadline=deadline)
+
+        start = time.perf_counter()
+        asyncio.run(run())
+        self.assertLess(time.perf_counter() - start, 0.6)
+
+    def test_cancel_aborts_a_waiting_request(self):
+        client = self.make_client()
+        deadline = Deadline()
+        threading.Timer(0.1, deadline.cancel).start()
+        start = time.perf_counter()
+        with self.assertRaises(RequestCancelled):
+            client.get_template(template_id=1, deadline=deadline)
+        self.assertLess(time.perf_counter() - start, 0.4)
+        self.assertEqual(client.get_template(template_id=2).id, 2)
+
+    def test_timeout_phase(self):
+        self.assertEqual(timeout_phase(requests.exceptions.ConnectTimeout()), "connect")
+        self.assertEqual(
+            timeout_phase(
+                requests.exceptions.ConnectionError(ReadTimeoutError(None, None, "x"))
+            ),
+            "read",
+        )
+        self.assertIsNone(timeout_phase(requests.exceptions.ConnectionError("refused")))
+
+
+class HedgingTests(StubServerTestCase):
+    def make_hedged_client(self, **policy):
+        hedge = HedgePolicy(**dict({"delay": 0.1, "budget": 1.0}, **policy))
+        self.addCleanup(hedge.close)
+        return self.make_client(hedge=hedge)
+
+    def test_slow_request_is_hedged(self):
+        client = self.make_hedged_client()
+        self.server.queue_delays(1.0)
+        start = time.perf_counter()
+        document = client.create_document(template_id=1, data={})
+        self.assertLess(time.perf_counter() - start, 0.6)
+        self.assertEqual(document.name, "1.pdf")
+        stats = client.hedge.stats()
+        self.assertEqual((stats["hedged"], stats["hedge_wins"]), (1, 1))
+        self.assertEqual(stats["win_rate"], 1.0)
+
+    def test_fast_requests_are_not_hedged(self):
+        client = self.make_hedged_client()
+        before = self.server.request_count
+        for template_id in range(5):
+            client.create_document(template_id=template_id, data={})
+        self.assertEqual(self.server.request_count - before, 5)
+        self.assertEqual(client.hedge.stats()["hedge_rate"], 0.0)
+
+    def test_budget(self):
+        client = self.make_hedged_client(budget=0.0)
+        self.server.queue_delays(0.3)
+        client.create_document(template_id=1, data={})
+        stats = client.hedge.stats()
+        self.assertEqual((stats["hedged"], stats["budget_denied"]), (0, 1))
+
+    def test_first_success_wins(self):
+        client = self.make_hedged_client()
+        self.server.queue_delays(0.3)
+        self.server.queue_errors(500)
+        self.assertEqual(client.create_document(template_id=2, data={}).name, "2.pdf")
+        self.server.queue_errors(500)
+        with self.assertRaises(InternalServerError):
+            client.create_document(template_id=2, data={})
+
+    def test_first_requests_are_not_throttled_by_the_pool(self):
+        transport = FakeTransport(latency=0.2)
+        transport.add("POST", r"output$", json={"response": "JVBERi0=", "meta": {}})
+        hedge = HedgePolicy(delay=5.0, max_workers=1)
+        self.addCleanup(hedge.close)
+        client = PDFGenerator(
+            api_key="key", api_secret="secret", transport=transport, hedge=hedge
+        )
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(
+                executor.map(
+                    lambda i: client.create_document(template_id=i, data={}), range(8)
+                )
+            )
+        self.assertLess(time.perf_counter() - start, 0.6)
+        self.assertEqual(hedge.stats()["calls"], 8)
+
+    def test_adaptive_delay(self):
+        hedge = HedgePolicy(initial_delay=2.0, min_samples=20)
+        self.assertEqual(hedge.delay, 2.0)
+        for i in range(100):
+            hedge.observe(i / 100.0)
+        self.assertAlmostEqual(hedge.delay, 0.95, delta=0.02)
+
+    def test_owned_policies_are_closed(self):
+        def timer_thread(client):
+            client.create_document(template_id=1, data={})
+            return client.hedge._timer._thread
+
+        client = self.make_client(hedge=True)
+        thread = timer_thread(client)
+        client.close()
+        thread.join(1)
+        self.assertFalse(thread.is_alive())
+
+        pool = ClientPool(
+            api_key="key",
+            api_secret="secret",
+            api_urls={"us1": self.server.api_url},
+            hedge=True,
+        )
+        thread = timer_thread(pool.client("a@example.com"))
+        pool.close()
+        thread.join(1)
+        self.assertFalse(thread.is_alive())
+
+        hedge = HedgePolicy()
+        self.addCleanup(hedge.close)
+        client = self.make_client(hedge=hedge)
+        thread = timer_thread(client)
+        client.close()
+        self.assertTrue(thread.is_alive())
+
+    @unittest.skipUnless(httpx, "requires httpx")
+    def test_async_hedging(self):
+        hedge = HedgePolicy(delay=0.1, budget=1.0)
+        self.server.queue_delays(1.0)
+
+        async def run():
+            async with AsyncPDFGenerator(
+                api_key="key",
+                api_secret="secret",
+                workspace="test@example.com",
+                api_url=self.server.api_url,
+                hedge=hedge,
+            ) as client:
+                return await client.create_document(template_id=3, data={})
+
+        start = time.perf_counter()
+        self.assertEqual(asyncio.run(run()).name, "3.pdf")
+        self.assertLess(time.perf_counter() - start, 0.6)
+        self.assertEqual(hedge.stats()["hedge_wins"], 1)
+
+
+class TransportTests(StubServerTestCase):
+    def make_fake_client(self, transport, **kwargs):
+        return PDFGenerator(
+            api_key="key",
+            api_secret="secret",
+            workspace="test@example.com",
+            transport=transport,
+            **kwargs
+        )
+
+    def test_fake_transport_scripted_answers(self):
+        transport = FakeTransport()
+        transport.add("GET", r"templates/\d+$", status=429, times=2)
+        transport.add("GET", r"templates/\d+$", json={"response": {"id": 5}})
+        client = self.make_fake_client(
+            transport, rate_limiter=RateLimiter(cooldown=0, max_retries=2)
+        )
+        self.assertEqual(client.get_template(template_id=5).id, 5)
+        self.assertEqual(transport.request_count, 3)
+        request = transport.requests[-1]
+        self.assertEqual(request.headers["X-Auth-Workspace"], "test@example.com")
+        self.assertTrue(request.path.endswith("/templates/5"))
+        with self.assertRaises(ResourceEntityNotFound):
+            client.create_template_copy(template_id=5)
+
+    def test_fake_transport_latency_and_streaming(self):
+        transport = FakeTransport(latency=0.05)
+        transport.add("POST", r"output$", body=b"%PDF-1.7", latency=0)
+        transport.add("GET", r"templates$", json={"response": []})
+        client = self.make_fake_client(transport)
+        sink = io.BytesIO()
+        client.create_document_to(sink, template_id=1, data={}, response_format="I")
+        self.assertEqual(sink.getvalue(), b"%PDF-1.7")
+        start = time.perf_counter()
+        client.all_templates()
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+
+    def test_unmapped_error_statuses(self):
+        transport = FakeTransport()
+        transport.add(
+            "GET",
+            r"templates/1$",
+            status=504,
+            body=b"<html><body>504 Gateway Time-out</body></html>",
+            headers={"Content-Type": "text/html"},
+        )
+        client = self.make_fake_client(transport)
+        with self.assertRaises(PDFGeneratorAPIException) as context:
+            client.get_template(template_id=1)
+        self.assertEqual(context.exception.http_status, 504)
+        self.assertIn("Gateway Time-out", context.exception.http_body)
+        self.assertIsNone(context.exception.json_body)
+
+    def test_record_and_replay(self):
+        recorder = RecordingTransport(RequestsTransport())
+        client = self.make_client(transport=recorder)
+        document = client.create_document(template_id=3, data={"a": 1})
+        template = client.get_template(template_id=3)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "exchanges.jsonl")
+            recorder.save(path)
+            replayed = self.make_fake_client(FakeTransport.replay(path))
+        for _ in range(2):
+            self.assertEqual(
+                replayed.create_document(template_id=3, data={}).to_dict,
+                document.to_dict,
+            )
+        self.assertEqual(replayed.get_template(template_id=3).to_dict, template.to_dict)
+        with self.assertRaises(ResourceEntityNotFound):
+            replayed.get_template(template_id=4)
+
+    @unittest.skipUnless(httpx, "requires httpx")
+    def test_httpx_transport(self):
+        client = self.make_client(transport=HTTPXTransport())
+        self.assertEqual(client.get_template(template_id=9).id, 9)
+        sink = io.BytesIO()
+        client.create_document_to(sink, template_id=1, data={}, response_format="url")
+        self.assertEqual(sink.getvalue(), self.server.httpd.document)
+
+
+@unittest.skipUnless(httpx and h2, "requires httpx and h2")
+class HTTP2Tests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from benchmarks.h2server import H2StubServer
+
+        cls.server = H2StubServer(latency=0.2, document_size=100000).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def make_client(self, client_class=PDFGenerator, api_url=None, **kwargs):
+        return client_class(
+            api_key="key",
+            api_secret="secret",
+            workspace="test@example.com",
+            api_url=api_url or self.server.api_url,
+            http2=True,
+            **kwargs
+        )
+
+    def test_streams_are_multiplexed_up_to_the_cap(self):
+        client = self.make_client(max_streams_per_connection=10, http2_connections=3)
+        self.addCleanup(client.close)
+        before = self.server.connection_count
+        with ThreadPoolExecutor(max_workers=30) as executor:
+            documents = list(
+                executor.map(
+                    lambda i: client.create_document(template_id=i, data={}), range(60)
+                )
+            )
+        self.assertEqual(documents[59].name, "59.pdf")
+        # One more for the HTTP/2 preface probe.
+        self.assertEqual(self.server.connection_count - before, 4)
+        self.assertEqual(client.transport.fallbacks, 0)
+        sink = io.BytesIO()
+        client.create_document_to(sink, template_id=1, data={}, response_format="I")
+        self.assertEqual(sink.getvalue(), self.server.document)
+
+    def test_streams_are_released_and_waits_bounded(self):
+        client = self.make_client(max_streams_per_connection=1, http2_connections=1)
+        self.addCleanup(client.close)
+        with self.assertRaises(RequestTimeout) as context:
+            client.get_template(template_id=1, timeout=(1, 0.05))
+        self.assertEqual(context.exception.phase, "read")
+        self.assertEqual(client.get_template(template_id=2).id, 2)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(client.get_template, template_id=3)
+            time.sleep(0.1)
+            start = time.perf_counter()
+            with self.assertRaises(RequestTimeout) as context:
+                client.get_template(template_id=4, timeout=(0.05, 5))
+            self.assertEqual(context.exception.phase, "pool")
+            self.assertLess(time.perf_counter() - start, 0.1)
+            self.assertEqual(future.result().id, 3)
+        connections = list(client.transport.connections.values())[0]
+        self.assertEqual([connection.streams for connection in connections], [0])
+
+    def test_streamed_bodies_release_their_stream(self):
+        client = self.make_client(max_streams_per_connection=1, http2_connections=1)
+        self.addCleanup(client.close)
+        for response_format in ("I", "base64", "I"):
+            sink = io.BytesIO()
+            client.create_document_to(
+                sink,
+                template_id=1,
+                data={},
+                response_format=response_format,
+                timeout=(0.5, 5),
+            )
+            self.assertEqual(sink.getvalue(), self.server.document)
+        self.assertEqual(len(list(client.iter_templates(timeout=(0.5, 5)))), 2)
+        self.assertEqual(client.get_template(template_id=2, timeout=(0.5, 5)).id, 2)
+        connections = list(client.transport.connections.values())[0]
+        self.assertEqual([connection.streams for connection in connections], [0])
+
+    def test_async_client(self):
+        async def fan_out():
+            async with self.make_client(
+                AsyncPDFGenerator, max_streams_per_connection=25
+            ) as client:
+                return await asyncio.gather(
+                    *[client.get_template(template_id=i) for i in range(50)]
+                )
+
+        before = self.server.connection_count
+        templates = asyncio.run(fan_out())
+        self.assertEqual([template.id for template in templates], list(range(50)))
+        self.assertEqual(self.server.connection_count - before, 3)
+
+    def test_falls_back_to_http1(self):
+        with StubServer() as server:
+            client = self.make_client(api_url=server.api_url)
+            self.addCleanup(client.close)
+            for template_id in range(3):
+                self.assertEqual(
+                    client.get_template(template_id=template_id).id, template_id
+                )
+        self.assertEqual(client.transport.fallbacks, 1)
+
+    def test_failures_after_the_preface_are_not_resent(self):
+        # Speaks HTTP/2 to the probe, then drops every connection with a request on it.
+        listener = socket.create_server(("127.0.0.1", 0))
+        self.addCleanup(listener.close)
+        received = []
+
+        def serve():
+            while True:
+                try:
+                    connection, _ = listener.accept()
+                except OSError:
+                    return
+                with connection:
+                    connection.sendall(b"\x00\x00\x00\x04\x00\x00\x00\x00\x00")
+                    received.append(connection.recv(65536))
+
+        threading.Thread(target=serve, daemon=True).start()
+        transport = HTTP2Transport()
+        self.addCleanup(transport.close)
+        url = "http://127.0.0.1:{0}/api/v3/templates".format(listener.getsockname()[1])
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            transport.request("POST", url, data=b"{}", timeout=(1, 1))
+        self.assertEqual(len(received), 2)
+        self.assertEqual(transport.fallbacks, 0)
+        self.assertEqual(transport.http2_origins, {transport.origin(url)})
+
+
+class CompressionTests(unittest.TestCase):
+    data = {"items": [{"sku": "A-{0}".format(i), "quantity": i} for i in range(2000)]}
+
+    def make_client(self, server, **kwargs):
+        client = PDFGenerator(
+            api_key="key",
+            api_secret="secret",
+            workspace="test@example.com",
+            api_url=server.api_url,
+            **kwargs
+        )
+        self.addCleanup(client.close)
+        return client
+
+    def test_large_bodies_are_compressed(self):
+        requests_info = []
+        with StubServer(compress_responses=True, document_size=100000) as server:
+            client = self.make_client(
+                server,
+                compress_requests="gzip",
+                hooks={"post_request": requests_info.append},
+            )
+            document = client.create_document(template_id=1, data=self.data)
+            client.create_document(template_id=1, data={"small": True})
+            self.assertEqual(server.compressed_request_count, 1)
+        self.assertEqual(document.response, server.httpd.document_base64)
+        raw_size = len(client.codec.dumps(self.data))
+        self.assertLess(requests_info[0].bytes_sent, raw_size / 4)
+        self.assertLess(
+            requests_info[0].bytes_received, len(requests_info[0].response.content) / 4
+        )
+        self.assertEqual(requests_info[1].bytes_sent, len(b'{"small":true}'))
+
+    def test_falls_back_when_refused(self):
+        with StubServer(accept_compressed=False) as server:
+            client = self.make_client(server, compress_requests=True)
+            client.create_document(template_id=1, data=self.data)
+            client.create_document(template_id=2, data=self.data)
+            self.assertEqual(server.compressed_request_count, 1)
+            self.assertEqual(server.request_count, 3)
+        self.assertIsNone(client.request_encoding)
+
+    def test_unknown_encoding(self):
+        with self.assertRaises(IncorrectParameterError):
+            PDFGenerator(api_key="key", api_secret="secret", compress_requests="lzma")
+
+
+class IterTemplatesTests(StubServerTestCase):
+    server_options = {"template_count": 2500}
+
+    def test_matches_all_templates(self):
+        client = self.make_client()
+        templates = client.iter_templates(tags=["invoice"], chunk_size=100)
+        self.assertEqual(
+            [template.to_dict for template in templates],
+            [template.to_dict for template in client.all_templates(tags=["invoice"])],
+        )
+
+    def test_pagination(self):
+        client = self.make_client()
+        before = self.server.request_count
+        ids = [template.id for template in client.iter_templates(page_size=1000)]
+        self.assertEqual(ids, list(range(24382, 24382 + 2500)))
+        self.assertEqual(self.server.request_count - before, 3)
+
+    def test_server_ignoring_pagination(self):
+        transport = FakeTransport()
+        transport.add(
+            "GET", r"templates$", json={"response": [{"id": i} for i in range(5)]}
+        )
+        client = PDFGenerator(api_key="key", api_secret="secret", transport=transport)
+        ids = [template.id for template in client.iter_templates(page_size=2)]
+        self.assertEqual(ids, list(range(5)))
+        self.assertEqual(transport.request_count, 2)
+
+    def test_incremental_parsing(self):
+        raw = json.dumps(
+            {"meta": {"response": []}, "response": [{"id": 1}, 22, "x"], "n": 1.5}
+        ).encode()
+        scanner = JSONArrayScanner("response")
+        items = []
+        for i in range(len(raw)):
+            items.extend(scanner.feed(raw[i : i + 1]))
+        items.extend(scanner.feed(b"", final=True))
+        self.assertEqual(items, [{"id": 1}, 22, "x"])
+        with self.assertRaises(InvalidFormat):
+            JSONArrayScanner("response").feed(b'{"response": [{"id"', final=True)
+
+
+class TemplateListingTests(StubServerTestCase):
+    server_options = {"template_count": 300}
+
+    items = [
+        {
+            "id": 3,
+            "name": "b",
+            "modified": "2018-05-01 10:00:00",
+            "owner": True,
+            "tags": ["invoice", "order"],
+        },
+        {"id": 1, "name": "a", "modified": "2016-02-29 23:59:59", "owner": False},
+        {"id": 2, "modified": "yesterday", "owner": "maybe", "tags": [], "x": [1]},
+        {"id": "4", "name": None, "tags": ["invoice"], "access": "private"},
+    ]
+
+    def test_round_trip(self):
+        listing = TemplateListing.from_items(self.items)
+        self.assertEqual(listing.to_dicts(), self.items)
+        self.assertEqual(len(listing), 4)
+        self.assertEqual(listing[0].modified, datetime.datetime(2018, 5, 1, 10))
+        self.assertEqual(listing[2].to_dict, self.items[2])
+        self.assertEqual(listing.get(1).name, "a")
+        self.assertEqual(listing.get("4").access, "private")
+        self.assertIsNone(listing.get(0))
+
+    def test_filter_and_sort(self):
+        listing = TemplateListing.from_items(self.items)
+        self.assertEqual(listing.filter(tags=["invoice"]).ids, [3, "4"])
+        self.assertEqual(listing.filter(tags="order", owner=True).ids, [3])
+        self.assertEqual(listing.filter(owner=False).ids, [1])
+        self.assertEqual(listing.filter(access="private").ids, ["4"])
+        self.assertEqual(
+            listing.filter(modified_after="2017-01-01").ids,
+            listing.filter(modified_after=datetime.date(2017, 1, 1)).ids,
+        )
+        self.assertEqual(listing.filter(modified_before="2017-01-01").ids, [1])
+        self.assertEqual(listing.sort_by("modified").ids, [1, 3, 2, "4"])
+        self.assertEqual(listing.sort_by("name").names, ["a", "b", None, None])
+        self.assertEqual(listing.sort_by("id", reverse=True)[:2].ids, [3, 2])
+        with self.assertRaises(IncorrectParameterError):
+            listing.sort_by("owner")
+        with self.assertRaises(IncorrectParameterError):
+            listing.filter(modified_after="soon")
+
+    def test_matches_all_templates(self):
+        client = self.make_client()
+        listing = client.template_listing(tags=["invoice"])
+        self.assertEqual(
+            listing.to_dicts(),
+            [template.to_dict for template in client.all_templates(tags=["invoice"])],
+        )
+        self.assertEqual(
+            listing.filter(owner=True).ids,
+            [template.id for template in client.all_templates() if template.owner],
+        )
+
+
+class BatchCLITests(StubServerTestCase):
+    server_options = {"document_size": 5000}
+
+    def run_batch(self, directory, *args):
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            exit_code = cli.main(
+                ["batch", os.path.join(directory, "jobs.jsonl"), "-o", directory]
+                + ["--api-key", "key", "--api-secret", "secret", "--workspace", "w"]
+                + ["--api-url", self.server.api_url, "-w", "4", "-q"]
+                + list(args)
+            )
+        return exit_code, stderr.getvalue()
+
+    def test_partial_failure_and_resume(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "jobs.jsonl"), "w") as f:
+                for i in range(20):
+                    job = {"template_id": i, "data": {}, "output": "out/%d.pdf" % i}
+                    if i == 3:
+                        job["template_id"] = "missing"
+                    f.write(json.dumps(job) + "\n")
+
+            exit_code, summary = self.run_batch(directory)
+            self.assertEqual(exit_code, cli.EXIT_PARTIAL_FAILURE)
+            self.assertIn("19 rendered, 1 failed", summary)
+            self.assertIn("ResourceEntityNotFound", summary)
+            self.assertEqual(len(os.listdir(os.path.join(directory, "out"))), 19)
+            with open(os.path.join(directory, "out", "5.pdf"), "rb") as f:
+                self.assertEqual(f.read(), self.server.httpd.document)
+
+            before = self.server.request_count
+            exit_code, summary = self.run_batch(directory)
+            self.assertEqual(exit_code, cli.EXIT_FAILURE)
+            self.assertIn("0 rendered, 1 failed, 19 skipped", summary)
+            self.assertEqual(self.server.request_count - before, 1)
+
+    def test_process_executor(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "jobs.jsonl"), "w") as f:
+                for i in range(10):
+                    f.write(json.dumps({"id": "doc-%d" % i, "template_id": i}) + "\n")
+            exit_code, summary = self.run_batch(directory, "--executor", "process")
+            self.assertEqual(exit_code, cli.EXIT_OK)
+            self.assertTrue(os.path.exists(os.path.join(directory, "doc-9.pdf")))
+
+    def test_checkpoint_ignores_torn_line(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "jobs.checkpoint")
+            with open(path, "w") as f:
+                f.write(
+                    '{"job": 1, "ok": true}\n{"job": 2, "ok": false}\n{"job": 3, "o'
+                )
+            with Checkpoint(path) as checkpoint:
+                self.assertEqual(checkpoint.done, {1})
+                checkpoint.record(4, ok=True)
+            with Checkpoint(path) as checkpoint:
+                self.assertEqual(checkpoint.done, {1, 4})
+
+
+class PayloadPruningTests(unittest.TestCase):
+    template = {
+        "id": 7,
+        "pages": [
+            {
+                "components": [
+                    {"className": "CustomText", "value": "Dear {customer.name},"},
+                    {
+                        "className": "Table",
+                        "dataIndex": "line_items",
+                        "sortBy": ["price"],
+                        "cols": [
+                            {"value": "{line_items::description}"},
+                            {"value": "{% {line_items::quantity} * 2 %}"},
+                        ],
+                    },
+                    {"value": "<style>p {color: red}</style>{ totals }"},
+                ]
+            }
+        ],
+    }
+    data = {
+        "customer": {"name": "Sameer", "email": "sam@example.com"},
+        "line_items": [
+            {"description": "Pen", "quantity": 2, "price": 1.5, "sku": "P-1"},
+            {"description": "Ink", "quantity": 1, "price": 9.0, "sku": "I-1"},
+        ],
+        "totals": {"net": 12, "vat": 2},
+        "history": [{"order": i} for i in range(50)],
+    }
+
+    def make_client(self, transport, **kwargs):
+        transport.add("GET", r"templates/\d+$", json={"response": self.template})
+        transport.add("POST", r"output$", json={"response": "JVBERi0=", "meta": {}})
+        return PDFGenerator(
+            api_key="key",
+            api_secret="secret",
+            workspace="test@example.com",
+            transport=transport,
+            **kwargs
+        )
+
+    def test_template_fields(self):
+        self.assertEqual(
+            TemplateFields(self.template).tree,
+            {
+                "customer": {"name": None},
+                "line_items": {"description": None, "quantity": None, "price": None},
+                "price": None,
+                "totals": None,
+            },
+        )
+
+    def test_prunes_create_document_data(self):
+        transport = FakeTransport()
+        client = self.make_client(transport, prune_payloads=True)
+        for _ in range(3):
+            client.create_document(template_id=7, data=self.data)
+        self.assertEqual(
+            transport.requests[-1].json(),
+            {
+                "customer": {"name": "Sameer"},
+                "line_items": [
+                    {"description": "Pen", "quantity": 2, "price": 1.5},
+                    {"description": "Ink", "quantity": 1, "price": 9.0},
+                ],
+                "totals": {"net": 12, "vat": 2},
+            },
+        )
+        # The template is read once.
+        self.assertEqual(transport.request_count, 4)
+        stats = client.payload_pruner.stats()
+        self.assertEqual(stats["payloads"], 3)
+        self.assertEqual(stats["pruned_keys"], 3 * 4)
+        saved = len(json.dumps(self.data, separators=(",", ":"))) - len(
+            transport.requests[-1].data
+        )
+        self.assertAlmostEqual(stats["bytes_saved"] / 3, saved, delta=10)
+
+    def test_strict_mode_warns(self):
+        client = self.make_client(
+            FakeTransport(), prune_payloads=PayloadPruner(strict=True)
+        )
+        data = dict(self.data, customer={})
+        with self.assertWarns(MissingFieldWarning) as caught:
+            client.create_document(template_id=7, data=data)
+        self.assertIn("customer.name", str(caught.warning))
+
+
+class ClientPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.servers = {
+            "fast": StubServer(),
+            "slow": StubServer(latency=0.05),
+            "down": StubServer(error_rate=1.0),
+        }
+        for server in self.servers.values():
+            server.start()
+            self.addCleanup(server.stop)
+        self.pool = ClientPool(
+            api_key="key",
+            api_secret="secret",
+            regions=("slow", "fast", "down"),
+            api_urls={
+                region: server.api_url for region, server in self.servers.items()
+            },
+            max_failures=2,
+            retry_after=60,
+            metrics=True,
+        )
+        self.addCleanup(self.pool.close)
+
+    def test_bound_clients(self):
+        first = self.pool.client("a@example.com", region="fast")
+        self.assertIs(self.pool.client("a@example.com", region="fast"), first)
+        second = self.pool.client("b@example.com", region="fast")
+        self.assertIs(second.transport, first.transport)
+        self.assertIs(second.metrics, first.metrics)
+        with self.assertRaises(IncorrectParameterError):
+            first.set_workspace("b@example.com")
+        with self.assertRaises(IncorrectParameterError):
+            self.pool.client("a@example.com", region="moon")
+
+        def workspace_header(workspace):
+            client = self.pool.client(workspace, region="fast")
+            return client.prepare_headers("templates")["X-Auth-Workspace"]
+
+        workspaces = ["w%d@example.com" % (i % 7) for i in range(200)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            self.assertEqual(
+                list(executor.map(workspace_header, workspaces)), workspaces
+            )
+
+    def test_latency_aware_selection_and_health(self):
+        self.assertEqual(
+            self.pool.check_health(), {"slow": True, "fast": True, "down": False}
+        )
+        self.pool.check_health()
+        self.assertFalse(self.pool.stats()["down"]["healthy"])
+        for _ in range(4):
+            self.pool.client("a@example.com").all_templates()
+        self.assertEqual(self.pool.select_region(), "fast")
+        stats = self.pool.stats()
+        self.assertLess(stats["fast"]["latency"], stats["slow"]["latency"])
+        self.assertGreater(stats["slow"]["latency"], stats["down"]["latency"])
+        self.assertEqual(stats["fast"]["requests"], 6)
+
+
+class PDFGeneratorResponseTests(unittest.TestCase):
+    def load_response(self, fixture_name):
+        with open(
+            os.path.dirname(__file__) + "/fixtures/%s.json" % fixture_name, "rb"
+        ) as f:
+            return dict_to_object(json.loads(f.read().decode("utf-8")))
+
+    def test_fields_are_converted_on_first_access(self):
+        template = self.load_response("single_template")
+        self.assertNotIn("layout", template.__dict__)
+        self.assertEqual(template.layout.format, "A4")
+        self.assertIs(template.layout, template.layout)
+        self.assertEqual(template.pages[0].components[0].class_name, "CustomText")
+        self.assertIn("empty_labels", dir(template.layout))
+
+    def test_dates_lists_and_raw_views(self):
+        templates = self.load_response("all_templates")
+        self.assertEqual(
+            templates[0].modified, datetime.datetime(2017, 10, 30, 16, 49, 28)
+        )
+        self.assertEqual(templates[0].tags, ["order", "invoice"])
+        self.assertEqual(templates[1].to_dict["modified"], "2017-10-21 11:49:28")
+        self.assertEqual(json.loads(templates[1].to_json), templates[1].to_dict)
+        self.assertFalse(hasattr(templates[0], "missing"))
+
+    def test_only_date_shaped_values_are_parsed(self):
+        response = PDFGeneratorResponse(
+            {
+                "createdAt": "2019-03-05T11:34:21Z",
+                "updated_at": "5 March 2019",
+                "name": "May",
+                "response": "JVBERi0xLjcKJeLjz9MK",
+            }
+        )
+        self.assertEqual(response.created_at.year, 2019)
+        self.assertIsNotNone(response.created_at.tzinfo)
+        self.assertEqual(response.updated_at, datetime.datetime(2019, 3, 5))
+        self.assertEqual(response.name, "May")
+        self.assertEqual(response.response, "JVBERi0xLjcKJeLjz9MK")
+
+    def test_nested_dicts_are_wrapped(self):
+        response = PDFGeneratorResponse({"metaData": {"createdBy": "Sameer"}})
+        self.assertEqual(response.meta_data.created_by, "Sameer")
+
+
+class CodecTests(StubServerTestCase):
+    def test_every_codec_round_trips(self):
+        for codec in AVAILABLE_CODECS:
+            client = self.make_client(codec=codec)
+            self.assertEqual(client.codec.name, codec)
+            template = client.create_template(name="Ünïcode template")
+            self.assertEqual(template.name, "Ünïcode template")
+            self.assertNotIn("to_json", template.__dict__)
+            self.assertEqual(json.loads(template.to_json), template.to_dict)
+
+
+class TemplateCacheTests(StubServerTestCase):
+    def test_hits_and_invalidation(self):
+        client = self.make_client(template_cache=True)
+        before = self.server.request_count
+        client.get_template(template_id=1)
+        self.assertEqual(client.get_template(template_id=1).id, 1)
+        client.all_templates()
+        client.all_templates()
+        self.assertEqual(self.server.request_count - before, 2)
+
+        client.delete_template(template_id=1)
+        client.get_template(template_id=1)
+        client.all_templates()
+        self.assertEqual(self.server.request_count - before, 5)
+        stats = client.template_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 4))
+
+    def test_expired_entries_are_revalidated(self):
+        client = self.make_client(template_cache=TemplateCache(ttl=0, maxsize=1))
+        client.get_template(template_id=1)
+        self.assertEqual(client.get_template(template_id=1).id, 1)
+        self.assertEqual(client.template_cache.revalidations, 1)
+        client.get_template(template_id=2)
+        self.assertEqual(client.template_cache.stats()["evictions"], 1)
+
+    def test_entries_invalidated_during_revalidation(self):
+        cache = TemplateCache(ttl=0)
+        transport = FakeTransport()
+        transport.add(
+            "GET",
+            r"templates/1$",
+            json={"response": {"id": 1}},
+            headers={"ETag": '"v1"'},
+            times=1,
+        )
+
+        def not_modified(request):
+            cache.invalidate()
+            return 304, {"ETag": '"v1"'}, b""
+
+        transport.add("GET", r"templates/1$", callback=not_modified)
+        client = PDFGenerator(
+            api_key="key",
+            api_secret="secret",
+            transport=transport,
+            template_cache=cache,
+        )
+        client.get_template(template_id=1)
+        self.assertEqual(client.get_template(template_id=1).id, 1)
+        self.assertEqual(transport.requests[1].headers["If-None-Match"], '"v1"')
+        self.assertEqual(cache.stats()["size"], 1)
+
+
+class SigningTests(unittest.TestCase):
+    def setUp(self):
+        self.client = PDFGenerator(
+            api_key="key", api_secret="secret", workspace="test@example.com"
+        )
+
+    def expected_signature(self, resource, workspace):
+        message = "key{0}{1}".format(resource, workspace).encode("utf-8")
+        return hmac.new(b"secret", message, hashlib.sha256).hexdigest()
+
+    def test_signature_follows_workspace(self):
+        headers = self.client.prepare_headers("templates")
+        self.assertEqual(
+            headers["X-Auth-Signature"],
+            self.expected_signature("templates", "test@example.com"),
+        )
+        self.client.set_workspace("other@example.com")
+        headers = self.client.prepare_headers("templates")
+        self.assertEqual(headers["X-Auth-Workspace"], "other@example.com")
+        self.assertEqual(
+            headers["X-Auth-Signature"],
+            self.expected_signature("templates", "other@example.com"),
+        )
+
+    def test_bulk_editor_urls_match_single_urls(self):
+        data_list = [
+            {"name": "Sameer"},
+            {"name": "Kumar"},
+            "https://example.com/data.json",
+        ]
+        urls = self.client.get_editor_urls([1, 2, 1], data_list)
+        self.assertEqual(
+            urls,
+            [
+                self.client.get_editor_url(template_id, data)
+                for template_id, data in zip([1, 2, 1], data_list)
+            ],
+        )
+        self.assertEqual(len(self.client.get_editor_urls(1, data_list)), 3)
+
+
+class RateLimiterTests(StubServerTestCase):
+    def test_retries_throttled_requests_and_backs_off(self):
+        rate_limiter = RateLimiter(rate=50, concurrency=8, max_retries=2)
+        client = self.make_client(rate_limiter=rate_limiter)
+        self.server.queue_errors(429, count=2, headers={"Retry-After": "0"})
+        self.assertEqual(client.get_template(template_id=3).id, 3)
+        stats = rate_limiter.stats()
+        self.assertEqual(stats["backoffs"], 1)
+        self.assertLess(stats["allowed_rate"], 50)
+        self.assertEqual(stats["concurrency_limit"], 4)
+        self.assertEqual((stats["in_flight"], stats["queue_depth"]), (0, 0))
+
+    def test_gives_up_after_max_retries(self):
+        client = self.make_client(rate_limiter=RateLimiter(max_retries=1))
+        self.server.queue_errors(429, count=2)
+        with self.assertRaises(TooManyRequests):
+            client.get_template(template_id=3)
+
+    def test_retry_after_blocks_new_requests(self):
+        rate_limiter = RateLimiter(rate=100)
+        rate_limiter.acquire()
+        rate_limiter.release(429, {"Retry-After": "0.2"})
+        start = time.monotonic()
+        rate_limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+    def test_slot_is_released_on_any_exception(self):
+        def interrupt(request):
+            raise KeyboardInterrupt
+
+        transport = FakeTransport()
+        transport.add("GET", r"templates/1$", callback=interrupt, times=1)
+        transport.add("GET", r"templates/1$", json={"response": {"id": 1}})
+        rate_limiter = RateLimiter(concurrency=1)
+        client = PDFGenerator(
+            api_key="key",
+            api_secret="secret",
+            transport=transport,
+            rate_limiter=rate_limiter,
+        )
+        with self.assertRaises(KeyboardInterrupt):
+            client.get_template(template_id=1)
+        self.assertEqual(rate_limiter.stats()["in_flight"], 0)
+        self.assertEqual(client.get_template(template_id=1, deadline=1).id, 1)
+
+    def test_cancel_wakes_queued_requests(self):
+        rate_limiter = RateLimiter(concurrency=1)
+        rate_limiter.acquire()
+        deadline = Deadline()
+        threading.Timer(0.1, deadline.cancel).start()
+        start = time.monotonic()
+        with self.assertRaises(RequestCancelled):
+            rate_limiter.acquire(deadline)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(rate_limiter.stats()["queue_depth"], 0)
+
+    def test_ramps_up_on_healthy_answers(self):
+        rate_limiter = RateLimiter(rate=5, burst=100, concurrency=2)
+        for _ in range(50):
+            rate_limiter.acquire()
+            rate_limiter.release(200, {})
+        self.assertGreater(rate_limiter.allowed_rate, 5)
+        self.assertGreater(rate_limiter.concurrency_limit, 2)
+
+
+class CoalescingTests(StubServerTestCase):
+    server_options = {"latency": 0.3}
+
+    def run_concurrently(self, func, count=5):
+        barrier = threading.Barrier(count)
+
+        def call(i):
+            barrier.wait()
+            return func(i)
+
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            return list(executor.map(call, range(count)))
+
+    def test_identical_calls_share_one_request(self):
+        client = self.make_client(coalesce=True)
+        before = self.server.request_count
+        documents = self.run_concurrently(
+            lambda i: client.create_document(
+                template_id=1,
+                data={"b": [1, 2], "a": "x"} if i % 2 else {"a": "x", "b": [1, 2]},
+            )
+        )
+        self.assertEqual(self.server.request_count - before, 1)
+        self.assertEqual(len({document.name for document in documents}), 1)
+        self.assertEqual(client.coalescer.stats()["coalesced"], 4)
+
+    def test_different_calls_are_not_coalesced(self):
+        client = self.make_client(coalesce=True)
+        before = self.server.request_count
+        self.run_concurrently(lambda i: client.get_template(template_id=i % 2))
+        self.assertEqual(self.server.request_count - before, 2)
+
+    def test_cancel_wakes_waiting_calls(self):
+        coalescer = SingleFlight()
+        started, finish = threading.Event(), threading.Event()
+
+        def leader():
+            started.set()
+            finish.wait()
+            return 1
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(coalescer.do, "key", leader)
+            started.wait()
+            deadline = Deadline()
+            threading.Timer(0.1, deadline.cancel).start()
+            start = time.monotonic()
+            with self.assertRaises(RequestCancelled):
+                coalescer.do("key", leader, deadline)
+            self.assertLess(time.monotonic() - start, 0.5)
+            finish.set()
+            self.assertEqual(future.result(), 1)
+
+    def test_exceptions_are_shared(self):
+        client = self.make_client(coalesce=True)
+
+        def get_missing_template(i):
+            try:
+                client.get_template(template_id="missing")
+            except ResourceEntityNotFound as exc:
+                return exc
+
+        before = self.server.request_count
+        errors = self.run_concurrently(get_missing_template, count=3)
+        self.assertEqual(self.server.request_count - before, 1)
+        self.assertTrue(all(isinstance(e, ResourceEntityNotFound) for e in errors))